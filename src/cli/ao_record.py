@@ -2,7 +2,7 @@ import os
 import time
 import yaml
 from argparse import ArgumentParser, REMAINDER
-from ao.common.constants import AO_CONFIG
+from ao.common.constants import AO_CONFIG, SHARED_CACHE_POLICIES
 from ao.runner.agent_runner import AgentRunner
 
 
@@ -25,6 +25,62 @@ def launch_command_parser():
         help="Name that will be used in the experiment list. If not set, Run X where X is the index of the current run will be used.",
     )
 
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="Write recorded LLM calls to the database in batches from a background thread instead of one commit per call. Speeds up runs with many short LLM calls.",
+    )
+
+    parser.add_argument(
+        "--compress-db",
+        action="store_true",
+        help="Store the inputs, outputs and stack traces of recorded LLM calls compressed, with a dictionary per API type built from the first calls. Shrinks the database several times over; reading compressed rows needs no flag.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=1.0,
+        default=None,
+        type=float,
+        metavar="RATE",
+        help="Record per-phase timings of intercepted LLM calls (binding, hashing, cache lookup, string matching, ...) for a share RATE of the calls (default: all). Inspect them with 'ao-tool profile <session_id>'.",
+    )
+
+    parser.add_argument(
+        "--shared-cache",
+        default=None,
+        choices=SHARED_CACHE_POLICIES,
+        help="Reuse recorded LLM outputs across sessions: 'session' only within a session (default), 'project' across the runs of the project, 'global' across all runs. New LLM calls with the same input and model are answered from the cache instead of calling the provider.",
+    )
+
+    parser.add_argument(
+        "--cache-salt",
+        default=None,
+        help="Namespace of the shared cache: runs with different salts share no LLM outputs (e.g., to force fresh outputs for an eval).",
+    )
+
+    parser.add_argument(
+        "--match-memory",
+        default=None,
+        type=float,
+        metavar="MB",
+        help="Memory budget in MB of the LLM inputs and outputs kept for edge detection (default: 1024). Beyond it, those of the least recently matched LLM calls are evicted.",
+    )
+
+    parser.add_argument(
+        "--match-spill",
+        action="store_true",
+        help="Move the inputs and outputs evicted from the edge detection memory budget to a file instead of dropping them, so later LLM calls can still be connected to them.",
+    )
+
+    parser.add_argument(
+        "--replay-only",
+        default=None,
+        metavar="SESSION_ID",
+        help="Replay a recorded session from its cached LLM calls only, without the develop server. Fails on the first LLM call that was not recorded (exit code 3) instead of calling the provider. Replays only read the database, so many can run in parallel.",
+    )
+
     parser.add_argument(
         "-m",
         "--module",
@@ -73,6 +129,23 @@ def _validate_launch_command(args):
 def launch_command(args):
     args = _validate_launch_command(args)
 
+    if args.write_behind:
+        os.environ["AO_WRITE_BEHIND"] = "1"
+    if args.compress_db:
+        os.environ["AO_DB_COMPRESSION"] = "1"
+    if args.profile:
+        os.environ["AO_PROFILE"] = str(args.profile)
+    if args.shared_cache:
+        os.environ["AO_SHARED_CACHE"] = args.shared_cache
+    if args.cache_salt is not None:
+        os.environ["AO_SHARED_CACHE_SALT"] = args.cache_salt
+    if args.match_memory is not None:
+        os.environ["AO_STRING_MATCH_MAX_MB"] = str(args.match_memory)
+    if args.match_spill:
+        os.environ["AO_STRING_MATCH_SPILL"] = "1"
+    if args.replay_only:
+        os.environ["AO_REPLAY_ONLY"] = args.replay_only
+
     agent_runner = AgentRunner(
         script_path=args.script_path,
         script_args=args.script_args,
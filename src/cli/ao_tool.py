@@ -12,6 +12,7 @@ from argparse import ArgumentParser, REMAINDER
 from pathlib import Path
 from ao.common.constants import PLAYBOOK_SERVER_URL, PLAYBOOK_SERVER_TIMEOUT
 from ao.server.database_manager import DB
+from ao.server.llm_call_format import decode
 
 SESSION_WAIT_TIMEOUT = 30  # Max seconds to wait for session_id from agent_runner
 
@@ -69,15 +70,10 @@ def _apply_edit(session_id: str, node_id: str, field: str, key: str, value: str)
 
     api_type = row["api_type"]
 
-    # Parse the current stored data to get raw and to_show
-    if field == "input":
-        current_data = json.loads(row["input"])
-        inner_data = json.loads(current_data.get("input", "{}"))
-    else:
-        inner_data = json.loads(row["output"])
-
-    raw_dict = inner_data.get("raw", {})
-    to_show = inner_data.get("to_show", {})
+    # Decode the stored data to get raw and to_show
+    stored = decode(row[field])
+    raw_dict = stored.raw if stored is not None else {}
+    to_show = stored.to_show if stored is not None else {}
 
     # Flatten to_show completely to match probe output format
     flat_to_show = flatten_complete(to_show, ".") if isinstance(to_show, dict) else {}
@@ -206,6 +202,69 @@ def _spawn_rerun(session_id: str, timeout: float | None = None) -> dict:
         }
 
 
+def _spawn_replay(session_id: str, timeout: float | None = None) -> dict:
+    """
+    Replay a session with `ao-record --replay-only` and block until completion.
+
+    Runs the session's stored command in its cwd and environment. The replay's
+    stdout is discarded (replays may run in parallel), the end of its stderr is
+    returned if it did not complete.
+    """
+    cwd, command, environment = DB.get_exec_command(session_id)
+    if not command:
+        return {
+            "status": "error",
+            "session_id": session_id,
+            "error": f"Session not found or no command stored: {session_id}",
+        }
+
+    # The runner writes its result (replayed calls, cache misses) to this file
+    fd, report_file = tempfile.mkstemp(prefix="ao-replay-", suffix=".json")
+    os.close(fd)
+
+    env = os.environ.copy()
+    env.update(environment)
+    env.pop("AO_SESSION_ID", None)
+    env["AO_REPLAY_ONLY"] = session_id
+    env["AO_REPLAY_REPORT"] = report_file
+
+    start_time = time.time()
+    try:
+        process = subprocess.Popen(
+            shlex.split(command),
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            return {"status": "timeout", "session_id": session_id, "pid": process.pid}
+
+        result = {
+            "status": "completed" if process.returncode == 0 else "failed",
+            "session_id": session_id,
+            "exit_code": process.returncode,
+            "duration_seconds": round(time.time() - start_time, 2),
+        }
+        with open(report_file) as f:
+            report = json.loads(f.read() or "{}")
+        if report:
+            result["status"] = report["status"]
+            result["replayed_calls"] = report["replayed_calls"]
+            if report["misses"]:
+                result["miss"] = report["misses"][0]
+        if result["status"] != "completed":
+            result["stderr_tail"] = stderr.splitlines()[-20:]
+        return result
+    finally:
+        os.unlink(report_file)
+
 
 def wait_for_session_file(session_file: str, timeout: float) -> dict | None:
     """Poll for session file to be written by agent_runner.
@@ -367,21 +426,11 @@ def probe_command(args) -> None:
             if not llm_call:
                 output_json({"status": "error", "error": f"Node not found: {node_id}"})
 
-            # Parse input/output JSON, extracting to_show fields
-            input_to_show = None
-            output_to_show = None
-            if llm_call["input"]:
-                input_data = json.loads(llm_call["input"])
-                # input_data has {input: "<json string>", attachments: [...], model: "..."}
-                # Parse the nested input JSON to get to_show
-                if input_data.get("input"):
-                    inner_input = json.loads(input_data["input"])
-                    input_to_show = inner_input.get("to_show")
-
-            if llm_call["output"]:
-                output_data = json.loads(llm_call["output"])
-                # output_data has {raw: {...}, to_show: {...}}
-                output_to_show = output_data.get("to_show")
+            # Decode input/output, deriving their to_show from raw
+            stored_input = decode(llm_call["input"])
+            stored_output = decode(llm_call["output"])
+            input_to_show = stored_input.to_show if stored_input is not None else None
+            output_to_show = stored_output.to_show if stored_output is not None else None
 
             # Apply key regex filter if requested
             if args.key_regex:
@@ -513,11 +562,72 @@ def experiments_command(args) -> None:
     output_json({"experiments": result, "total": total_count, "range": f"{start}:{end if end else ''}"})
 
 
+def replay_command(args) -> None:
+    """Replay sessions from their recorded LLM calls only, in parallel worker processes."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    if len(args.session_ids) == 1:
+        output_json(_spawn_replay(args.session_ids[0], timeout=args.timeout))
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        replays = list(pool.map(lambda sid: _spawn_replay(sid, args.timeout), args.session_ids))
+    passed = sum(replay["status"] == "completed" for replay in replays)
+    output_json({
+        "status": "completed" if passed == len(replays) else "failed",
+        "passed": passed,
+        "failed": len(replays) - passed,
+        "duration_seconds": round(time.time() - start_time, 2),
+        "replays": replays,
+    })
+
+
+def profile_command(args) -> None:
+    """Show the per-phase timings recorded with `ao-record --profile` for a session."""
+    from ao.runner.profiling import summarize_call_metrics
+
+    session_id = args.session_id
+    if not DB.get_experiment_metadata(session_id):
+        output_json({"status": "error", "error": f"Session not found: {session_id}"})
+
+    summary = summarize_call_metrics(DB.get_call_metrics(session_id))
+    if not summary["calls"]:
+        output_json({
+            "status": "error",
+            "error": f"No call metrics for session {session_id}, record it with ao-record --profile",
+        })
+    if not args.nodes:
+        del summary["nodes"]
+    output_json({"session_id": session_id, **summary})
+
+
+def compact_command(args) -> None:
+    """Flatten forked sessions: copy the LLM calls they read through their bases."""
+    compacted = []
+    for session_id in args.session_ids:
+        if not DB.get_experiment_metadata(session_id):
+            output_json({"status": "error", "error": f"Session not found: {session_id}"})
+        compacted.append({"session_id": session_id, "bases": DB.compact_session(session_id)})
+    output_json({"status": "completed", "sessions": compacted})
+
+
+def migrate_command(args) -> None:
+    """
+    Rewrite LLM calls stored in the old format (raw and to_show) to store raw only,
+    and compress or decompress them if asked to.
+    """
+    compress = True if args.compress else False if args.decompress else None
+    stats = DB.migrate_llm_calls(vacuum=args.vacuum, compress=compress)
+    if stats["bytes_after"]:
+        stats["ratio"] = round(stats["bytes_before"] / stats["bytes_after"], 2)
+    output_json({"status": "completed", **stats})
+
 
 def _copy_experiment(session_id: str, run_name: str | None = None) -> str | dict:
     """
-    Clones the experiment and llm-calls entries for the given session_id in the DB
-    and writes them into new entries in the DB with a new session id we generate here.
+    Clones the experiment entry for the given session_id in the DB into a new entry
+    with a new session id we generate here. Its LLM calls are a copy-on-write fork of
+    the original's (see DB.fork_llm_calls), no llm-calls rows are copied.
     Returns the new session id, or an error dict if the session doesn't exist.
 
     Args:
@@ -561,8 +671,8 @@ def _copy_experiment(session_id: str, run_name: str | None = None) -> str | dict
         graph = json.loads(experiment["graph_topology"])
         DB.update_graph_topology(new_session_id, graph)
 
-    # Copy all LLM calls to new session
-    DB.copy_llm_calls(session_id, new_session_id)
+    # Fork the LLM calls: the new session reads them through the original
+    DB.fork_llm_calls(session_id, new_session_id)
 
     return new_session_id
 
@@ -1141,6 +1251,80 @@ def create_parser() -> ArgumentParser:
         help="Filter experiments by name using regex pattern",
     )
 
+    # replay subcommand
+    replay = subparsers.add_parser(
+        "replay",
+        help="Replay sessions from their recorded LLM calls only",
+        description="Rerun recorded sessions with 'ao-record --replay-only': every LLM call is "
+                    "answered from the session's recorded calls, neither providers nor the develop "
+                    "server are contacted, and a replay stops at the first call that was not recorded. "
+                    "Several sessions are replayed in parallel worker processes.",
+    )
+    replay.add_argument("session_ids", nargs="+", metavar="session_id", help="Sessions to replay")
+    replay.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Replays running in parallel (default: number of CPUs)",
+    )
+    replay.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Timeout in seconds per replay (terminates it if exceeded)",
+    )
+
+    # profile subcommand
+    profile = subparsers.add_parser(
+        "profile",
+        help="Show per-phase timings of a profiled run",
+        description="Aggregate the per-phase timings recorded with 'ao-record --profile': "
+                    "AO's overhead per call and the count, total, mean, p50, p95 and max of each phase.",
+    )
+    profile.add_argument("session_id", help="Session ID of a run recorded with --profile")
+    profile.add_argument(
+        "--nodes",
+        action="store_true",
+        help="Also list the timings of every node",
+    )
+
+    # compact subcommand
+    compact = subparsers.add_parser(
+        "compact",
+        help="Flatten forked sessions",
+        description="Sessions created by edit-and-rerun are forks: they only store the LLM calls "
+                    "that differ from the session they were copied from and read the others "
+                    "through it. Compacting copies the inherited calls into the session and "
+                    "detaches it, which shortens lookups through long chains of forks.",
+    )
+    compact.add_argument("session_ids", nargs="+", metavar="session_id", help="Sessions to compact")
+
+    # migrate subcommand
+    migrate = subparsers.add_parser(
+        "migrate",
+        help="Convert stored LLM calls to the current storage format",
+        description="LLM calls used to be stored with both their raw input/output and the "
+                    "filtered copy shown in the UI. They now store the raw data only and derive "
+                    "the shown copy when read. Old rows are still read; migrating rewrites them "
+                    "in the new format. Run it while no session is being recorded or edited.",
+    )
+    migrate.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Return the freed space to the file system afterwards (rewrites the SQLite file)",
+    )
+    migrate_compression = migrate.add_mutually_exclusive_group()
+    migrate_compression.add_argument(
+        "--compress",
+        action="store_true",
+        help="Also compress the inputs, outputs and stack traces of all LLM calls (see 'ao-record --compress-db')",
+    )
+    migrate_compression.add_argument(
+        "--decompress",
+        action="store_true",
+        help="Store all LLM calls uncompressed again",
+    )
+
     # edit-and-rerun subcommand
     edit_and_rerun = subparsers.add_parser(
         "edit-and-rerun",
@@ -1379,6 +1563,14 @@ def main():
         probe_command(args)
     elif args.command == "experiments":
         experiments_command(args)
+    elif args.command == "replay":
+        replay_command(args)
+    elif args.command == "profile":
+        profile_command(args)
+    elif args.command == "compact":
+        compact_command(args)
+    elif args.command == "migrate":
+        migrate_command(args)
     elif args.command == "edit-and-rerun":
         edit_and_rerun_command(args)
     elif args.command == "install-skill":
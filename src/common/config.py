@@ -18,6 +18,16 @@ class Config:
     project_root: str
     database_url: str = None
     python_executable: str = None  # Auto-populated when ao-server runs
+    # Shared LLM output cache (see SHARED_CACHE_* in constants.py)
+    shared_cache: str = None
+    shared_cache_salt: str = None
+    shared_cache_max_age_days: float = None
+    shared_cache_max_mb: float = None
+    # Memory budget of edge detection (see STRING_MATCH_* in constants.py)
+    string_match_max_mb: float = None
+    string_match_spill: bool = None
+    # Compression of llm_calls columns (see DB_COMPRESSION* in constants.py)
+    db_compression: bool = None
 
     @classmethod
     def from_yaml_file(cls, yaml_file: str) -> "Config":
@@ -113,6 +113,66 @@ DB_PATH = os.path.expandvars(
 )
 os.makedirs(DB_PATH, exist_ok=True)
 
+# Write-behind mode for llm_calls inserts (`ao-record --write-behind` or AO_WRITE_BEHIND=1):
+# new rows are queued and written in batches of WRITE_BEHIND_BATCH_ROWS rows or at least
+# every WRITE_BEHIND_FLUSH_MS ms. At WRITE_BEHIND_MAX_PENDING queued rows, the caller flushes.
+WRITE_BEHIND_BATCH_ROWS = 64
+WRITE_BEHIND_FLUSH_MS = 50
+WRITE_BEHIND_MAX_PENDING = 1024
+
+# Compression of the large llm_calls columns (`ao-record --compress-db`, AO_DB_COMPRESSION=1 or
+# `db_compression` in config.yaml; `ao-tool migrate --compress` for recorded rows). Values of at
+# least DB_COMPRESSION_MIN_BYTES bytes are stored zlib-compressed (DB_COMPRESSION_LEVEL) with a
+# dictionary per api_type and column, built from its first DB_COMPRESSION_DICT_SAMPLES values and
+# at most DB_COMPRESSION_DICT_BYTES long (zlib uses the last 32 KB). See server/blob_compression.py.
+DB_COMPRESSION = bool(config.db_compression)
+DB_COMPRESSION_MIN_BYTES = 256
+DB_COMPRESSION_LEVEL = 6
+DB_COMPRESSION_DICT_SAMPLES = 8
+DB_COMPRESSION_DICT_BYTES = 32 * 1024
+
+# Base64 strings and data URIs of at least INLINE_MEDIA_MIN_CHARS characters in request bodies
+# (images, documents) are stored in the attachment store and referenced from the stored input
+# (see runner/monkey_patching/inline_media.py).
+INLINE_MEDIA_MIN_CHARS = 4096
+
+# Call profiling (`ao-record --profile [RATE]` or AO_PROFILE=<rate>): call_metrics rows are
+# buffered and written in batches of CALL_METRICS_FLUSH_ROWS rows.
+CALL_METRICS_FLUSH_ROWS = 256
+
+# Identical concurrent LLM calls of a session wait for the first one (see
+# server/single_flight.py), for at most SINGLE_FLIGHT_WAIT_S seconds before calling the LLM.
+SINGLE_FLIGHT_WAIT_S = 300
+
+# Shared LLM output cache (`ao-record --shared-cache <policy>`, AO_SHARED_CACHE or
+# `shared_cache` in config.yaml). Outputs are also stored by content (input hash, model,
+# optional salt) and reused by new calls of other sessions: "session" (default) only reuses
+# outputs within a session, "project" across the runs of AO_PROJECT_ROOT, "global" across all
+# runs. Outputs unused for SHARED_CACHE_MAX_AGE_DAYS days are evicted, then the least recently
+# used ones until the cache is below SHARED_CACHE_MAX_MB.
+SHARED_CACHE_POLICIES = ("session", "project", "global")
+SHARED_CACHE_POLICY = config.shared_cache or "session"
+SHARED_CACHE_SALT = config.shared_cache_salt or ""
+SHARED_CACHE_MAX_AGE_DAYS = config.shared_cache_max_age_days or 30
+SHARED_CACHE_MAX_MB = config.shared_cache_max_mb or 1024
+
+# Memory budget of edge detection in the runner process (`ao-record --match-memory MB`,
+# AO_STRING_MATCH_MAX_MB or `string_match_max_mb` in config.yaml). Beyond it, the stored outputs
+# and inputs of the least recently matched nodes are evicted. With spilling (`ao-record
+# --match-spill`, AO_STRING_MATCH_SPILL=1 or `string_match_spill`), they are moved to a file in
+# AO_CACHE and read back when a later input may quote them, otherwise they are dropped.
+STRING_MATCH_MAX_MB = config.string_match_max_mb or 1024
+STRING_MATCH_SPILL = bool(config.string_match_spill)
+
+# Forks of a session (`ao-tool edit-and-rerun`) store only the LLM calls that diverge from
+# their base and read the others through it. A fork with more than FORK_MAX_DEPTH bases (base,
+# base of the base, ...) is flattened when it is created (see also `ao-tool compact`).
+FORK_MAX_DEPTH = 8
+
+# Replay-only runs (`ao-record --replay-only <session_id>` or AO_REPLAY_ONLY=<session_id>)
+# exit with this code when an LLM call had no recorded output.
+REPLAY_MISS_EXIT_CODE = 3
+
 # the path to the folder where the logs are stored
 default_log_path = os.path.join(AO_HOME, "logs")
 AO_LOG_DIR = os.path.expandvars(
@@ -145,8 +205,8 @@ os.makedirs(ATTACHMENT_CACHE, exist_ok=True)
 AO_INSTALL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Whitelist patterns as (url_regex, path_regex) tuples.
-# A request matches if BOTH regexes match (use ".*" for "any").
-# Note: path may include query params (e.g., /search?q=...), so don't use $ anchor.
+# A request matches if BOTH regexes match (use ".*" for "any"). The url regex is
+# searched in the request's host, the path regex in its path (without the query).
 WHITELIST_ENDPOINT_PATTERNS = [
     # LLM APIs (any URL, match by path)
     (r".*", r"/v1/messages"),  # Anthropic
@@ -172,6 +232,29 @@ WHITELIST_ENDPOINT_PATTERNS = [
 COMPILED_ENDPOINT_PATTERNS = [
     (re.compile(url_pat), re.compile(path_pat)) for url_pat, path_pat in WHITELIST_ENDPOINT_PATTERNS
 ]
+# The endpoint classifier runs on every outgoing request, so the patterns are
+# combined: one regex for the paths allowed on any host, and one host regex that
+# prefilters the host-specific pairs. "(?!)" never matches (empty alternation).
+_ANY_HOST = r".*"
+COMPILED_ANY_HOST_PATH_PATTERN = re.compile(
+    "|".join(
+        f"(?:{path_pat})"
+        for url_pat, path_pat in WHITELIST_ENDPOINT_PATTERNS
+        if url_pat == _ANY_HOST
+    )
+    or "(?!)"
+)
+COMPILED_HOST_PREFILTER_PATTERN = re.compile(
+    "|".join(f"(?:{url_pat})" for url_pat, _ in WHITELIST_ENDPOINT_PATTERNS if url_pat != _ANY_HOST)
+    or "(?!)"
+)
+COMPILED_HOST_ENDPOINT_PATTERNS = [
+    (url_pat, path_pat)
+    for url_pat, path_pat in COMPILED_ENDPOINT_PATTERNS
+    if url_pat.pattern != _ANY_HOST
+]
+# Number of (host, path) whitelist decisions remembered by the endpoint classifier
+ENDPOINT_DECISION_CACHE_SIZE = 4096
 
 # List of regexes that exclude patterns from being displayed in edit IO
 EDIT_IO_EXCLUDE_PATTERNS = [
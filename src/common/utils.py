@@ -5,11 +5,16 @@ import os
 import re
 import sys
 import importlib
+from functools import lru_cache
 from pathlib import Path
 import threading
 from typing import Optional, Union, Dict, Any
+from urllib.parse import urlsplit
 from ao.common.constants import (
-    COMPILED_ENDPOINT_PATTERNS,
+    COMPILED_ANY_HOST_PATH_PATTERN,
+    COMPILED_HOST_ENDPOINT_PATTERNS,
+    COMPILED_HOST_PREFILTER_PATTERN,
+    ENDPOINT_DECISION_CACHE_SIZE,
     COMPILED_URL_PATTERN_TO_NODE_NAME,
     NO_LABEL,
     COMPILED_MODEL_NAME_PATTERNS,
@@ -172,14 +177,31 @@ def get_node_label(input_dict: Dict[str, Any], api_type: str) -> str:
     return _sanitize_for_display(raw_name) if raw_name else NO_LABEL
 
 
-def is_whitelisted_endpoint(url: str, path: str) -> bool:
-    """Check if a URL and path match any of the whitelist (url_regex, path_regex) tuples."""
-    for url_pattern, path_pattern in COMPILED_ENDPOINT_PATTERNS:
-        if url_pattern.search(url) and path_pattern.search(path):
+@lru_cache(maxsize=ENDPOINT_DECISION_CACHE_SIZE)
+def is_whitelisted_host_path(host: str, path: str) -> bool:
+    """
+    Check if a host and path match any of the whitelist (url_regex, path_regex) tuples.
+
+    This is the endpoint classifier the patches run before touching a call's
+    arguments, so it is cheap for the common non-LLM request: one search of the
+    combined any-host path regex, one search of the host prefilter, and the
+    decision is remembered per (host, path).
+    """
+    if COMPILED_ANY_HOST_PATH_PATTERN.search(path):
+        return True
+    if not COMPILED_HOST_PREFILTER_PATTERN.search(host):
+        return False
+    for host_pattern, path_pattern in COMPILED_HOST_ENDPOINT_PATTERNS:
+        if host_pattern.search(host) and path_pattern.search(path):
             return True
     return False
 
 
+def is_whitelisted_endpoint(url: str, path: str) -> bool:
+    """Check if a URL and path match any of the whitelist (url_regex, path_regex) tuples."""
+    return is_whitelisted_host_path(urlsplit(url).hostname or "", path.partition("?")[0])
+
+
 def get_node_name_for_url(url: str) -> Optional[str]:
     """Return the display name for a URL if it matches any pattern, else None."""
     for pattern, name in COMPILED_URL_PATTERN_TO_NODE_NAME:
@@ -23,10 +23,19 @@ from ao.common.constants import (
     CONNECTION_TIMEOUT,
     SERVER_START_TIMEOUT,
     MESSAGE_POLL_INTERVAL,
+    REPLAY_MISS_EXIT_CODE,
+    SHARED_CACHE_POLICY,
+    SHARED_CACHE_SALT,
+    SHARED_CACHE_MAX_AGE_DAYS,
+    SHARED_CACHE_MAX_MB,
+    STRING_MATCH_MAX_MB,
+    STRING_MATCH_SPILL,
 )
 from ao.cli.ao_server import launch_daemon_server
 from ao.runner.context_manager import set_parent_session_id, set_server_connection
 from ao.runner.monkey_patching.apply_monkey_patches import apply_all_monkey_patches
+from ao.runner.profiling import enable_profiling, flush_call_metrics
+from ao.runner.string_matching import configure_memory
 from ao.server.database_manager import DB
 
 
@@ -176,6 +185,11 @@ class AgentRunner:
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
+        # Session replayed from its recorded LLM calls only (ao-record --replay-only)
+        self.replay_session_id: Optional[str] = os.environ.get("AO_REPLAY_ONLY") or None
+        if self.replay_session_id:
+            return  # No server, no restart command
+
         # Start computing restart command in background (it's slow due to psutil)
         from concurrent.futures import ThreadPoolExecutor
 
@@ -196,6 +210,12 @@ class AgentRunner:
 
     def send_deregister(self) -> None:
         """Send deregistration message to the develop server."""
+        # Write queued LLM calls first, the session is complete once deregistered.
+        try:
+            DB.flush_writes()
+        except Exception as e:
+            _log_error("Failed to write cached LLM calls, they will not be replayed", e)
+        flush_call_metrics()
         self._send_message("deregister")
 
     def _signal_handler(self, signum, frame) -> None:
@@ -375,6 +395,12 @@ class AgentRunner:
                     logger.debug(f"Using database mode: {database_mode}")
                 logger.info(f"Registered with session_id: {self.session_id}")
 
+                # Rerun: answer cache lookups from memory (loaded in the background).
+                # Forks of the session keep its LLM calls as they were before the rerun.
+                if os.getenv("AO_SESSION_ID"):
+                    DB.detach_forks(self.session_id)
+                    DB.preload_session(self.session_id)
+
                 # Write session info to file for ao-tool IPC
                 session_file = os.environ.get("AO_SESSION_FILE")
                 if session_file:
@@ -399,6 +425,25 @@ class AgentRunner:
         set_parent_session_id(self.session_id)
         set_server_connection(self.server_conn, self.response_queue)
 
+        if os.environ.get("AO_WRITE_BEHIND") == "1":
+            DB.enable_write_behind()
+        if os.environ.get("AO_DB_COMPRESSION") == "1":
+            DB.enable_compression()
+        if os.environ.get("AO_PROFILE"):
+            enable_profiling(float(os.environ["AO_PROFILE"]))
+        shared_cache = os.environ.get("AO_SHARED_CACHE", SHARED_CACHE_POLICY)
+        if shared_cache != "session" and not self.replay_session_id:
+            DB.enable_shared_cache(
+                shared_cache,
+                salt=os.environ.get("AO_SHARED_CACHE_SALT", SHARED_CACHE_SALT),
+                max_age_days=SHARED_CACHE_MAX_AGE_DAYS,
+                max_mb=SHARED_CACHE_MAX_MB,
+            )
+        configure_memory(
+            max_mb=float(os.environ.get("AO_STRING_MATCH_MAX_MB", STRING_MATCH_MAX_MB)),
+            spill=os.environ.get("AO_STRING_MATCH_SPILL", str(int(STRING_MATCH_SPILL))) == "1",
+        )
+
         # Apply monkey patches (includes random seeding - numpy/torch are lazy)
         apply_all_monkey_patches()
 
@@ -478,6 +523,10 @@ class AgentRunner:
             if self.restart_event.is_set():
                 logger.info("[AgentRunner] Restart requested, rerunning script...")
                 self.restart_event.clear()
+                # The user may have edited LLM calls in the UI: reload them.
+                DB.drop_preloaded_sessions()
+                DB.detach_forks(self.session_id)
+                DB.preload_session(self.session_id)
                 continue
 
         return exit_code
@@ -491,33 +540,97 @@ class AgentRunner:
         self._apply_runtime_setup()
         return self._execute_user_code()
 
-    def run(self) -> None:
-        """Main entry point to run the unified agent runner."""
-        try:
-            self._setup_environment()
-            ensure_server_running()
-            self._connect_to_server()
+    def _run_with_server(self) -> int:
+        """Run the script connected to the develop server.
 
-            self.listener_thread = threading.Thread(
-                target=self._listen_for_server_messages, args=(self.server_conn,), daemon=True
-            )
-            self.listener_thread.start()
+        Returns:
+            Exit code from the script execution
+        """
+        ensure_server_running()
+        self._connect_to_server()
 
-            # Send restart command asynchronously (it's slow to compute, only needed for UI restart)
-            def send_restart_command():
-                try:
-                    cmd = self._restart_command_future.result()
-                    self._send_message("update_command", command=cmd)
-                except Exception as e:
-                    _log_error("Failed to send restart command", e)
+        self.listener_thread = threading.Thread(
+            target=self._listen_for_server_messages, args=(self.server_conn,), daemon=True
+        )
+        self.listener_thread.start()
+
+        # Send restart command asynchronously (it's slow to compute, only needed for UI restart)
+        def send_restart_command():
+            try:
+                cmd = self._restart_command_future.result()
+                self._send_message("update_command", command=cmd)
+            except Exception as e:
+                _log_error("Failed to send restart command", e)
+
+        threading.Thread(target=send_restart_command, daemon=True).start()
+
+        # Use debug mode if running under debugpy, otherwise normal mode
+        if self._is_debugpy_session():
+            return self._run_debug_mode()
+        return self._run_normal_mode()
+
+    def _run_replay_only(self) -> int:
+        """Replay the session from its recorded LLM calls, without the develop server.
 
-            threading.Thread(target=send_restart_command, daemon=True).start()
+        Every LLM call must be answered from the preloaded session: the first miss
+        raises ReplayMissError before the provider is contacted (see DB.enable_replay_only).
 
-            # Use debug mode if running under debugpy, otherwise normal mode
-            if self._is_debugpy_session():
-                exit_code = self._run_debug_mode()
+        Returns:
+            Exit code from the script execution, REPLAY_MISS_EXIT_CODE after a miss
+        """
+        if not DB.get_experiment_metadata(self.replay_session_id):
+            logger.error(f"Cannot replay session {self.replay_session_id}: not found")
+            return 1
+        self.session_id = self.replay_session_id
+        DB.enable_replay_only()
+        DB.preload_session(self.session_id, wait=True)
+
+        exit_code = self._run_normal_mode()
+        if DB.replay_misses:
+            # The user code may have caught the error, the run still failed.
+            exit_code = REPLAY_MISS_EXIT_CODE
+            miss = DB.replay_misses[0]
+            print(
+                f"\nao-record --replay-only: cache miss in session {miss['session_id']}\n"
+                f"  {miss['reason']}",
+                file=sys.stderr,
+            )
+            if miss.get("stack_trace"):
+                print(miss["stack_trace"], file=sys.stderr)
+        logger.info(
+            f"Replayed {DB.replayed_calls} LLM calls of session {self.session_id} "
+            f"({len(DB.replay_misses)} misses)"
+        )
+
+        report_file = os.environ.get("AO_REPLAY_REPORT")
+        if report_file:
+            status = "completed" if exit_code == 0 else "failed"
+            if DB.replay_misses:
+                status = "cache_miss"
+            try:
+                with open(report_file, "w") as f:
+                    json.dump(
+                        {
+                            "session_id": self.session_id,
+                            "status": status,
+                            "exit_code": exit_code,
+                            "replayed_calls": DB.replayed_calls,
+                            "misses": DB.replay_misses,
+                        },
+                        f,
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to write replay report: {e}")
+        return exit_code
+
+    def run(self) -> None:
+        """Main entry point to run the unified agent runner."""
+        try:
+            self._setup_environment()
+            if self.replay_session_id:
+                exit_code = self._run_replay_only()
             else:
-                exit_code = self._run_normal_mode()
+                exit_code = self._run_with_server()
 
         finally:
             self.send_deregister()
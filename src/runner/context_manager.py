@@ -1,6 +1,7 @@
 import contextvars
 from contextlib import contextmanager
 import json
+import os
 import queue
 from ao.server.database_manager import DB
 from ao.common.utils import send_to_server, send_to_server_and_receive
@@ -64,19 +65,28 @@ def ao_launch(run_name="Workflow run"):
     # If rerun, get previous's runs session_id, else None.
     prev_session_id = DB.get_subrun_id(parent_session_id, run_name)
 
-    # Register new subrun with server.
-    msg = {
-        "type": "add_subrun",
-        "name": run_name,
-        "parent_session_id": parent_session_id,
-        "cwd": parent_env["cwd"],
-        "command": parent_env["command"],
-        "environment": json.loads(parent_env["environment"]),
-        "prev_session_id": prev_session_id,
-    }
-    response = send_to_server_and_receive(msg)
-    session_id = response["session_id"]
+    if DB.replay_only:
+        # No server to register with: replay the recorded subrun.
+        if prev_session_id is None:
+            raise DB.replay_miss(parent_session_id, f"subrun '{run_name}' was not recorded")
+        session_id = prev_session_id
+    else:
+        # Register new subrun with server.
+        msg = {
+            "type": "add_subrun",
+            "name": run_name,
+            "parent_session_id": parent_session_id,
+            "cwd": parent_env["cwd"],
+            "command": parent_env["command"],
+            "environment": json.loads(parent_env["environment"]),
+            "prev_session_id": prev_session_id,
+        }
+        response = send_to_server_and_receive(msg)
+        session_id = response["session_id"]
     current_session_id.set(session_id)
+    if prev_session_id is not None:
+        # Rerun of the subrun: answer its cache lookups from memory.
+        DB.preload_session(session_id, wait=DB.replay_only)
 
     try:
         # Run user code
@@ -85,6 +95,11 @@ def ao_launch(run_name="Workflow run"):
         # Deregister
         deregister_msg = {"type": "deregister", "session_id": session_id}
         send_to_server(deregister_msg)
+        # The subrun makes no more LLM calls: free its edge detection state and cached rows
+        from ao.runner.monkey_patching.patching_utils import forget_session
+
+        forget_session(session_id)
+        DB.drop_preloaded_session(session_id)
 
 
 def log(entry=None, success=None):
@@ -124,5 +139,9 @@ def set_parent_session_id(session_id):
 def set_server_connection(server_connection, rsp_queue=None):
     global server_conn, server_file, response_queue
     server_conn = server_connection
-    server_file = server_connection.makefile("rw")
+    if server_connection is None:
+        # Replay-only runs have no server, messages for the UI are dropped.
+        server_file = open(os.devnull, "w")
+    else:
+        server_file = server_connection.makefile("rw")
     response_queue = rsp_queue
@@ -0,0 +1,134 @@
+"""
+Inverted index of token k-grams over the outputs stored for string matching.
+
+`is_content_match` only accepts a longest contiguous match of more than
+MIN_MATCH_WORDS tokens that covers more than half of the output, so an output
+of n tokens can only match an input if they share a run of min_match_len(n)
+tokens. Such a run contains m = min_match_len(n) - k + 1 k-gram positions of
+the output (k = MIN_MATCH_WORDS + 1), so it always contains two of the
+positions sampled every stride(n) = m // 2 tokens: only those are indexed. The
+number of sampled positions whose k-gram occurs in the input bounds the longest
+match from above, so `find_source_nodes` runs SequenceMatcher only on the
+outputs that can still pass, in time roughly linear in the input size instead
+of in the number of stored outputs. Sampling keeps the index at a few entries
+per output, however long the output, and requiring two sampled hits keeps
+chance k-gram collisions from making candidates.
+"""
+
+import itertools
+import threading
+from typing import AbstractSet, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# (node_id, index of the token list among the node's outputs)
+OutputKey = Tuple[str, int]
+
+
+def kgram_hashes(tokens: Sequence, k: int, stride: int = 1) -> Iterator[int]:
+    """Hashes of the k-grams of tokens, at every stride-th position."""
+    for i in range(0, len(tokens) - k + 1, stride):
+        yield hash(tuple(tokens[i : i + k]))
+
+
+class KGramIndex:
+    """
+    Hashed token k-grams of the output token lists of a session's nodes.
+
+    Hash collisions only add candidates (they are verified by the caller), they
+    never hide a match.
+    """
+
+    def __init__(self, k: int, min_match_len: Callable[[int], int]):
+        """
+        Args:
+            k: k-gram length, at most the shortest match that can pass
+            min_match_len: Shortest match that can pass for an output of a given length
+        """
+        self.k = k
+        self.min_match_len = min_match_len
+        # k-gram hash -> [(node_id, list index)], one entry per sampled position
+        self._postings: Dict[int, List[OutputKey]] = {}
+        # node_id -> its k-gram hashes (for removal)
+        self._node_kgrams: Dict[str, Set[int]] = {}
+        # node_id -> order in which it was first added
+        self._order: Dict[str, int] = {}
+        # node_id -> version of its indexed outputs (changes when they are replaced)
+        self._versions: Dict[str, int] = {}
+        self._next_version = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._node_kgrams)
+
+    def stride(self, output_len: int) -> Optional[int]:
+        """Distance of the indexed positions of an output, None if it can never match."""
+        min_len = self.min_match_len(output_len)
+        if output_len < min_len:
+            return None
+        return max(1, (min_len - self.k + 1) // 2)
+
+    def add(self, node_id: str, token_lists: List[Sequence]) -> None:
+        """Index the output token lists of node_id, replacing previous ones."""
+        with self._lock:
+            self._remove(node_id)
+            self._order.setdefault(node_id, len(self._order))
+            self._versions[node_id] = next(self._next_version)
+            node_kgrams = set()
+            for i, tokens in enumerate(token_lists):
+                stride = self.stride(len(tokens))
+                if stride is None:
+                    continue
+                for h in kgram_hashes(tokens, self.k, stride):
+                    self._postings.setdefault(h, []).append((node_id, i))
+                    node_kgrams.add(h)
+            self._node_kgrams[node_id] = node_kgrams
+
+    def remove(self, node_id: str) -> None:
+        with self._lock:
+            self._remove(node_id)
+            self._order.pop(node_id, None)
+            self._versions.pop(node_id, None)
+
+    def _remove(self, node_id: str) -> None:
+        for h in self._node_kgrams.pop(node_id, ()):
+            postings = [key for key in self._postings[h] if key[0] != node_id]
+            if postings:
+                self._postings[h] = postings
+            else:
+                del self._postings[h]
+
+    def version(self, node_id: str) -> Optional[int]:
+        """Version of the indexed outputs of node_id, None if it is not indexed."""
+        return self._versions.get(node_id)
+
+    def kgrams(self, node_id: str) -> AbstractSet[int]:
+        """Indexed k-gram hashes of the outputs of node_id."""
+        return self._node_kgrams.get(node_id, frozenset())
+
+    def hits(self, input_tokens: Sequence) -> Dict[OutputKey, int]:
+        """
+        Count, for every indexed output token list, its indexed positions whose k-gram occurs in input_tokens.
+
+        Returns:
+            {(node_id, list index): hits} for the token lists with at least one hit,
+            ordered by the order in which their nodes were added
+        """
+        return self.hits_for(set(kgram_hashes(input_tokens, self.k)))
+
+    def hits_for(self, input_kgrams: AbstractSet[int]) -> Dict[OutputKey, int]:
+        """Same as hits, from the set of k-gram hashes of the input."""
+        hits: Dict[OutputKey, int] = {}
+        with self._lock:
+            # Most input k-grams are in no output: intersect first (in C)
+            for h in self._postings.keys() & input_kgrams:
+                for key in self._postings[h]:
+                    hits[key] = hits.get(key, 0) + 1
+            order = self._order
+            return dict(sorted(hits.items(), key=lambda item: (order[item[0][0]], item[0][1])))
+
+    def max_match_len(self, hits: int, output_len: int) -> int:
+        """Upper bound of the longest match of an output token list with hits indexed k-gram hits."""
+        stride = self.stride(output_len)
+        if stride is None:
+            return output_len
+        # A run of L tokens spans L - k + 1 positions, at most hits + 1 strides minus one
+        return min((hits + 1) * stride + self.k - 2, output_len)
@@ -0,0 +1,148 @@
+"""
+Memory budget of the string matching state of the runner process.
+
+The outputs and inputs stored for edge detection (string_matching.py) used to
+live as long as the process, so a batch job running thousands of subruns
+(`ao_launch`) grew until it ran out of memory. Sessions of finished subruns are
+now dropped when their `ao_launch` exits, and `MatchMemory` keeps the estimated
+size of the stored nodes of all sessions under a budget: beyond it, the least
+recently matched nodes are evicted. An evicted node is either dropped (it can
+no longer be the source of an edge) or, with spilling enabled, its token arrays
+are moved to a `SpillStore` on disk and paged back in when a later input shares
+k-grams with its output.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+NodeKey = Tuple[str, str]  # (session_id, node_id)
+
+
+class MatchMemory:
+    """Estimated bytes of the stored nodes, in least recently matched order."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._nodes: "OrderedDict[NodeKey, int]" = OrderedDict()
+        self._sessions: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def charge(self, session_id: str, node_id: str, nbytes: int) -> None:
+        """Set the size of a node, which counts as just matched."""
+        key = (session_id, node_id)
+        with self._lock:
+            self._bytes += nbytes - self._nodes.pop(key, 0)
+            self._nodes[key] = nbytes
+            self._sessions.setdefault(session_id, set()).add(node_id)
+
+    def touch(self, session_id: str, node_id: str) -> None:
+        """Mark a node as just matched."""
+        with self._lock:
+            if (session_id, node_id) in self._nodes:
+                self._nodes.move_to_end((session_id, node_id))
+
+    def discharge(self, session_id: str, node_id: str) -> None:
+        with self._lock:
+            self._bytes -= self._nodes.pop((session_id, node_id), 0)
+            self._sessions.get(session_id, set()).discard(node_id)
+
+    def forget_session(self, session_id: str) -> None:
+        with self._lock:
+            for node_id in self._sessions.pop(session_id, ()):
+                self._bytes -= self._nodes.pop((session_id, node_id), 0)
+
+    def take_over_budget(self) -> List[NodeKey]:
+        """Remove and return the least recently matched nodes until the others fit the budget."""
+        evicted = []
+        with self._lock:
+            while self._nodes and self._bytes > self.max_bytes:
+                (session_id, node_id), nbytes = self._nodes.popitem(last=False)
+                self._bytes -= nbytes
+                self._sessions[session_id].discard(node_id)
+                evicted.append((session_id, node_id))
+        return evicted
+
+
+def _pack(arrays: Sequence[array]) -> bytes:
+    """Token arrays as one blob: their count and lengths, then their items."""
+    header = array("I", [len(arrays)] + [len(tokens) for tokens in arrays])
+    return header.tobytes() + b"".join(tokens.tobytes() for tokens in arrays)
+
+
+def _unpack(blob: bytes) -> List[array]:
+    itemsize = array("I").itemsize
+    count = array("I", blob[:itemsize])[0]
+    lengths = array("I", blob[itemsize : (count + 1) * itemsize])
+    arrays, start = [], (count + 1) * itemsize
+    for length in lengths:
+        arrays.append(array("I", blob[start : start + length * itemsize]))
+        start += length * itemsize
+    return arrays
+
+
+class SpillStore:
+    """
+    Token arrays of evicted nodes in a SQLite file, private to the process.
+
+    The file is deleted on close(). Nodes are taken out when they are paged back in.
+    """
+
+    def __init__(self, directory: str):
+        fd, self.path = tempfile.mkstemp(prefix="string-matching-", suffix=".sqlite", dir=directory)
+        os.close(fd)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE spilled (session_id TEXT, node_id TEXT, outputs BLOB, inputs BLOB,"
+            " PRIMARY KEY (session_id, node_id))"
+        )
+
+    def put(
+        self, session_id: str, node_id: str, outputs: Sequence[array], inputs: Sequence[array]
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO spilled VALUES (?, ?, ?, ?)",
+                (session_id, node_id, _pack(outputs), _pack(inputs)),
+            )
+
+    def take(self, session_id: str, node_id: str) -> Optional[Tuple[List[array], List[array]]]:
+        """Remove a node and return its (outputs, inputs) token arrays, None if it is not spilled."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT outputs, inputs FROM spilled WHERE session_id = ? AND node_id = ?",
+                (session_id, node_id),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "DELETE FROM spilled WHERE session_id = ? AND node_id = ?", (session_id, node_id)
+            )
+        return _unpack(row[0]), _unpack(row[1])
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM spilled WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -68,16 +68,21 @@ def unflatten_to_show(inp):
     return unflattened_dict
 
 
+# One alternation matches at the start of a key iff one of the patterns does
+_EDIT_IO_EXCLUDE = re.compile("|".join(f"(?:{p})" for p in EDIT_IO_EXCLUDE_PATTERNS))
+
+
 def should_exclude_key(key: str) -> bool:
     """Check if a flattened key should be excluded based on regex patterns."""
-    for pattern in EDIT_IO_EXCLUDE_PATTERNS:
-        if re.match(pattern, key):
-            return True
-    return False
+    return _EDIT_IO_EXCLUDE.match(key) is not None
 
 
-def filter_dict(input_dict: dict) -> dict:
-    """Filter a dictionary by excluding keys matching exclude patterns."""
+class _KeysNotWalkable(Exception):
+    """The document has keys the flattened keys do not map one to one (dotted or empty keys, ...)."""
+
+
+def _filter_dict_flattened(input_dict: dict) -> dict:
+    """filter_dict through flattened keys, for documents _filter_tree cannot walk."""
     flattened = flatten(input_dict, ".")
     filtered = {
         k: v for k, v in flattened.items() if not should_exclude_key(k) and not (v == [] or v == {})
@@ -87,36 +92,193 @@ def filter_dict(input_dict: dict) -> dict:
     return flattened_list_preserved
 
 
+def _filter_tree(node, key):
+    """
+    Filtered copy of a non-empty dict or list, as unflatten_list rebuilds it
+    from its kept flattened keys.
+
+    Returns (tree, min_key), min_key being the smallest kept flattened key
+    under node, or (None, None) if nothing is kept. unflatten_list inserts keys
+    in sorted order, so the children of a dict come in the order of their
+    min_key, and any container keyed "0".."n-1" becomes a list.
+    """
+    is_dict = isinstance(node, dict)
+    kept = []  # (min_key, child_key, subtree)
+    for child_key, value in node.items() if is_dict else enumerate(node):
+        if is_dict:
+            if not child_key or "." in child_key:
+                raise _KeysNotWalkable
+        else:
+            child_key = str(child_key)
+        flat_key = child_key if key is None else f"{key}.{child_key}"
+        if value and isinstance(value, (dict, list)):
+            subtree, min_key = _filter_tree(value, flat_key)
+            if min_key is not None:
+                kept.append((min_key, child_key, subtree))
+        elif not (value == [] or value == {}) and not _EDIT_IO_EXCLUDE.match(flat_key):
+            kept.append((flat_key, child_key, value))
+    if not kept:
+        return None, None
+
+    min_key = min(entry[0] for entry in kept)
+    if not is_dict:
+        if kept[-1][1] == str(len(kept) - 1):
+            return [subtree for _, _, subtree in kept], min_key
+        indices = None  # a list with gaps, rebuilt as a dict
+    else:
+        try:
+            indices = [int(child_key) for _, child_key, _ in kept]
+        except ValueError:
+            indices = None
+    if indices is not None:
+        if any(str(i) != child_key for i, (_, child_key, _) in zip(indices, kept)):
+            raise _KeysNotWalkable
+        if sorted(indices) == list(range(len(indices))):
+            kept.sort(key=lambda entry: int(entry[1]))
+            return [subtree for _, _, subtree in kept], min_key
+    kept.sort(key=lambda entry: entry[0])
+    return {child_key: subtree for _, child_key, subtree in kept}, min_key
+
+
+def _show_tree(tree, prefix, shown: dict) -> dict:
+    """flatten_to_show of a dict built by _filter_tree (no dotted keys, no empty dicts)."""
+    for child_key, value in tree.items():
+        key = child_key if prefix is None else f"{prefix}.{child_key}"
+        if isinstance(value, dict):
+            _show_tree(value, key, shown)
+        elif isinstance(value, list):
+            shown[key] = [_show_tree(el, None, {}) if isinstance(el, dict) else el for el in value]
+        else:
+            shown[key] = value
+    return shown
+
+
+def filter_dict(input_dict: dict) -> dict:
+    """
+    Filter a dictionary by excluding keys matching exclude patterns.
+
+    Same result as flattening input_dict, dropping the excluded flattened keys
+    and empty containers, rebuilding it with unflatten_list and applying
+    flatten_to_show (to_show is part of the input hash, key order included),
+    but in one walk over input_dict.
+    """
+    if not isinstance(input_dict, dict):
+        return _filter_dict_flattened(input_dict)
+    try:
+        tree, _ = _filter_tree(input_dict, None)
+    except _KeysNotWalkable:
+        return _filter_dict_flattened(input_dict)
+    if tree is None:
+        return {}
+    if isinstance(tree, list):
+        # Top-level keys "0".."n-1", which unflatten_list fails on
+        return _filter_dict_flattened(input_dict)
+    return _show_tree(tree, None, {})
+
+
+def _raw_child(node, parts: List[str]):
+    """
+    (path, value) of the child of node at the display key parts, None if there
+    is none. A dict key may contain dots, so it can span several parts.
+    """
+    if not parts:
+        return [], node
+    if isinstance(node, dict):
+        if parts[0] in node and len(parts) == 1:
+            return [parts[0]], node[parts[0]]
+        for end in range(1, len(parts) + 1):
+            child_key = ".".join(parts[:end])
+            if child_key in node:
+                found = _raw_child(node[child_key], parts[end:])
+                if found is not None:
+                    return [child_key] + found[0], found[1]
+    elif isinstance(node, list):
+        part = parts[0]
+        if part.isdigit() and str(int(part)) == part and int(part) < len(node):
+            found = _raw_child(node[int(part)], parts[1:])
+            if found is not None:
+                return [int(part)] + found[0], found[1]
+    return None
+
+
+def _collect_edits(raw_node, shown, path: list, edits: list) -> list:
+    """
+    (path, value) of the leaves of shown (a part of to_show) that change the
+    leaf of raw_node at the same flattened key.
+    """
+    for key, value in shown.items() if isinstance(shown, dict) else enumerate(shown):
+        found = _raw_child(raw_node, key.split(".") if isinstance(key, str) else [str(key)])
+        if found is None:
+            continue
+        child_path, raw_value = found
+        raw_is_leaf = not (raw_value and isinstance(raw_value, (dict, list)))
+        if value and isinstance(value, (dict, list)):
+            if not raw_is_leaf:
+                _collect_edits(raw_value, value, path + child_path, edits)
+        elif raw_is_leaf and not (type(raw_value) is type(value) and raw_value == value):
+            edits.append((path + child_path, value))
+    return edits
+
+
+def apply_edits(raw_dict: dict, edits: List[Tuple[list, Any]]) -> dict:
+    """
+    raw_dict with the value at each path (dict keys and list indices) replaced.
+    Only the dicts and lists on the edited paths are copied, raw_dict is not
+    modified. An empty path replaces the whole document.
+    """
+    merged = dict(raw_dict)
+    copied = {id(merged)}
+    for path, value in edits:
+        if not path:
+            merged = value
+            continue
+        node = merged
+        for child_key in path[:-1]:
+            child = node[child_key]
+            if id(child) not in copied:
+                child = node[child_key] = dict(child) if isinstance(child, dict) else list(child)
+                copied.add(id(child))
+            node = child
+        node[path[-1]] = value
+    return merged
+
+
 def merge_filtered_into_raw(raw_dict: dict, to_show_dict: dict) -> dict:
     """
     Merge values from to_show back into raw_dict.
-    This updates the values in raw that exist in to_show while preserving structure and types.
 
-    Important: Preserves numeric types (float vs int) from raw_dict to avoid API validation errors.
-    For example, if raw has temperature: 0.0, we keep it as float even if JSON parsing made it 0.
+    Each leaf of to_show replaces the leaf of raw_dict at the same flattened
+    key; keys to_show does not have keep their raw value and type (e.g.
+    temperature: 0.0 stays a float). to_show and raw_dict are walked together,
+    the display keys of to_show being paths into raw_dict, and only the dicts
+    and lists on the path of a changed value are copied. raw_dict is not
+    modified and keeps its key order.
     """
-    # flatten the raw dict. the to-show is already flattened
-    flattened_raw = flatten(raw_dict, ".")
-    flattened_to_show = flatten(unflatten_to_show(to_show_dict), ".")
+    if not isinstance(to_show_dict, dict):
+        raise TypeError(f"to_show must be a dict, got {type(to_show_dict).__name__}")
+    return apply_edits(raw_dict, _collect_edits(raw_dict, to_show_dict, [], []))
 
-    # Update raw values with to_show values, preserving types from raw
-    for key, value in flattened_to_show.items():
-        if key in flattened_raw:
-            flattened_raw[key] = value
 
-    return unflatten_list(flattened_raw, ".")
+def unwrap_json_dict(complete_dict: dict) -> dict:
+    """
+    raw of a wrapped {"raw": ..., "to_show": ...} dict, with the to_show edits
+    merged in. Stored rows only keep raw (see ao.server.llm_call_format).
+    """
+    if "to_show" not in complete_dict:
+        return complete_dict["raw"]
+    return merge_filtered_into_raw(complete_dict["raw"], complete_dict["to_show"])
 
 
-def func_kwargs_to_json_str(input_dict: Dict[str, Any], api_type: str) -> Tuple[str, List[str]]:
+def func_kwargs_to_json_dict(input_dict: Dict[str, Any], api_type: str) -> Tuple[dict, List[str]]:
     """
-    Convert function kwargs to JSON string with filtered display version.
+    Convert function kwargs to the wrapped {"raw": ..., "to_show": ...} dict.
 
     Args:
         input_dict: Input dictionary containing function arguments
         api_type: The API type identifier
 
     Returns:
-        Tuple of (JSON string with raw and to_show, list of additional metadata)
+        Tuple of (dict with raw and to_show, list of additional metadata)
     """
     # Get the complete JSON string from the appropriate parser
     if api_type == "requests.Session.send":
@@ -137,9 +299,21 @@ def func_kwargs_to_json_str(input_dict: Dict[str, Any], api_type: str) -> Tuple[
     to_show_dict = filter_dict(raw_dict)
 
     # Construct the wrapped format
-    complete_dict = {"raw": raw_dict, "to_show": to_show_dict}
+    return {"raw": raw_dict, "to_show": to_show_dict}, metadata
+
 
-    # Return the wrapped JSON string
+def func_kwargs_to_json_str(input_dict: Dict[str, Any], api_type: str) -> Tuple[str, List[str]]:
+    """
+    Convert function kwargs to JSON string with filtered display version.
+
+    Args:
+        input_dict: Input dictionary containing function arguments
+        api_type: The API type identifier
+
+    Returns:
+        Tuple of (JSON string with raw and to_show, list of additional metadata)
+    """
+    complete_dict, metadata = func_kwargs_to_json_dict(input_dict, api_type)
     return json.dumps(complete_dict), metadata
 
 
@@ -148,7 +322,7 @@ def json_str_to_original_inp_dict(json_str: str, input_dict: dict, api_type: str
     Unpack the wrapped format and merge filtered values back into raw.
 
     Args:
-        json_str: JSON string in format {"raw": {...}, "to_show": {...}}
+        json_str: JSON string in format {"raw": {...}, "to_show": {...}}, to_show optional
         input_dict: Original input dictionary
         api_type: The API type identifier
 
@@ -158,12 +332,8 @@ def json_str_to_original_inp_dict(json_str: str, input_dict: dict, api_type: str
     # Parse the wrapped format
     complete_dict = json.loads(json_str)
 
-    # Extract raw and to_show
-    raw_dict = complete_dict["raw"]
-    to_show_dict = complete_dict["to_show"]
-
     # Merge to_show values back into raw
-    merged_dict = merge_filtered_into_raw(raw_dict, to_show_dict)
+    merged_dict = unwrap_json_dict(complete_dict)
 
     # Convert back to JSON string
     merged_json_str = json.dumps(merged_dict)
@@ -181,16 +351,16 @@ def json_str_to_original_inp_dict(json_str: str, input_dict: dict, api_type: str
         return merged_dict
 
 
-def api_obj_to_json_str(response_obj: Any, api_type: str) -> str:
+def api_obj_to_json_dict(response_obj: Any, api_type: str) -> dict:
     """
-    Convert API response object to JSON string with filtered display version.
+    Convert API response object to the wrapped {"raw": ..., "to_show": ...} dict.
 
     Args:
         response_obj: The response object from the API call
         api_type: The API type identifier
 
     Returns:
-        JSON string in format {"content": {...}, "to_show": {...}, others}
+        Dict in format {"raw": {...}, "to_show": {...}}
     """
     # Get the complete JSON string from the appropriate parser
     if api_type == "requests.Session.send":
@@ -209,12 +379,21 @@ def api_obj_to_json_str(response_obj: Any, api_type: str) -> str:
     # Filter the content dict
     to_show_dict = filter_dict(raw_dict)
     # Create to_show with filtered content
-    final_dict = {"raw": raw_dict, "to_show": to_show_dict}
-    # Return the wrapped JSON string
+    return {"raw": raw_dict, "to_show": to_show_dict}
+
 
-    # json_str_to_api_obj(json.dumps(final_dict), api_type)
+def api_obj_to_json_str(response_obj: Any, api_type: str) -> str:
+    """
+    Convert API response object to JSON string with filtered display version.
 
-    return json.dumps(final_dict)
+    Args:
+        response_obj: The response object from the API call
+        api_type: The API type identifier
+
+    Returns:
+        JSON string in format {"raw": {...}, "to_show": {...}}
+    """
+    return json.dumps(api_obj_to_json_dict(response_obj, api_type))
 
 
 def json_str_to_api_obj(new_output_text: str, api_type: str) -> Any:
@@ -222,7 +401,7 @@ def json_str_to_api_obj(new_output_text: str, api_type: str) -> Any:
     Convert JSON string back to API object, merging filtered values.
 
     Args:
-        new_output_text: JSON string in format {"content": {...}, "to_show": {...}, others}
+        new_output_text: JSON string in format {"raw": {...}, "to_show": {...}}, to_show optional
         api_type: The API type identifier
 
     Returns:
@@ -230,9 +409,7 @@ def json_str_to_api_obj(new_output_text: str, api_type: str) -> Any:
     """
     # Parse the wrapped format
     complete_dict = json.loads(new_output_text)
-    raw_dict = complete_dict["raw"]
-    to_show_dict = complete_dict["to_show"]
-    merged_dict = merge_filtered_into_raw(raw_dict, to_show_dict)
+    merged_dict = unwrap_json_dict(complete_dict)
     merged_json_str = json.dumps(merged_dict)
 
     # Feed to the appropriate parser
@@ -1,6 +1,10 @@
 import json
 from typing import Any, Dict
 
+# Format tag of cached responses. Responses cached before the tag existed
+# store the whole object as a dill pickle in "_obj_str" and are still loaded.
+RESPONSE_FORMAT = "http-response-v1"
+
 
 def json_str_to_original_inp_dict_httpx(json_str: str, input_dict: dict) -> dict:
     import httpx
@@ -54,17 +58,27 @@ def func_kwargs_to_json_str_httpx(input_dict: Dict[str, Any]):
 
 
 def api_obj_to_json_str_httpx(obj: Any) -> str:
-    import dill
-    import base64
     from httpx import Response
 
     obj: Response
 
     out_dict = {}
     encoding = obj.encoding if hasattr(obj, "encoding") else "utf-8"
-    out_bytes = dill.dumps(obj)
-    out_dict["_obj_str"] = base64.b64encode(out_bytes).decode(encoding)
+    # Store the fields needed to rebuild the response instead of pickling it
+    # (see RESPONSE_FORMAT). Keys starting with "_" are hidden from to_show.
+    out_dict["_format"] = RESPONSE_FORMAT
+    out_dict["_status_code"] = obj.status_code
+    out_dict["_headers"] = [[k, v] for k, v in obj.headers.multi_items()]
     out_dict["_encoding"] = encoding
+    out_dict["_http_version"] = obj.extensions.get("http_version", b"HTTP/1.1").decode("ascii")
+    try:
+        out_dict["_elapsed"] = obj.elapsed.total_seconds()
+    except RuntimeError:
+        # Response not produced by a client (e.g., built in a test).
+        out_dict["_elapsed"] = 0.0
+    if obj._request is not None:
+        out_dict["_method"] = obj._request.method
+        out_dict["_url"] = str(obj._request.url)
     decoded_content = obj.content.decode(encoding)
     try:
         out_dict["content"] = json.loads(decoded_content)
@@ -75,13 +89,16 @@ def api_obj_to_json_str_httpx(obj: Any) -> str:
 
 
 def json_str_to_api_obj_httpx(new_output_text: str) -> None:
-    import dill
-    import base64
     from httpx._decoders import TextDecoder
 
     out_dict = json.loads(new_output_text)
     encoding = out_dict["_encoding"] if "_encoding" in out_dict else "utf-8"
-    obj = dill.loads(base64.b64decode(out_dict["_obj_str"].encode(encoding)))
+    if out_dict.get("_format") == RESPONSE_FORMAT:
+        obj = _build_response(out_dict)
+    elif "_obj_str" in out_dict:
+        obj = _load_dill_response(out_dict, encoding)
+    else:
+        raise ValueError(f"Unknown httpx response format: {out_dict.get('_format')}")
 
     # For httpx.Response, update the content and text using the TextDecoder
     if isinstance(out_dict["content"], str):
@@ -94,3 +111,35 @@ def json_str_to_api_obj_httpx(new_output_text: str) -> None:
     decoder = TextDecoder(encoding=encoding)
     obj._text = "".join([decoder.decode(obj._content), decoder.flush()])
     return obj
+
+
+def _build_response(out_dict: dict):
+    """Rebuild an httpx.Response from the structured RESPONSE_FORMAT fields."""
+    import datetime
+    import httpx
+
+    request = None
+    if "_url" in out_dict:
+        request = httpx.Request(out_dict["_method"], out_dict["_url"])
+    # stream= (instead of content=) keeps the recorded headers as they are and
+    # does not run the body through the content-encoding decoders: the cached
+    # body is already decoded, _content is set by the caller.
+    obj = httpx.Response(
+        out_dict["_status_code"],
+        headers=out_dict["_headers"],
+        stream=httpx.ByteStream(b""),
+        request=request,
+        extensions={"http_version": out_dict["_http_version"].encode("ascii")},
+    )
+    obj.is_stream_consumed = True
+    obj.is_closed = True
+    obj.elapsed = datetime.timedelta(seconds=out_dict["_elapsed"])
+    return obj
+
+
+def _load_dill_response(out_dict: dict, encoding: str):
+    """Load a response cached before RESPONSE_FORMAT (full dill pickle)."""
+    import dill
+    import base64
+
+    return dill.loads(base64.b64decode(out_dict["_obj_str"].encode(encoding)))
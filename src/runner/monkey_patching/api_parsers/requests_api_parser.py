@@ -1,6 +1,10 @@
 import json
 from typing import Any, Dict
 
+# Format tag of cached responses. Responses cached before the tag existed
+# store the whole object as a dill pickle in "_obj_str" and are still loaded.
+RESPONSE_FORMAT = "http-response-v1"
+
 
 def json_str_to_original_inp_dict_requests(json_str: str, input_dict: dict) -> dict:
     # For requests, modify the request body
@@ -47,31 +51,39 @@ def func_kwargs_to_json_str_requests(input_dict: Dict[str, Any]):
 
 
 def api_obj_to_json_str_requests(obj: Any) -> str:
-    import dill
-    import base64
     from json import JSONDecodeError
 
     out_dict = {}
     encoding = obj.encoding if hasattr(obj, "encoding") else "utf-8"
-    out_bytes = dill.dumps(obj)
-    out_dict["_obj_str"] = base64.b64encode(out_bytes).decode(encoding)
+    # Store the fields needed to rebuild the response instead of pickling it
+    # (see RESPONSE_FORMAT). Keys starting with "_" are hidden from to_show.
+    out_dict["_format"] = RESPONSE_FORMAT
+    out_dict["_status_code"] = obj.status_code
+    out_dict["_reason"] = obj.reason
+    out_dict["_headers"] = [[k, v] for k, v in obj.headers.items()]
     out_dict["_encoding"] = encoding
+    out_dict["_url"] = obj.url
+    out_dict["_elapsed"] = obj.elapsed.total_seconds()
+    if obj.request is not None:
+        out_dict["_method"] = obj.request.method
     decoded_content = obj.content.decode(encoding)
     try:
         out_dict["content"] = json.loads(decoded_content)
     except JSONDecodeError:
-        out_dict["content"] = decoded_content    
+        out_dict["content"] = decoded_content
 
     return json.dumps(out_dict, sort_keys=True)
 
 
 def json_str_to_api_obj_requests(new_output_text: str) -> None:
-    import dill
-    import base64
-
     out_dict = json.loads(new_output_text)
     encoding = out_dict["_encoding"] if "_encoding" in out_dict else "utf-8"
-    obj = dill.loads(base64.b64decode(out_dict["_obj_str"].encode(encoding)))
+    if out_dict.get("_format") == RESPONSE_FORMAT:
+        obj = _build_response(out_dict)
+    elif "_obj_str" in out_dict:
+        obj = _load_dill_response(out_dict, encoding)
+    else:
+        raise ValueError(f"Unknown requests response format: {out_dict.get('_format')}")
 
     # For requests.Response, update the content and text attributes
     if isinstance(out_dict["content"], str):
@@ -81,8 +93,37 @@ def json_str_to_api_obj_requests(new_output_text: str) -> None:
     else:
         raise Exception("out_dict['content'] is not dict or str after json.loads")
 
-    # requests.Response doesn't have a decoder like httpx, it computes _text on access
-    # So we just need to clear the cached _text to force recomputation
-    if hasattr(obj, "_content_consumed"):
+    # requests.Response doesn't have a decoder like httpx, it computes _text on access.
+    # Dill-loaded responses still hold their raw stream, let requests re-read the
+    # content from _content instead.
+    if "_obj_str" in out_dict and hasattr(obj, "_content_consumed"):
         obj._content_consumed = False
     return obj
+
+
+def _build_response(out_dict: dict):
+    """Rebuild a requests.Response from the structured RESPONSE_FORMAT fields."""
+    import datetime
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    obj = requests.Response()
+    obj.status_code = out_dict["_status_code"]
+    obj.reason = out_dict["_reason"]
+    obj.headers = CaseInsensitiveDict(out_dict["_headers"])
+    obj.encoding = out_dict["_encoding"]
+    obj.url = out_dict["_url"]
+    obj.elapsed = datetime.timedelta(seconds=out_dict["_elapsed"])
+    if "_method" in out_dict:
+        obj.request = requests.Request(out_dict["_method"], out_dict["_url"]).prepare()
+    # There is no underlying connection, the body is fully read (set by the caller).
+    obj._content_consumed = True
+    return obj
+
+
+def _load_dill_response(out_dict: dict, encoding: str):
+    """Load a response cached before RESPONSE_FORMAT (full dill pickle)."""
+    import dill
+    import base64
+
+    return dill.loads(base64.b64decode(out_dict["_obj_str"].encode(encoding)))
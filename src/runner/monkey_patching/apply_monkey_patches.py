@@ -1,10 +1,11 @@
-import builtins
+import importlib
 import sys
+from importlib.abc import Loader, MetaPathFinder
 
 from ao.runner.monkey_patching.patches.randomness_patch import random_seed_patch
 
 # Lazy patches - these are only applied when the user imports the relevant module
-# Maps module name prefix -> (patch_function_module, patch_function_name)
+# Maps module name -> (patch_function_module, patch_function_name)
 LAZY_PATCHES = {
     "mcp": ("ao.runner.monkey_patching.patches.mcp_patches", "mcp_patch"),
     "requests": ("ao.runner.monkey_patching.patches.requests_patch", "requests_patch"),
@@ -15,34 +16,73 @@ LAZY_PATCHES = {
     "httpx": ("ao.runner.monkey_patching.patches.httpx_patch", "httpx_patch"),
 }
 
-# Track which patches have been applied
-_applied_patches = set()
 
-# Store original __import__
-_original_import = builtins.__import__
+def _apply_patch(patch_module, patch_func_name):
+    getattr(importlib.import_module(patch_module), patch_func_name)()
 
 
-def _patching_import(name, globals=None, locals=None, fromlist=(), level=0):
+class _PatchingLoader(Loader):
+    """Runs the real loader, then applies the module's patch once it is fully executed."""
+
+    def __init__(self, loader, patch):
+        self.loader = loader
+        self.patch = patch
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hand the module back to its real loader (importlib.resources, reloads, ...)
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.loader.exec_module(module)
+        _apply_patch(*self.patch)
+
+
+class LazyPatchFinder(MetaPathFinder):
     """
-    Wrapper around __import__ that applies patches lazily when relevant modules are imported.
-    Patches are applied BEFORE the user's import, ensuring we do a clean import first.
+    sys.meta_path finder that applies LAZY_PATCHES when their modules are first imported.
+
+    Python only consults meta_path finders for modules that are not in
+    sys.modules yet, so imports of already loaded modules never reach it, and it
+    removes itself once every patch has been applied.
     """
-    # Check if any lazy patches should be triggered BEFORE the import
-    for module_prefix, (patch_module, patch_func_name) in list(LAZY_PATCHES.items()):
-        if module_prefix in _applied_patches:
-            continue
 
-        # Check if this import matches the prefix
-        if name == module_prefix or name.startswith(module_prefix + "."):
-            _applied_patches.add(module_prefix)
+    def __init__(self, patches):
+        self._pending = dict(patches)
+
+    def find_spec(self, fullname, path, target=None):
+        patch = self._pending.pop(fullname, None)
+        if patch is None:
+            return None
+        if not self._pending:
+            self.uninstall()
+
+        # Let the remaining finders locate the module, then wrap its loader
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _PatchingLoader(spec.loader, patch)
+        return spec
 
-            # Import and apply the patch FIRST (clean import)
-            patch_mod = _original_import(patch_module, fromlist=[patch_func_name])
-            patch_func = getattr(patch_mod, patch_func_name)
-            patch_func()
+    def install(self):
+        # Targets that are already loaded are patched now, the finder won't see them
+        for module_name in [name for name in self._pending if name in sys.modules]:
+            _apply_patch(*self._pending.pop(module_name))
+        if self._pending and self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
 
-    # Now do the user's import (module is already loaded and patched)
-    return _original_import(name, globals, locals, fromlist, level)
+    def uninstall(self):
+        # Rebind instead of mutating: an import may be iterating over the current list
+        sys.meta_path = [finder for finder in sys.meta_path if finder is not self]
 
 
 def apply_all_monkey_patches():
@@ -53,4 +93,4 @@ def apply_all_monkey_patches():
     random_seed_patch()
 
     # Install the lazy import hook for everything else
-    builtins.__import__ = _patching_import
+    LazyPatchFinder(LAZY_PATCHES).install()
@@ -0,0 +1,137 @@
+"""
+Inline media of request bodies: base64 strings and data URIs.
+
+Vision and document calls embed images and files as base64, often megabytes of
+it, in the JSON body. `hoist_media` replaces each such string of at least
+INLINE_MEDIA_MIN_CHARS characters by a reference to the decoded content in the
+attachment store:
+
+    "data:image/png;base64,iVBORw0..."  ->  "data:image/png;base64,ao-attachment:<sha256>"
+    "iVBORw0..." (e.g. Anthropic's source.data)  ->  "ao-attachment:<sha256>"
+
+The id is the SHA-256 of the content, so the same media gets the same reference
+in every call and run. Only canonical base64 is hoisted (it encodes back to the
+same string), `inline_media` restores the exact text.
+
+InterceptedCall hoists the wrapped input: llm_calls stores, the UI shows and edge
+detection tokenizes the references. The input hash is still computed from the
+input with its media inline, so sessions recorded before keep hitting the cache,
+and a cache hit without an input overwrite sends the user's request as it is.
+Only an edited input is rebuilt from stored values, its references are inlined
+again before the request is sent. If the media cannot be written to the
+attachment store, the input is stored with its media inline.
+"""
+
+import base64
+import hashlib
+import mimetypes
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+from ao.common.constants import INLINE_MEDIA_MIN_CHARS
+
+REF_PREFIX = "ao-attachment:"
+
+_DATA_URI = re.compile(r"data:([\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[^;,]*)*;base64,")
+_BASE64 = re.compile(r"[A-Za-z0-9+/]+={0,2}")
+_REF = re.compile(re.escape(REF_PREFIX) + r"([0-9a-f]{64})$")
+# Keys holding the media type of a base64 field next to it
+_MIME_KEYS = ("media_type", "mime_type", "mimeType")
+
+# Attachment id -> (file name, content) of the media hoisted from one input
+Media = Dict[str, Tuple[str, bytes]]
+
+
+def _hoist_string(text: str, mime: Optional[str], media: Media) -> Optional[str]:
+    """Reference replacing the base64 payload of text, None if text is no inline media."""
+    prefix = ""
+    if text.startswith("data:"):
+        match = _DATA_URI.match(text)
+        if match is None:
+            return None
+        prefix, mime = match.group(0), match.group(1) or mime
+    payload = text[len(prefix) :]
+    if len(payload) < INLINE_MEDIA_MIN_CHARS or len(payload) % 4 or not _BASE64.fullmatch(payload):
+        return None
+    content = base64.b64decode(payload)
+    if base64.b64encode(content).decode("ascii") != payload:
+        return None  # Not canonical, would not be restored as sent
+    file_id = hashlib.sha256(content).hexdigest()
+    extension = (mime and mimetypes.guess_extension(mime)) or ".bin"
+    media[file_id] = (file_id[:16] + extension, content)
+    return prefix + REF_PREFIX + file_id
+
+
+def _hoist(node, mime: Optional[str], media: Media, hoisted: dict):
+    if isinstance(node, str):
+        if len(node) < INLINE_MEDIA_MIN_CHARS:
+            return node
+        # raw and to_show share their strings: hoist each once
+        if id(node) not in hoisted:
+            hoisted[id(node)] = (node, _hoist_string(node, mime, media))
+        replacement = hoisted[id(node)][1]
+        return node if replacement is None else replacement
+    if isinstance(node, dict):
+        mime = next((node[key] for key in _MIME_KEYS if isinstance(node.get(key), str)), None)
+        result = None
+        for key, value in node.items():
+            new_value = _hoist(value, mime, media, hoisted)
+            if new_value is not value:
+                if result is None:
+                    result = dict(node)
+                result[key] = new_value
+        return node if result is None else result
+    if isinstance(node, list):
+        result = None
+        for index, value in enumerate(node):
+            new_value = _hoist(value, None, media, hoisted)
+            if new_value is not value:
+                if result is None:
+                    result = list(node)
+                result[index] = new_value
+        return node if result is None else result
+    return node
+
+
+def hoist_media(document):
+    """
+    (document with its inline media replaced by references, hoisted media).
+    Containers on the path to a hoisted string are copied, everything else is
+    shared with document, which is returned as is if it has no inline media.
+    """
+    media: Media = {}
+    return _hoist(document, None, media, {}), media
+
+
+def inline_media(document, load: Callable[[str], Optional[bytes]]):
+    """
+    document with the references of hoist_media replaced by the base64 of the
+    content load returns for their id. References load does not find are kept.
+    """
+    if isinstance(document, str):
+        match = _REF.search(document) if REF_PREFIX in document else None
+        if match is None:
+            return document
+        content = load(match.group(1))
+        if content is None:
+            return document
+        return document[: match.start()] + base64.b64encode(content).decode("ascii")
+    if isinstance(document, dict):
+        result = None
+        for key, value in document.items():
+            new_value = inline_media(value, load)
+            if new_value is not value:
+                if result is None:
+                    result = dict(document)
+                result[key] = new_value
+        return document if result is None else result
+    if isinstance(document, list):
+        result = None
+        for index, value in enumerate(document):
+            new_value = inline_media(value, load)
+            if new_value is not value:
+                if result is None:
+                    result = list(document)
+                result[index] = new_value
+        return document if result is None else result
+    return document
@@ -0,0 +1,203 @@
+"""
+Per-call record for intercepted API calls.
+
+Every intercepted call goes through edge detection, the cache lookup, storing
+inputs/outputs for matching and the graph update sent to the server. All of
+these stages need the same derived views of the call (serialized JSON, to_show
+projection, text strings, tokens, hash). InterceptedCall computes each view
+lazily, at most once per call, and every stage reads it from here.
+"""
+
+import json
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+from ao.common.logger import logger
+from ao.common.utils import get_node_label, get_raw_model_name, hash_input
+from ao.runner.monkey_patching.api_parser import api_obj_to_json_dict, func_kwargs_to_json_dict
+from ao.runner.profiling import profile_phase
+
+# Views derived from the input / output. They are dropped when the input is
+# overwritten (cache hit with input_overwrite) or a new output is set.
+_INPUT_VIEWS = (
+    "_input_json",
+    "_hoisted_input",
+    "input_json_dict",
+    "input_json_str",
+    "attachments",
+    "model",
+    "label",
+    "input_strings",
+    "matching_input",
+)
+_OUTPUT_VIEWS = ("output_json_dict", "output_json_str", "stored_output", "output_strings")
+
+
+class InterceptedCall:
+    """
+    Record of one intercepted API call, built once by the patch.
+
+    Derived views are cached properties. `input_pickle` and `input_hash` are
+    the cache key and are computed from the input as the user sent it, like
+    `stored_input` and its `media`: they survive an input overwrite, all other
+    input views are recomputed.
+
+    The input views hold inline media (base64 images and files) as references
+    to the attachment store (see inline_media.py), except `input_pickle`: the
+    input hash is computed from the input with its media inline, as it was before
+    media was hoisted, so recorded sessions keep hitting the cache.
+
+    Attributes:
+        api_type: The API type identifier (e.g., "httpx.Client.send")
+    """
+
+    def __init__(self, input_dict: Dict[str, Any], api_type: str):
+        self.api_type = api_type
+        self._input_dict = input_dict
+        self._output_obj = None
+
+    # ----------------------------------------------------------
+    # Input
+    # ----------------------------------------------------------
+
+    @property
+    def input_dict(self) -> Dict[str, Any]:
+        return self._input_dict
+
+    @input_dict.setter
+    def input_dict(self, input_dict: Dict[str, Any]) -> None:
+        # Pin the cache key and the stored input before invalidating the other views.
+        self.input_hash
+        self.stored_input
+        self.media
+        self._input_dict = input_dict
+        for name in _INPUT_VIEWS:
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def _input_json(self):
+        with profile_phase("serialize"):
+            return func_kwargs_to_json_dict(self._input_dict, self.api_type)
+
+    @cached_property
+    def _hoisted_input(self):
+        from ao.runner.monkey_patching.inline_media import hoist_media
+
+        with profile_phase("serialize"):
+            return hoist_media(self._input_json[0])
+
+    @cached_property
+    def input_json_dict(self) -> dict:
+        """Wrapped {"raw": ..., "to_show": ...} input, inline media replaced by references."""
+        return self._hoisted_input[0]
+
+    @cached_property
+    def media(self) -> Dict[str, tuple]:
+        """(file name, content) of the media referenced by stored_input, by attachment id."""
+        return self._hoisted_input[1]
+
+    @cached_property
+    def attachments(self) -> List[str]:
+        return self._input_json[1]
+
+    @cached_property
+    def input_json_str(self) -> str:
+        """JSON of input_json_dict (func_kwargs_to_json_str(input_dict, api_type)[0] if it has no media)."""
+        with profile_phase("serialize"):
+            return json.dumps(self.input_json_dict)
+
+    @cached_property
+    def model(self) -> str:
+        return get_raw_model_name(self._input_dict, self.api_type)
+
+    @cached_property
+    def label(self) -> str:
+        return get_node_label(self._input_dict, self.api_type)
+
+    @cached_property
+    def input_pickle(self) -> str:
+        """Serialized input the input hash is computed from (media inline)."""
+        if self.media:
+            with profile_phase("serialize"):
+                input_json_str = json.dumps(self._input_json[0])
+        else:
+            input_json_str = self.input_json_str
+        cacheable_input = {
+            "input": input_json_str,
+            "attachments": self.attachments,
+            "model": self.model,
+        }
+        with profile_phase("serialize"):
+            return json.dumps(cacheable_input, sort_keys=True)
+
+    @cached_property
+    def input_hash(self) -> str:
+        with profile_phase("hash"):
+            return hash_input(self.input_pickle)
+
+    @cached_property
+    def stored_input(self) -> str:
+        """Input stored in llm_calls.input, raw only (see ao.server.llm_call_format)."""
+        from ao.server.llm_call_format import encode_input
+
+        with profile_phase("serialize"):
+            return encode_input(self.input_json_dict["raw"], self.attachments, self.model)
+
+    @cached_property
+    def input_strings(self) -> List[str]:
+        """Text strings of the input's to_show projection (for content matching)."""
+        from ao.runner.string_matching import extract_strings
+
+        try:
+            return extract_strings(self.input_json_dict["to_show"])
+        except Exception as e:
+            logger.error(f"Error extracting input text: {e}")
+            return []
+
+    # Input tokenized for content matching, set by string_matching.matching_input
+    matching_input = None
+
+    # ----------------------------------------------------------
+    # Output
+    # ----------------------------------------------------------
+
+    @property
+    def output_obj(self) -> Optional[Any]:
+        return self._output_obj
+
+    @output_obj.setter
+    def output_obj(self, output_obj: Any) -> None:
+        self._output_obj = output_obj
+        for name in _OUTPUT_VIEWS:
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def output_json_dict(self) -> dict:
+        """Wrapped {"raw": ..., "to_show": ...} output."""
+        with profile_phase("output_encode"):
+            return api_obj_to_json_dict(self._output_obj, self.api_type)
+
+    @cached_property
+    def output_json_str(self) -> str:
+        """Same string as api_obj_to_json_str(output_obj, api_type)."""
+        with profile_phase("output_encode"):
+            return json.dumps(self.output_json_dict)
+
+    @cached_property
+    def stored_output(self) -> str:
+        """Output stored in llm_calls.output, raw only (see ao.server.llm_call_format)."""
+        from ao.server.llm_call_format import encode_output
+
+        with profile_phase("output_encode"):
+            return encode_output(self.output_json_dict["raw"])
+
+    @cached_property
+    def output_strings(self) -> List[str]:
+        """Text strings of the output's to_show projection (for content matching)."""
+        from ao.runner.string_matching import extract_strings
+
+        try:
+            return extract_strings(self.output_json_dict["to_show"])
+        except Exception as e:
+            logger.error(f"Error extracting output text: {e}")
+            return []
@@ -1,10 +1,16 @@
 from functools import wraps
-from ao.runner.monkey_patching.patching_utils import get_input_dict, send_graph_node_and_edges
+from ao.runner.monkey_patching.patching_utils import (
+    get_input_dict,
+    patch_class_method,
+    send_graph_node_and_edges,
+)
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
 from ao.runner.string_matching import find_source_nodes, store_output_strings
 from ao.runner.context_manager import get_session_id
+from ao.runner.profiling import finish_call_profile, profile_phase, start_call_profile
 from ao.server.database_manager import DB
 from ao.common.logger import logger
-from ao.common.utils import is_whitelisted_endpoint
+from ao.common.utils import is_whitelisted_host_path
 
 
 def genai_patch():
@@ -14,57 +20,61 @@ def genai_patch():
         logger.info("google-genai not installed, skipping genai patches")
         return
 
-    def create_patched_init(original_init):
+    # Class-level wrapper, it also covers existing clients and subclasses
+    patch_class_method(BaseApiClient, "async_request", patch_genai_async_request)
 
-        @wraps(original_init)
-        def patched_init(self, *args, **kwargs):
-            original_init(self, *args, **kwargs)
-            patch_genai_async_request(self, type(self))
 
-        return patched_init
-
-    BaseApiClient.__init__ = create_patched_init(BaseApiClient.__init__)
-
-
-def patch_genai_async_request(bound_obj, bound_cls):
-    original_function = bound_obj.async_request
-
-    @wraps(original_function)
+def patch_genai_async_request(original_async_request):
+    @wraps(original_async_request)
     async def patched_function(self, *args, **kwargs):
         api_type = "genai.BaseApiClient.async_request"
 
-        input_dict = get_input_dict(original_function, *args, **kwargs)
+        # genai doesn't expose full URL, only path (second argument after http_method)
+        path = args[1] if len(args) > 1 else kwargs.get("path", "")
+        if not is_whitelisted_host_path("", path.partition("?")[0]):
+            return await original_async_request(self, *args, **kwargs)
 
-        # genai doesn't expose full URL, only path
-        path = input_dict.get("path", "")
-        if not is_whitelisted_endpoint("*", path):
-            return await original_function(*args, **kwargs)
+        # Optional per-phase timing of this call (ao-record --profile)
+        profile = start_call_profile(api_type)
+
+        original_function = original_async_request.__get__(self, type(self))
+        with profile_phase("bind"):
+            input_dict = get_input_dict(original_function, *args, **kwargs)
+
+        # Serialize the call once, every stage below reads from this record
+        call = InterceptedCall(input_dict, api_type)
 
         # Content-based edge detection BEFORE get_in_out (uses original input)
         session_id = get_session_id()
-        source_node_ids = find_source_nodes(session_id, input_dict, api_type)
+        with profile_phase("string_matching"):
+            source_node_ids = find_source_nodes(session_id, call)
 
         # Get result from cache or call LLM
-        cache_output = DB.get_in_out(input_dict, api_type)
+        cache_output = await DB.get_in_out_async(call)
         if cache_output.output is None:
-            result = await original_function(**cache_output.input_dict)  # Call LLM
-            DB.cache_output(cache_result=cache_output, output_obj=result, api_type=api_type)
+            try:
+                with profile_phase("llm_call"):
+                    result = await original_function(**cache_output.input_dict)  # Call LLM
+            except BaseException:
+                DB.release_in_flight(cache_output)
+                raise
+            await DB.cache_output_async(
+                cache_result=cache_output, output_obj=result, api_type=api_type
+            )
 
         # Store output strings for future matching
-        store_output_strings(
-            cache_output.session_id, cache_output.node_id, cache_output.output, api_type
-        )
+        with profile_phase("string_matching"):
+            store_output_strings(cache_output.session_id, cache_output.node_id, call)
 
         # Send graph node to server
         send_graph_node_and_edges(
             node_id=cache_output.node_id,
-            input_dict=cache_output.input_dict,
-            output_obj=cache_output.output,
+            call=call,
             source_node_ids=source_node_ids,
-            api_type=api_type,
             stack_trace=cache_output.stack_trace,
         )
+        finish_call_profile(profile, cache_output.session_id, cache_output.node_id)
 
         return cache_output.output
 
-    bound_obj.async_request = patched_function.__get__(bound_obj, bound_cls)
+    return patched_function
@@ -1,7 +1,13 @@
 from functools import wraps
-from ao.runner.monkey_patching.patching_utils import get_input_dict, send_graph_node_and_edges
+from ao.runner.monkey_patching.patching_utils import (
+    get_input_dict,
+    patch_class_method,
+    send_graph_node_and_edges,
+)
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
 from ao.runner.string_matching import find_source_nodes, store_output_strings
 from ao.runner.context_manager import get_session_id
+from ao.runner.profiling import finish_call_profile, profile_phase, start_call_profile
 from ao.server.database_manager import DB
 from ao.common.logger import logger
 
@@ -13,60 +19,65 @@ def mcp_patch():
         logger.info("MCP not installed, skipping MCP patches")
         return
 
-    def create_patched_init(original_init):
+    # Class-level wrapper, it also covers existing sessions and subclasses
+    patch_class_method(ClientSession, "send_request", patch_mcp_send_request)
 
-        @wraps(original_init)
-        def patched_init(self, *args, **kwargs):
-            original_init(self, *args, **kwargs)
-            patch_mcp_send_request(self, type(self))
 
-        return patched_init
-
-    ClientSession.__init__ = create_patched_init(ClientSession.__init__)
-
-
-def patch_mcp_send_request(bound_obj, bound_cls):
-    original_function = bound_obj.send_request
-
-    @wraps(original_function)
+def patch_mcp_send_request(original_send_request):
+    @wraps(original_send_request)
     async def patched_function(self, *args, **kwargs):
         api_type = "MCP.ClientSession.send_request"
 
-        input_dict = get_input_dict(original_function, *args, **kwargs)
-
-        # Check if this is a tools/call request
-        request = input_dict.get("request")
+        # Check if this is a tools/call request before binding arguments
+        request = args[0] if args else kwargs.get("request")
         method = getattr(getattr(request, "root", None), "method", None) if request else None
         if method != "tools/call":
-            return await original_function(*args, **kwargs)
+            return await original_send_request(self, *args, **kwargs)
+
+        # Optional per-phase timing of this call (ao-record --profile)
+        profile = start_call_profile(api_type)
+
+        original_function = original_send_request.__get__(self, type(self))
+        with profile_phase("bind"):
+            input_dict = get_input_dict(original_function, *args, **kwargs)
+
+        # Serialize the call once, every stage below reads from this record
+        call = InterceptedCall(input_dict, api_type)
 
         # Content-based edge detection BEFORE get_in_out (uses original input)
         session_id = get_session_id()
-        source_node_ids = find_source_nodes(session_id, input_dict, api_type)
+        with profile_phase("string_matching"):
+            source_node_ids = find_source_nodes(session_id, call)
 
         # Get result from cache or call tool
-        cache_output = DB.get_in_out(input_dict, api_type)
+        cache_output = await DB.get_in_out_async(call)
         if cache_output.output is None:
-            result = await original_function(**cache_output.input_dict)  # Call tool
-            DB.cache_output(cache_result=cache_output, output_obj=result, api_type=api_type)
+            try:
+                with profile_phase("llm_call"):
+                    result = await original_function(**cache_output.input_dict)  # Call tool
+            except BaseException:
+                DB.release_in_flight(cache_output)
+                raise
+            await DB.cache_output_async(
+                cache_result=cache_output, output_obj=result, api_type=api_type
+            )
         else:
             cache_output.output = input_dict["result_type"].model_validate(cache_output.output)
+            call.output_obj = cache_output.output
 
         # Store output strings for future matching
-        store_output_strings(
-            cache_output.session_id, cache_output.node_id, cache_output.output, api_type
-        )
+        with profile_phase("string_matching"):
+            store_output_strings(cache_output.session_id, cache_output.node_id, call)
 
         # Send graph node to server
         send_graph_node_and_edges(
             node_id=cache_output.node_id,
-            input_dict=cache_output.input_dict,
-            output_obj=cache_output.output,
+            call=call,
             source_node_ids=source_node_ids,
-            api_type=api_type,
             stack_trace=cache_output.stack_trace,
         )
+        finish_call_profile(profile, cache_output.session_id, cache_output.node_id)
 
         return cache_output.output
 
-    bound_obj.send_request = patched_function.__get__(bound_obj, bound_cls)
+    return patched_function
@@ -1,10 +1,17 @@
 from functools import wraps
-from ao.runner.monkey_patching.patching_utils import get_input_dict, send_graph_node_and_edges
+from urllib.parse import urlsplit
+from ao.runner.monkey_patching.patching_utils import (
+    get_input_dict,
+    patch_class_method,
+    send_graph_node_and_edges,
+)
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
 from ao.runner.string_matching import find_source_nodes, store_output_strings
 from ao.runner.context_manager import get_session_id
+from ao.runner.profiling import finish_call_profile, profile_phase, start_call_profile
 from ao.server.database_manager import DB
 from ao.common.logger import logger
-from ao.common.utils import is_whitelisted_endpoint
+from ao.common.utils import is_whitelisted_host_path
 
 
 def requests_patch():
@@ -14,59 +21,61 @@ def requests_patch():
         logger.info("requests not installed, skipping requests patches")
         return
 
-    def create_patched_init(original_init):
+    # Class-level wrapper, it also covers existing sessions and subclasses
+    patch_class_method(Session, "send", patch_requests_send)
 
-        @wraps(original_init)
-        def patched_init(self, *args, **kwargs):
-            original_init(self, *args, **kwargs)
-            patch_requests_send(self, type(self))
 
-        return patched_init
-
-    Session.__init__ = create_patched_init(Session.__init__)
-
-
-def patch_requests_send(bound_obj, bound_cls):
-    original_function = bound_obj.send
-
-    @wraps(original_function)
+def patch_requests_send(original_send):
+    @wraps(original_send)
     def patched_function(self, *args, **kwargs):
 
         api_type = "requests.Session.send"
 
-        input_dict = get_input_dict(original_function, *args, **kwargs)
+        # Classify the endpoint before binding arguments: non-LLM traffic passes through
+        request = args[0] if args else kwargs.get("request")
+        url = urlsplit(str(request.url)) if request is not None else None
+        if url is None or not is_whitelisted_host_path(url.hostname or "", url.path):
+            return original_send(self, *args, **kwargs)
 
-        request = input_dict["request"]
-        url = str(request.url)
-        path = request.path_url
-        if not is_whitelisted_endpoint(url, path):
-            return original_function(*args, **kwargs)
+        # Optional per-phase timing of this call (ao-record --profile)
+        profile = start_call_profile(api_type)
+
+        original_function = original_send.__get__(self, type(self))
+        with profile_phase("bind"):
+            input_dict = get_input_dict(original_function, *args, **kwargs)
+
+        # Serialize the call once, every stage below reads from this record
+        call = InterceptedCall(input_dict, api_type)
 
         # Content-based edge detection BEFORE get_in_out (uses original input)
         session_id = get_session_id()
-        source_node_ids = find_source_nodes(session_id, input_dict, api_type)
+        with profile_phase("string_matching"):
+            source_node_ids = find_source_nodes(session_id, call)
 
         # Get result from cache or call LLM
-        cache_output = DB.get_in_out(input_dict, api_type)
+        cache_output = DB.get_in_out(call)
         if cache_output.output is None:
-            result = original_function(**cache_output.input_dict)  # Call LLM
+            try:
+                with profile_phase("llm_call"):
+                    result = original_function(**cache_output.input_dict)  # Call LLM
+            except BaseException:
+                DB.release_in_flight(cache_output)
+                raise
             DB.cache_output(cache_result=cache_output, output_obj=result, api_type=api_type)
 
         # Store output strings for future matching
-        store_output_strings(
-            cache_output.session_id, cache_output.node_id, cache_output.output, api_type
-        )
+        with profile_phase("string_matching"):
+            store_output_strings(cache_output.session_id, cache_output.node_id, call)
 
         # Send graph node to server
         send_graph_node_and_edges(
             node_id=cache_output.node_id,
-            input_dict=cache_output.input_dict,
-            output_obj=cache_output.output,
+            call=call,
             source_node_ids=source_node_ids,
-            api_type=api_type,
             stack_trace=cache_output.stack_trace,
         )
+        finish_call_profile(profile, cache_output.session_id, cache_output.node_id)
 
         return cache_output.output
 
-    bound_obj.send = patched_function.__get__(bound_obj, bound_cls)
+    return patched_function
@@ -2,20 +2,46 @@ import inspect
 import os
 import re
 import traceback
-from collections import defaultdict
+from functools import wraps
+from typing import Dict
 from ao.runner.context_manager import get_session_id
 from ao.common.constants import CERTAINTY_UNKNOWN
-from ao.common.utils import send_to_server, get_node_label, get_raw_model_name
+from ao.common.utils import send_to_server
 from ao.common.logger import logger
+from ao.runner.profiling import profile_phase
+from ao.runner.reachability import Reachability
+from ao.runner.string_matching import add_drop_listener, clear_session_data
+from ao.server.database_manager import DB
 
 
 # ===========================================================
 # Generic wrappers for caching and server notification
 # ===========================================================
 
-# str -> {str -> set(str)}
-# if we add a -> b, we go through every element. If a is in the set, we add b to the
-_graph_reachable_set = defaultdict(lambda: defaultdict(set))
+# session_id -> reachability between its nodes (for redundant edge pruning)
+_session_reachability: Dict[str, Reachability] = {}
+
+
+def _get_session_reachability(session_id):
+    if session_id not in _session_reachability:
+        _session_reachability.setdefault(session_id, Reachability())
+    return _session_reachability[session_id]
+
+
+def _drop_reachability(session_id, node_id):
+    # A node evicted by string matching can no longer be a source of edges
+    if session_id in _session_reachability:
+        _session_reachability[session_id].remove(node_id)
+
+
+add_drop_listener(_drop_reachability)
+
+
+def forget_session(session_id):
+    """Drop the edge detection state of a finished session (e.g., a subrun)."""
+    _session_reachability.pop(session_id, None)
+    clear_session_data(session_id)
+
 
 def capture_stack_trace() -> str:
     """Capture the current stack trace, showing only user code.
@@ -61,14 +87,29 @@ def capture_stack_trace() -> str:
     return "".join(user_frames).rstrip()
 
 
+# (function, is bound method) -> binder, see get_input_dict. The key is the underlying
+# function, so all instances of a patched class share one binder.
+_binders = {}
+
+
 def get_input_dict(func, *args, **kwargs):
     # Arguments are normalized to the function's parameter order.
     # func(a=5, b=2) and func(b=2, a=5) will result in same dict.
+    key = (getattr(func, "__func__", func), hasattr(func, "__self__"))
+    binder = _binders.get(key)
+    if binder is None:
+        binder = _binders[key] = _make_binder(func)
+    return binder(func, args, kwargs)
 
+
+def _get_signature(func):
+    """
+    Return (signature, prepend_self). prepend_self is True if the signature is the
+    unbound method's one and the bound object must be passed as first argument.
+    """
     # Try to get signature, handling "invalid method signature" error
-    sig = None
     try:
-        sig = inspect.signature(func)
+        return inspect.signature(func), False
     except ValueError as e:
         if "invalid method signature" in str(e):
             # This can happen with monkey-patched bound methods
@@ -79,21 +120,15 @@ def get_input_dict(func, *args, **kwargs):
                     cls = func.__self__.__class__
                     func_name = func.__name__
                     unbound_func = getattr(cls, func_name)
-                    sig = inspect.signature(unbound_func)
-
-                    # For unbound methods, we need to include 'self' in the arguments
-                    # when binding, so prepend the bound object as the first argument
-                    args = (func.__self__,) + args
+                    return inspect.signature(unbound_func), True
                 except (AttributeError, TypeError):
                     # If we can't get the unbound signature, re-raise the original error
                     raise e
-        else:
-            # Re-raise other ValueError exceptions
-            raise e
+        # Re-raise other ValueError exceptions
+        raise e
 
-    if sig is None:
-        raise ValueError("Could not obtain function signature")
 
+def _bind_with_signature(sig, args, kwargs) -> dict:
     try:
         bound = sig.bind(*args, **kwargs)
     except TypeError:
@@ -110,46 +145,167 @@ def get_input_dict(func, *args, **kwargs):
             input_dict.update(value)  # Flatten the captured extras
         else:
             input_dict[name] = value
-
     return input_dict
 
 
-def send_graph_node_and_edges(node_id, input_dict, output_obj, source_node_ids, api_type, stack_trace=None):
+def _make_binder(func):
+    """
+    Build the binder of func: binder(func, args, kwargs) -> input dict.
+
+    The patched functions have simple signatures, e.g. `send(request, *, stream, ...)`,
+    `send(request, **kwargs)`, `send_request(request, result_type, ...)` and
+    `async_request(http_method, path, request_dict, http_options=None)`: positional-or-
+    keyword parameters, then keyword-only ones and maybe **kwargs. For these, the
+    binder maps args/kwargs to parameter names directly. Anything unusual (other
+    signatures, missing or unexpected arguments) goes through Signature.bind.
+    """
+    sig, prepend_self = _get_signature(func)
+
+    if prepend_self:
+
+        def bind_unbound(func, args, kwargs):
+            return _bind_with_signature(sig, (func.__self__,) + args, kwargs)
+
+        return bind_unbound
+
+    def bind_slow(func, args, kwargs):
+        return _bind_with_signature(sig, args, kwargs)
+
+    P = inspect.Parameter
+    params = list(sig.parameters.values())
+    if any(p.kind not in (P.POSITIONAL_OR_KEYWORD, P.KEYWORD_ONLY, P.VAR_KEYWORD) for p in params):
+        return bind_slow
+
+    positional = tuple(p.name for p in params if p.kind == P.POSITIONAL_OR_KEYWORD)
+    named = tuple(p.name for p in params if p.kind != P.VAR_KEYWORD)
+    named_set = frozenset(named)
+    defaults = {p.name: p.default for p in params if p.default is not P.empty}
+    has_var_keyword = params[-1].kind == P.VAR_KEYWORD if params else False
+
+    def bind_fast(func, args, kwargs):
+        if len(args) > len(positional):
+            return bind_slow(func, args, kwargs)
+        given = dict(zip(positional, args))
+        extras = {}
+        for name, value in kwargs.items():
+            if name in named_set:
+                if name in given:
+                    return bind_slow(func, args, kwargs)
+                given[name] = value
+            elif has_var_keyword:
+                extras[name] = value
+            else:
+                return bind_slow(func, args, kwargs)
+
+        input_dict = {}
+        for name in named:
+            if name in given:
+                input_dict[name] = given[name]
+            elif name in defaults:
+                input_dict[name] = defaults[name]
+            else:
+                return bind_slow(func, args, kwargs)
+        input_dict.pop("self", None)
+        input_dict.update(extras)
+        return input_dict
+
+    return bind_fast
+
+
+def patch_class_method(cls, method_name, make_patched):
+    """
+    Replace cls.<method_name> with make_patched(original), once, at class level.
+
+    make_patched returns a function taking self like the original. Subclasses that
+    override the method, existing ones and ones defined later, get their own wrapper.
+    A wrapper only intercepts if it is the most-derived one for type(self), so an
+    override calling super() is recorded once, at the outermost level.
+    """
+
+    def wrap(klass):
+        original = klass.__dict__[method_name]
+        if getattr(original, "__ao_patched__", False):
+            return
+        patched = make_patched(original)
+
+        if inspect.iscoroutinefunction(original):
+
+            @wraps(original)
+            async def dispatch(self, *args, **kwargs):
+                if getattr(type(self), method_name) is not dispatch:
+                    return await original(self, *args, **kwargs)
+                return await patched(self, *args, **kwargs)
+
+        else:
+
+            @wraps(original)
+            def dispatch(self, *args, **kwargs):
+                if getattr(type(self), method_name) is not dispatch:
+                    return original(self, *args, **kwargs)
+                return patched(self, *args, **kwargs)
+
+        dispatch.__ao_patched__ = True
+        setattr(klass, method_name, dispatch)
+
+    def wrap_overrides(klass):
+        for subclass in klass.__subclasses__():
+            if method_name in subclass.__dict__:
+                wrap(subclass)
+            wrap_overrides(subclass)
+
+    wrap(cls)
+    wrap_overrides(cls)
+
+    original_init_subclass = cls.__dict__.get("__init_subclass__")
+
+    def __init_subclass__(subclass, **kwargs):
+        if original_init_subclass is not None:
+            original_init_subclass.__get__(None, subclass)(**kwargs)
+        else:
+            super(cls, subclass).__init_subclass__(**kwargs)
+        if method_name in subclass.__dict__:
+            wrap(subclass)
+
+    cls.__init_subclass__ = classmethod(__init_subclass__)
+
+
+def send_graph_node_and_edges(node_id, call, source_node_ids, stack_trace=None):
     """Send graph node and edge updates to the server."""
+    # Replay-only runs have no server (and no UI graph)
+    if DB.replay_only:
+        return
+
     # Use provided stack_trace or capture a new one
     if stack_trace is None:
-        stack_trace = capture_stack_trace()
-
-    # Import here to avoid circular import
-    from ao.runner.monkey_patching.api_parser import func_kwargs_to_json_str, api_obj_to_json_str
+        with profile_phase("stack_trace"):
+            stack_trace = capture_stack_trace()
 
-    # Get strings to display in UI.
-    input_string, attachments = func_kwargs_to_json_str(input_dict, api_type)
-    output_string = api_obj_to_json_str(output_obj, api_type)
-    model = get_raw_model_name(input_dict, api_type)
-    label = get_node_label(input_dict, api_type)
+    # Get strings to display in UI (serialized once per call by InterceptedCall).
+    input_string = call.input_json_str
+    attachments = call.attachments
+    output_string = call.output_json_str
+    model = call.model
+    label = call.label
     session_id = get_session_id()
 
-    for source_node_id in source_node_ids:
-        _graph_reachable_set[session_id][source_node_id].add(node_id)
-
-    for reachable_by_a in _graph_reachable_set[session_id].values():
-        if any(source_node_id in reachable_by_a for source_node_id in source_node_ids):
-            reachable_by_a.add(node_id)
+    reachability = _get_session_reachability(session_id)
+    with profile_phase("reachability"):
+        reachability.add(node_id, source_node_ids)
 
     # Store input for this node (needed for containment checks)
     from ao.runner.string_matching import store_input_strings, output_contained_in_input
-    store_input_strings(session_id, node_id, input_dict, api_type)
+
+    with profile_phase("string_matching"):
+        store_input_strings(session_id, node_id, call)
 
     # Filter redundant source nodes: if node_b is reachable from node_a and node_a's output
     # is contained in node_b's input, remove node_a (its content already flows through node_b)
-    nodes_to_remove = set()
-    for node_a in source_node_ids:
-        for node_b in source_node_ids:
-            if node_a != node_b and node_b in _graph_reachable_set[session_id][node_a]:
-                if output_contained_in_input(session_id, node_a, node_b):
-                    nodes_to_remove.add(node_a)
-    source_node_ids = [n for n in source_node_ids if n not in nodes_to_remove]
+    with profile_phase("reachability"):
+        nodes_to_remove = reachability.redundant_sources(
+            source_node_ids,
+            lambda node_a, node_b: output_contained_in_input(session_id, node_a, node_b),
+        )
+        source_node_ids = [n for n in source_node_ids if n not in nodes_to_remove]
 
     # Send node
     node_msg = {
@@ -168,7 +324,8 @@ def send_graph_node_and_edges(node_id, input_dict, output_obj, source_node_ids,
         "incoming_edges": source_node_ids,
     }
 
-    try:
-        send_to_server(node_msg)
-    except Exception as e:
-        logger.error(f"Failed to send add_node: {e}")
+    with profile_phase("server_send"):
+        try:
+            send_to_server(node_msg)
+        except Exception as e:
+            logger.error(f"Failed to send add_node: {e}")
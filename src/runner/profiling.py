@@ -0,0 +1,229 @@
+"""
+Optional per-phase timing of intercepted calls.
+
+With `ao-record --profile [RATE]` (or AO_PROFILE=<rate>), a sampled share of the
+intercepted calls gets a CallProfile. The patches, InterceptedCall and the
+DatabaseManager charge their work to named phases of the current profile (see
+PHASES). Phases are exclusive: a phase entered inside another one pauses it,
+so the phases of a call add up to the time AO spent on it plus the live call.
+
+Finished profiles become call_metrics rows (one per node and phase, plus a
+"total" row). Rows are buffered and written in batches on the DB executor;
+flush_call_metrics() writes the rest when the run ends. When profiling is off,
+every hook is a module-level check and returns immediately.
+"""
+
+import atexit
+import random
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from ao.common.constants import CALL_METRICS_FLUSH_ROWS
+from ao.common.logger import logger
+
+PHASES = (
+    "bind",  # get_input_dict
+    "serialize",  # input to JSON (raw / to_show), cache key
+    "hash",  # input hash
+    "stack_trace",  # capture_stack_trace
+    "cache_lookup",  # llm_calls lookup and decoding a cached output
+    "decompress",  # decompressing a cached input overwrite or output (see blob_compression)
+    "in_flight_wait",  # waiting for an identical call in flight (single-flight follower)
+    "llm_call",  # the live call (cache miss)
+    "output_encode",  # output to JSON
+    "db_write",  # llm_calls insert (or enqueue in write-behind mode)
+    "compress",  # compressing the llm_calls row (in write-behind mode, the writer thread does)
+    "string_matching",  # edge detection and storing strings for later matching
+    "reachability",  # reachable-set update and redundant edge filtering
+    "server_send",  # add_node message to the server
+)
+TOTAL = "total"
+
+_current_profile: ContextVar[Optional["CallProfile"]] = ContextVar("ao_call_profile", default=None)
+_NO_PHASE = nullcontext()
+
+_sample_rate = 0.0
+# Own generator: sampling must not consume the user's (seeded) random stream.
+_sampler = random.Random()
+
+_pending_rows: List[tuple] = []
+_pending_lock = threading.Lock()
+
+
+class CallProfile:
+    """Phase durations of one intercepted call."""
+
+    __slots__ = ("api_type", "durations", "_stack", "_start")
+
+    def __init__(self, api_type: str):
+        self.api_type = api_type
+        self.durations: Dict[str, float] = {}
+        self._stack = []  # [phase, start of its current slice]
+        self._start = time.perf_counter()
+
+    def enter(self, phase: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(self._stack[-1], now)
+        self._stack.append([phase, now])
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        self._charge(self._stack.pop(), now)
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def _charge(self, frame, now: float) -> None:
+        phase, start = frame
+        self.durations[phase] = self.durations.get(phase, 0.0) + now - start
+
+
+class _Phase:
+    __slots__ = ("profile", "name")
+
+    def __init__(self, profile: CallProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profile.exit()
+
+
+def enable_profiling(sample_rate: float = 1.0) -> None:
+    """Profile a share sample_rate (0 < rate <= 1) of the intercepted calls."""
+    global _sample_rate
+    if not _sample_rate:
+        atexit.register(flush_call_metrics)
+    _sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+    logger.info(f"Call profiling enabled (sample rate {_sample_rate})")
+
+
+def start_call_profile(api_type: str) -> Optional[CallProfile]:
+    """Start profiling an intercepted call if it is sampled, returns its profile or None."""
+    if not _sample_rate:
+        return None
+    profile = None
+    if _sample_rate >= 1.0 or _sampler.random() < _sample_rate:
+        profile = CallProfile(api_type)
+    # Also clears the profile of a call that raised before finishing.
+    _current_profile.set(profile)
+    return profile
+
+
+def profile_phase(name: str):
+    """Context manager charging the enclosed work to phase name of the current call."""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NO_PHASE
+    return _Phase(profile, name)
+
+
+def finish_call_profile(profile: Optional[CallProfile], session_id: str, node_id: str) -> None:
+    """Turn the profile of a finished call into call_metrics rows."""
+    if profile is None:
+        return
+    _current_profile.set(None)
+    total = time.perf_counter() - profile._start
+    rows = [
+        (session_id, node_id, profile.api_type, phase, seconds * 1000)
+        for phase, seconds in profile.durations.items()
+    ]
+    rows.append((session_id, node_id, profile.api_type, TOTAL, total * 1000))
+    with _pending_lock:
+        _pending_rows.extend(rows)
+        full = len(_pending_rows) >= CALL_METRICS_FLUSH_ROWS
+    if full:
+        flush_call_metrics(wait=False)
+
+
+def flush_call_metrics(wait: bool = True) -> None:
+    """Write buffered call_metrics rows on the DB executor (and wait for it)."""
+    with _pending_lock:
+        rows = _pending_rows[:]
+        del _pending_rows[:]
+    if not rows:
+        return
+    from ao.server.database_manager import DB
+
+    future = DB.db_executor.submit(_write_rows, DB, rows)
+    if wait:
+        future.result()
+
+
+def _write_rows(DB, rows) -> None:
+    try:
+        DB.add_call_metrics(rows)
+    except Exception as e:
+        logger.warning(f"Failed to write {len(rows)} call metrics rows: {e}")
+
+
+def summarize_call_metrics(rows) -> dict:
+    """
+    Aggregate call_metrics rows of a session per phase and per node.
+
+    AO's overhead is the total time of a call minus its llm_call phase.
+    """
+    per_node: Dict[str, dict] = {}
+    for row in rows:
+        node = per_node.setdefault(
+            row["node_id"], {"node_id": row["node_id"], "api_type": row["api_type"], "ms": {}}
+        )
+        node["ms"].setdefault(row["phase"], []).append(row["duration_ms"])
+
+    phase_samples: Dict[str, List[float]] = {}
+    nodes = []
+    for node in per_node.values():
+        recordings = len(node["ms"].get(TOTAL, [])) or 1
+        phases = {phase: sum(values) / recordings for phase, values in node["ms"].items()}
+        for phase, values in node["ms"].items():
+            phase_samples.setdefault(phase, []).extend(values)
+        total = phases.pop(TOTAL, 0.0)
+        nodes.append(
+            {
+                "node_id": node["node_id"],
+                "api_type": node["api_type"],
+                "recordings": recordings,
+                "total_ms": round(total, 3),
+                "overhead_ms": round(total - phases.get("llm_call", 0.0), 3),
+                "phases_ms": {phase: round(ms, 3) for phase, ms in _in_phase_order(phases)},
+            }
+        )
+
+    calls = len(phase_samples.get(TOTAL, []))
+    total_ms = sum(phase_samples.get(TOTAL, []))
+    llm_ms = sum(phase_samples.get("llm_call", []))
+    return {
+        "calls": calls,
+        "total_ms": round(total_ms, 3),
+        "overhead_ms": round(total_ms - llm_ms, 3),
+        "overhead_per_call_ms": round((total_ms - llm_ms) / calls, 3) if calls else 0.0,
+        "phases": {
+            phase: _stats(values)
+            for phase, values in _in_phase_order(phase_samples)
+            if phase != TOTAL
+        },
+        "nodes": nodes,
+    }
+
+
+def _in_phase_order(by_phase: dict) -> list:
+    order = {phase: i for i, phase in enumerate(PHASES)}
+    return sorted(by_phase.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+
+def _stats(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total_ms": round(sum(values), 3),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(values[len(values) // 2], 3),
+        "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max_ms": round(values[-1], 3),
+    }
@@ -0,0 +1,92 @@
+"""
+Transitive reachability between the nodes of a session's dataflow graph.
+
+`send_graph_node_and_edges` drops an edge a -> n when another source b of n is
+reachable from a and already carries a's output (see string_matching's
+`output_contained_in_input`). Each node gets a bit, in the order nodes are
+added, and keeps the bits of its ancestors as one Python int: adding a node ORs
+the rows of its sources (a few machine words per 64 nodes, in C), and "is b
+reachable from a" tests one bit. Nodes are only added after their sources, so
+rows never need updating afterwards.
+"""
+
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Set
+
+
+def iter_bits(bits: int) -> Iterable[int]:
+    """Positions of the set bits of bits, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class Reachability:
+    """Ancestor bitmaps of the nodes of a session."""
+
+    def __init__(self):
+        # node_id -> bit
+        self._bits: Dict[str, int] = {}
+        # bit -> node_id
+        self._node_ids: Dict[int, str] = {}
+        # node_id -> bits of its ancestors
+        self._ancestors: Dict[str, int] = {}
+        self._next_bit = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+    def _bit(self, node_id: str) -> int:
+        bit = self._bits.get(node_id)
+        if bit is None:
+            bit = self._bits[node_id] = next(self._next_bit)
+            self._node_ids[bit] = node_id
+        return bit
+
+    def add(self, node_id: str, source_node_ids: Iterable[str]) -> None:
+        """Add node_id with edges from source_node_ids (added before)."""
+        with self._lock:
+            ancestors = self._ancestors.get(node_id, 0)
+            for source_node_id in source_node_ids:
+                ancestors |= self._ancestors.get(source_node_id, 0) | (
+                    1 << self._bit(source_node_id)
+                )
+            self._bit(node_id)
+            self._ancestors[node_id] = ancestors
+
+    def remove(self, node_id: str) -> None:
+        """Forget a node that can no longer be a source (its bit stays set in its descendants)."""
+        with self._lock:
+            self._ancestors.pop(node_id, None)
+            bit = self._bits.pop(node_id, None)
+            self._node_ids.pop(bit, None)
+
+    def reaches(self, node_a: str, node_b: str) -> bool:
+        """Whether node_b is reachable from node_a."""
+        bit = self._bits.get(node_a)
+        return bit is not None and bool(self._ancestors.get(node_b, 0) >> bit & 1)
+
+    def redundant_sources(
+        self, source_node_ids: List[str], contained: Callable[[str, str], bool]
+    ) -> Set[str]:
+        """
+        Sources a with another source b reachable from a and contained(a, b).
+
+        Only the pairs (a, b) with a an ancestor of b are checked, and none for
+        an a already found redundant.
+        """
+        with self._lock:
+            bits = {self._bits[n]: n for n in source_node_ids if n in self._bits}
+            rows = [(n, self._ancestors.get(n, 0)) for n in source_node_ids]
+        sources = sum(1 << bit for bit in bits)
+        redundant, redundant_bits = set(), 0
+        for node_b, ancestors in rows:
+            for bit in iter_bits(ancestors & sources & ~redundant_bits):
+                node_a = bits[bit]
+                if node_a != node_b and contained(node_a, node_b):
+                    redundant.add(node_a)
+                    redundant_bits |= 1 << bit
+        return redundant
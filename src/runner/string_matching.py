@@ -4,17 +4,34 @@ String matching for content-based edge detection.
 This module implements the matching algorithm that determines which previous
 LLM outputs appear in a new LLM's input, establishing dataflow edges.
 
-Uses word-level longest contiguous match via difflib.SequenceMatcher.
+Uses word-level longest contiguous match via difflib.SequenceMatcher, run only
+on the outputs that a k-gram index of the session's outputs (kgram_index.py)
+lets through.
 """
 
+import atexit
+import itertools
 import re
-import json
-from difflib import SequenceMatcher
-from typing import List, Dict, Any
-from flatten_json import flatten
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from difflib import Match, SequenceMatcher
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Sequence, Set, Tuple
 from ao.common.logger import logger
-from ao.common.constants import COMPILED_STRING_MATCH_EXCLUDE_PATTERNS
-from ao.runner.monkey_patching.api_parser import func_kwargs_to_json_str, api_obj_to_json_str
+from ao.common.constants import (
+    AO_CACHE,
+    COMPILED_STRING_MATCH_EXCLUDE_PATTERNS,
+    STRING_MATCH_MAX_MB,
+    STRING_MATCH_SPILL,
+)
+from ao.runner.kgram_index import KGramIndex, kgram_hashes
+from ao.runner.match_memory import MatchMemory, SpillStore
+from ao.runner.monkey_patching.api_parser import func_kwargs_to_json_dict, api_obj_to_json_dict
+from ao.server.database_manager import DB
+
+if TYPE_CHECKING:
+    from ao.runner.monkey_patching.intercepted_call import InterceptedCall
 
 
 # ===========================================================
@@ -29,22 +46,18 @@ MIN_MATCH_WORDS = 3
 # This catches cases where the match is significant relative to both texts
 MIN_COVERAGE_PRODUCT = 0.1
 
+# Tokens of the input strings cached per session (see InputSegment)
+SEGMENT_CACHE_TOKENS = 500_000
+
+# Estimated memory per indexed k-gram of an output, including the per-node entries of the index
+INDEX_ENTRY_BYTES = 400
+
 
 # ===========================================================
 # Tokenization
 # ===========================================================
 
 
-def get_graph_topology(session_id: str):
-    import json
-    from ao.server.database_manager import DB
-
-    row = DB.get_graph(session_id=session_id)
-    if row:
-        return json.loads(row["graph_topology"])
-    return None
-
-
 def split_html_content(text: str) -> List[str]:
     """
     Split text containing HTML into separate content chunks.
@@ -81,20 +94,44 @@ def tokenize(text: str) -> List[str]:
     return cleaned.split()
 
 
-def compute_longest_match(output_words: List[str], input_words: List[str]) -> int:
+def input_matcher(input_words: Sequence) -> SequenceMatcher:
+    """
+    SequenceMatcher indexing input_words once, to match many outputs against it.
+
+    SequenceMatcher caches its word positions of the second sequence only.
+    """
+    return SequenceMatcher(None, (), input_words, autojunk=False)
+
+
+def longest_match(
+    output_words: Sequence, input_words: Sequence, matcher: Optional[SequenceMatcher] = None
+) -> Optional[Match]:
+    """Longest contiguous matching word sequence (a, b, size), None if a side is empty."""
+    if not output_words or not input_words:
+        return None
+    if matcher is None:
+        matcher = input_matcher(input_words)
+    matcher.set_seq1(output_words)
+    return matcher.find_longest_match(0, len(output_words), 0, len(input_words))
+
+
+def compute_longest_match(
+    output_words: Sequence, input_words: Sequence, matcher: Optional[SequenceMatcher] = None
+) -> int:
     """
     Compute longest contiguous matching word sequence.
 
-    Uses difflib.SequenceMatcher which is optimized for this purpose.
+    Uses difflib.SequenceMatcher which is optimized for this purpose. Words may
+    be strings or their interned ids (see Vocabulary).
+
+    Args:
+        matcher: input_matcher(input_words), when several outputs are matched against one input
 
     Returns:
         Length of longest contiguous match in words.
     """
-    if not output_words or not input_words:
-        return 0
-    sm = SequenceMatcher(None, output_words, input_words, autojunk=False)
-    match = sm.find_longest_match(0, len(output_words), 0, len(input_words))
-    return match.size
+    match = longest_match(output_words, input_words, matcher)
+    return match.size if match is not None else 0
 
 
 # ===========================================================
@@ -102,12 +139,77 @@ def compute_longest_match(output_words: List[str], input_words: List[str]) -> in
 # ===========================================================
 
 
-def _filter_excluded_keys(flattened: Dict[str, Any]) -> List[str]:
-    """Filter out keys matching STRING_MATCH_ADDITIONAL_EXCLUDE_PATTERNS."""
-    return [
-        v for k, v in flattened.items()
-        if isinstance(v, str) and not any(p.match(k) for p in COMPILED_STRING_MATCH_EXCLUDE_PATTERNS)
-    ]
+class KeyFilter:
+    """
+    Matches flattened keys ("messages.0.role") against exclude patterns.
+
+    Patterns of the form ".*<word>$" (all of STRING_MATCH_EXCLUDE_PATTERNS) hold no
+    ".", so they match a key iff they match its last part: they are checked with one
+    str.endswith on the last part, memoized per part. Other patterns, and keys with a
+    newline (which ".*" does not cross), are matched with their regex.
+    """
+
+    _SUFFIX_PATTERN = re.compile(r"\.\*(\w+)\$")
+    _MAX_CACHED_PARTS = 10_000
+
+    def __init__(self, patterns: List[re.Pattern]):
+        suffixes = [self._SUFFIX_PATTERN.fullmatch(p.pattern) for p in patterns]
+        self._suffixes = tuple(m.group(1) for m in suffixes if m)
+        self._regexes = [p for p, m in zip(patterns, suffixes) if not m]
+        self._patterns = patterns
+        self._parts: Dict[str, bool] = {}
+
+    def excluded(self, key: str, part: str) -> bool:
+        """Whether a pattern matches key, whose last part is part."""
+        if "\n" in key:
+            return any(p.match(key) for p in self._patterns)
+        excluded = self._parts.get(part)
+        if excluded is None:
+            excluded = part.endswith(self._suffixes)
+            if len(self._parts) >= self._MAX_CACHED_PARTS:
+                self._parts.clear()
+            self._parts[part] = excluded
+        return excluded or bool(self._regexes) and any(p.match(key) for p in self._regexes)
+
+
+_EXCLUDED_KEYS = KeyFilter(COMPILED_STRING_MATCH_EXCLUDE_PATTERNS)
+
+
+def _collect_strings(obj: Any, key: str, part: str, strings: List[str]) -> None:
+    """Append the strings under obj (at flattened key) not excluded by their key."""
+    # Same walk and keys as flatten_json.flatten(to_show, "."), but list indices are always str
+    if isinstance(obj, str):
+        if not _EXCLUDED_KEYS.excluded(key, part):
+            strings.append(obj)
+    elif not obj:
+        return  # Empty containers and other falsy leaves hold no text
+    elif isinstance(obj, dict):
+        for child_key, child in obj.items():
+            child_part = str(child_key)
+            _collect_strings(
+                child, f"{key}.{child_part}" if key else child_part, child_part, strings
+            )
+    elif isinstance(obj, (list, set, tuple)):
+        for index, child in enumerate(obj):
+            child_part = str(index)
+            _collect_strings(
+                child, f"{key}.{child_part}" if key else child_part, child_part, strings
+            )
+
+
+def extract_strings(to_show: Dict[str, Any]) -> List[str]:
+    """
+    Extract the text strings of a to_show projection, skipping excluded keys.
+
+    Walks to_show once, in the order of flatten_json.flatten(to_show, "."), and
+    skips the strings whose flattened key matches COMPILED_STRING_MATCH_EXCLUDE_PATTERNS.
+    Unlike flatten, it keeps all strings of colliding keys ({"a.b": .., "a": {"b": ..}}).
+    """
+    if not isinstance(to_show, dict):
+        raise TypeError(f"to_show must be a dict, got {type(to_show).__name__}")
+    strings: List[str] = []
+    _collect_strings(to_show, "", "", strings)
+    return strings
 
 
 def extract_input_text(input_dict: Dict[str, Any], api_type: str) -> str:
@@ -118,8 +220,7 @@ def extract_input_text(input_dict: Dict[str, Any], api_type: str) -> str:
     stored output string appears in this input text).
     """
     try:
-        flattened = flatten(json.loads(func_kwargs_to_json_str(input_dict, api_type)[0])["to_show"], ".")
-        strings = _filter_excluded_keys(flattened)
+        strings = extract_strings(func_kwargs_to_json_dict(input_dict, api_type)[0]["to_show"])
         return "\n".join(strings)
     except Exception as e:
         logger.error(f"Error extracting input text: {e}")
@@ -135,45 +236,312 @@ def extract_output_text(output_obj: Any, api_type: str) -> List[str]:
     exclude metadata fields that would cause spurious matches.
     """
     try:
-        flattened = flatten(json.loads(api_obj_to_json_str(output_obj, api_type))["to_show"], ".")
-        return _filter_excluded_keys(flattened)
+        return extract_strings(api_obj_to_json_dict(output_obj, api_type)["to_show"])
     except Exception as e:
         logger.error(f"Error extracting output text: {e}")
         return []
 
+
 # ===========================================================
 # Session Data Management
 # ===========================================================
 
+
+class Vocabulary:
+    """
+    Interns the words of a session to integer ids.
+
+    Stored words are kept as array('I') buffers of ids (4 bytes per word instead
+    of a pointer to a str object per word), which SequenceMatcher and the k-gram
+    index compare as cheaply as any hashable.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        # next() and dict.setdefault are atomic, so threads of the agent can intern concurrently
+        self._next_id = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _intern(self, word: str) -> int:
+        return self._ids.setdefault(word, next(self._next_id))
+
+    def encode(self, words: List[str]) -> array:
+        """Ids of words, interning the new ones."""
+        get = self._ids.get
+        return array("I", [get(word) or self._intern(word) for word in words])
+
+
 # In-memory storage for session outputs
-# Structure: {session_id: {node_id: [[word_lists]]}}
-_session_outputs: Dict[str, Dict[str, List[List[str]]]] = {}
+# Structure: {session_id: {node_id: [word_id_arrays]}}
+_session_outputs: Dict[str, Dict[str, List[array]]] = {}
 
 # In-memory storage for session inputs
-# Structure: {session_id: {node_id: [word_list]}}
-_session_inputs: Dict[str, Dict[str, List[str]]] = {}
+# Structure: {session_id: {node_id: (word_id_array per input string)}}
+_session_inputs: Dict[str, Dict[str, Tuple[array, ...]]] = {}
+
+# Word ids of the stored outputs and inputs
+# Structure: {session_id: Vocabulary}
+_session_vocabularies: Dict[str, Vocabulary] = {}
 
+# k-gram index of the session outputs (candidates for find_source_nodes)
+# Structure: {session_id: KGramIndex}
+_session_indexes: Dict[str, KGramIndex] = {}
 
-def _get_session_outputs(session_id: str) -> Dict[str, List[List[str]]]:
+# Results of output_contained_in_input, with the index version of node_a's outputs
+# Structure: {session_id: {node_b_id: {node_a_id: (version, contained)}}}
+_session_containment: Dict[str, Dict[str, Dict[str, Tuple[Optional[int], bool]]]] = {}
+
+
+def _get_session_outputs(session_id: str) -> Dict[str, List[array]]:
     """Get or create output storage for a session."""
     if session_id not in _session_outputs:
         _session_outputs[session_id] = {}
     return _session_outputs[session_id]
 
 
-def _get_session_inputs(session_id: str) -> Dict[str, List[str]]:
+def _get_session_inputs(session_id: str) -> Dict[str, Tuple[array, ...]]:
     """Get or create input storage for a session."""
     if session_id not in _session_inputs:
         _session_inputs[session_id] = {}
     return _session_inputs[session_id]
 
 
+def _get_session_vocabulary(session_id: str) -> Vocabulary:
+    """Get or create the word vocabulary of a session."""
+    if session_id not in _session_vocabularies:
+        _session_vocabularies.setdefault(session_id, Vocabulary())
+    return _session_vocabularies[session_id]
+
+
+def _get_session_index(session_id: str) -> KGramIndex:
+    """Get or create the output k-gram index of a session."""
+    if session_id not in _session_indexes:
+        # A match needs more than MIN_MATCH_WORDS words, so a common k-gram of one more
+        _session_indexes.setdefault(session_id, KGramIndex(MIN_MATCH_WORDS + 1, min_match_len))
+    return _session_indexes[session_id]
+
+
 def clear_session_data(session_id: str) -> None:
-    """Clear session data when a session is erased or restarted."""
-    if session_id in _session_outputs:
-        del _session_outputs[session_id]
-    if session_id in _session_inputs:
-        del _session_inputs[session_id]
+    """Clear session data when a session is erased, restarted or finished."""
+    with _store_lock:
+        if session_id in _session_outputs:
+            del _session_outputs[session_id]
+        if session_id in _session_inputs:
+            del _session_inputs[session_id]
+        _session_vocabularies.pop(session_id, None)
+        _session_indexes.pop(session_id, None)
+        _session_segments.pop(session_id, None)
+        _session_containment.pop(session_id, None)
+        _memory.forget_session(session_id)
+        if _session_spilled.pop(session_id, None) and _spill_store is not None:
+            _spill_store.drop_session(session_id)
+
+
+# ===========================================================
+# Memory budget (see match_memory.py)
+# ===========================================================
+
+_memory = MatchMemory(int(STRING_MATCH_MAX_MB * 1_000_000))
+
+# Evicted token arrays, None to drop them instead
+_spill_store: Optional[SpillStore] = None
+
+# Nodes whose token arrays are in _spill_store (their outputs stay in the k-gram index)
+# Structure: {session_id: {node_id}}
+_session_spilled: Dict[str, Set[str]] = {}
+
+# Called with (session_id, node_id) when a node is dropped: it can no longer be an edge source
+_drop_listeners: List[Callable[[str, str], None]] = []
+
+# Evicting and paging in move a node between the stores above
+_store_lock = threading.RLock()
+
+
+def configure_memory(max_mb: float = STRING_MATCH_MAX_MB, spill: bool = STRING_MATCH_SPILL) -> None:
+    """Set the memory budget of the stored outputs and inputs, and whether evicted ones are spilled to disk."""
+    global _spill_store
+    _memory.max_bytes = int(max_mb * 1_000_000)
+    if spill and _spill_store is None:
+        _spill_store = SpillStore(AO_CACHE)
+        atexit.register(_spill_store.close)
+        logger.info(f"String matching spills beyond {max_mb} MB to {_spill_store.path}")
+    _enforce_memory_budget()
+
+
+def add_drop_listener(listener: Callable[[str, str], None]) -> None:
+    """Call listener(session_id, node_id) when a node is evicted without spilling."""
+    _drop_listeners.append(listener)
+
+
+def _node_bytes(session_id: str, node_id: str) -> int:
+    """Estimated memory of the stored outputs and inputs of a node."""
+    arrays = itertools.chain(
+        _session_outputs.get(session_id, {}).get(node_id, ()),
+        _session_inputs.get(session_id, {}).get(node_id, ()),
+    )
+    nbytes = sum(len(tokens) * tokens.itemsize + 64 for tokens in arrays)
+    return nbytes + len(_get_session_index(session_id).kgrams(node_id)) * INDEX_ENTRY_BYTES
+
+
+def _charge(session_id: str, node_id: str) -> None:
+    _memory.charge(session_id, node_id, _node_bytes(session_id, node_id))
+
+
+def _enforce_memory_budget() -> None:
+    """Evict the least recently matched nodes beyond the memory budget."""
+    for session_id, node_id in _memory.take_over_budget():
+        with _store_lock:
+            outputs = _session_outputs.get(session_id, {}).pop(node_id, None)
+            inputs = _session_inputs.get(session_id, {}).pop(node_id, None)
+            if outputs is None and inputs is None:
+                continue
+            if _spill_store is not None:
+                _spill_store.put(session_id, node_id, outputs or [], inputs or ())
+                _session_spilled.setdefault(session_id, set()).add(node_id)
+                continue
+            if session_id in _session_indexes:
+                _session_indexes[session_id].remove(node_id)
+            _session_containment.get(session_id, {}).pop(node_id, None)
+        for listener in _drop_listeners:
+            listener(session_id, node_id)
+
+
+def _page_in(session_id: str, node_id: str) -> None:
+    """Read back the token arrays of a spilled node."""
+    with _store_lock:
+        spilled = _session_spilled.get(session_id)
+        if not spilled or node_id not in spilled:
+            return
+        spilled.discard(node_id)
+        outputs, inputs = _spill_store.take(session_id, node_id)
+        # Outputs or inputs stored again since the node was spilled are newer
+        if outputs:
+            _get_session_outputs(session_id).setdefault(node_id, outputs)
+        if inputs:
+            _get_session_inputs(session_id).setdefault(node_id, tuple(inputs))
+        _charge(session_id, node_id)
+
+
+def _node_outputs(session_id: str, node_id: str) -> List[array]:
+    """Stored output token arrays of a node, paged in if it was spilled."""
+    outputs = _session_outputs.get(session_id, {}).get(node_id)
+    if outputs is None and node_id in _session_spilled.get(session_id, ()):
+        _page_in(session_id, node_id)
+        outputs = _session_outputs.get(session_id, {}).get(node_id)
+    return outputs or []
+
+
+def _node_inputs(session_id: str, node_id: str) -> Tuple[array, ...]:
+    """Stored input token arrays of a node, paged in if it was spilled."""
+    inputs = _session_inputs.get(session_id, {}).get(node_id)
+    if inputs is None and node_id in _session_spilled.get(session_id, ()):
+        _page_in(session_id, node_id)
+        inputs = _session_inputs.get(session_id, {}).get(node_id)
+    return inputs or ()
+
+
+# ===========================================================
+# Incremental input matching
+# ===========================================================
+#
+# Chat agents resend the whole history on every call, so most strings of an
+# input (system prompt, earlier messages, tool schemas) were already in an
+# earlier input of the session. Inputs are tokenized string by string and each
+# string's tokens, k-grams and the outputs matched within it are cached: only
+# new strings are tokenized, and an output that matched within a string that is
+# still part of the input matches again without running SequenceMatcher.
+
+
+class InputSegment:
+    """Cached matching state of one input string."""
+
+    __slots__ = ("tokens", "kgrams", "matched")
+
+    def __init__(self, tokens: array, k: int):
+        self.tokens = tokens
+        self.kgrams = frozenset(kgram_hashes(tokens, k))
+        # (node_id, list index, version) of the outputs whose longest match lies within this string
+        self.matched: Set[Tuple[str, int, int]] = set()
+
+
+class MatchingInput:
+    """An input as matched against the session outputs."""
+
+    __slots__ = ("segments", "offsets", "tokens", "kgrams")
+
+    def __init__(self, segments: List[InputSegment], k: int):
+        self.segments = segments
+        self.offsets = []
+        self.tokens = array("I")
+        for segment in segments:
+            self.offsets.append(len(self.tokens))
+            self.tokens.extend(segment.tokens)
+        # k-grams spanning two strings are not in any segment
+        boundary_kgrams = set()
+        for offset in self.offsets[1:]:
+            window = self.tokens[max(0, offset - k + 1) : offset + k - 1]
+            boundary_kgrams.update(kgram_hashes(window, k))
+        self.kgrams = boundary_kgrams.union(*(segment.kgrams for segment in segments))
+
+    def segment_of(self, start: int, size: int) -> Optional[InputSegment]:
+        """The segment holding tokens[start : start + size], None if they span several."""
+        i = bisect_right(self.offsets, start) - 1
+        segment = self.segments[i]
+        if start + size <= self.offsets[i] + len(segment.tokens):
+            return segment
+        return None
+
+
+class SegmentCache:
+    """Input segments of a session by string, least recently used evicted beyond SEGMENT_CACHE_TOKENS."""
+
+    def __init__(self):
+        self._segments: "OrderedDict[str, InputSegment]" = OrderedDict()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, string: str) -> InputSegment:
+        """Cached segment of an input string, tokenized on first use."""
+        with self._lock:
+            segment = self._segments.get(string)
+            if segment is not None:
+                self._segments.move_to_end(string)
+                return segment
+
+        tokens = _get_session_vocabulary(session_id).encode(tokenize(string))
+        segment = InputSegment(tokens, _get_session_index(session_id).k)
+        with self._lock:
+            if string not in self._segments:
+                self._tokens += len(tokens)
+            self._segments[string] = segment
+            while self._segments and self._tokens > SEGMENT_CACHE_TOKENS:
+                _, evicted = self._segments.popitem(last=False)
+                self._tokens -= len(evicted.tokens)
+        return segment
+
+
+# Structure: {session_id: SegmentCache}
+_session_segments: Dict[str, SegmentCache] = {}
+
+
+def _get_session_segments(session_id: str) -> SegmentCache:
+    """Get or create the input segment cache of a session."""
+    if session_id not in _session_segments:
+        _session_segments.setdefault(session_id, SegmentCache())
+    return _session_segments[session_id]
+
+
+def matching_input(session_id: str, call: "InterceptedCall") -> MatchingInput:
+    """The input of call as matched in session_id, built once per call."""
+    if call.matching_input is None:
+        cache = _get_session_segments(session_id)
+        segments = [cache.get(session_id, string) for string in call.input_strings]
+        call.matching_input = MatchingInput(
+            [segment for segment in segments if segment.tokens], _get_session_index(session_id).k
+        )
+    return call.matching_input
 
 
 # ===========================================================
@@ -182,12 +550,15 @@ def clear_session_data(session_id: str) -> None:
 
 
 def is_content_match(
-    output_words: List[str],
-    input_words: List[str],
+    output_words: Sequence,
+    input_words: Sequence,
+    match_len: Optional[int] = None,
 ) -> tuple[bool, str, int, float]:
     """
     Determine if output content matches input content.
 
+    match_len is the longest match of the two, if it was computed already.
+
     Returns:
         Tuple of (is_match, match_type, match_len, coverage_product)
         - is_match: True if criteria met
@@ -195,7 +566,8 @@ def is_content_match(
         - match_len: Length of longest contiguous match
         - coverage_product: output_coverage * input_coverage
     """
-    match_len = compute_longest_match(output_words, input_words)
+    if match_len is None:
+        match_len = compute_longest_match(output_words, input_words)
 
     # Criterion 1: Absolute match length
     # if match_len >= MIN_MATCH_WORDS:
@@ -215,88 +587,133 @@ def is_content_match(
     return False, "", match_len, 0.0
 
 
-def find_source_nodes(
-    session_id: str,
-    input_dict: Dict[str, Any],
-    api_type: str,
-) -> List[str]:
+def min_match_len(output_len: int) -> int:
+    """Shortest longest match with which an output of output_len words passes is_content_match."""
+    return max(MIN_MATCH_WORDS + 1, output_len // 2 + 1)
+
+
+def _match_in_segments(
+    output_words: Sequence, output_kgrams: Set[int], match_input: MatchingInput
+) -> Tuple[int, Optional[InputSegment]]:
+    """
+    Longest match of an output within the first input string in which it passes.
+
+    Returns:
+        (match_len, segment), (0, None) if it passes within no single string
+    """
+    needed = min_match_len(len(output_words))
+    for segment in match_input.segments:
+        # A passing match contains indexed k-grams of the output
+        if len(segment.tokens) >= needed and not segment.kgrams.isdisjoint(output_kgrams):
+            match_len = compute_longest_match(output_words, segment.tokens)
+            if match_len >= needed:
+                return match_len, segment
+    return 0, None
+
+
+def find_source_nodes(session_id: str, call: "InterceptedCall") -> List[str]:
     """
     Find source node IDs whose outputs appear in the given input.
 
-    Uses longest contiguous word match. An edge is created if either:
-    1. match_len >= MIN_MATCH_WORDS (absolute threshold), or
-    2. output_coverage * input_coverage >= MIN_COVERAGE_PRODUCT (relative threshold)
+    An output matches if its longest contiguous token match with the input is
+    longer than MIN_MATCH_WORDS tokens and covers more than half of the output
+    (is_content_match). Only the outputs whose indexed k-grams occur often enough
+    in the input to allow such a match are verified (see kgram_index.py), in node
+    order. An output is first matched within the single input strings, where a
+    match found for an earlier input containing the same string is reused, and
+    against the whole input otherwise. Redundant sources are pruned afterwards by
+    the caller (Reachability.redundant_sources).
 
     Args:
         session_id: The session to search within
-        input_dict: The input dictionary for the LLM call
-        api_type: The API type identifier (e.g., "httpx.Client.send")
+        call: The intercepted call (its input is tokenized once and cached)
 
     Returns:
         List of node_ids that should have edges to the new node
     """
-    # Extract and tokenize input text
-    input_text = extract_input_text(input_dict, api_type)
-    if not input_text:
+    # Replay-only runs build no graph
+    if DB.replay_only:
         return []
 
-    input_words = tokenize(input_text)
+    match_input = matching_input(session_id, call)
+    input_words = match_input.tokens
     if not input_words:
         return []
 
-    logger.debug(f"[string_matching] input has {len(input_words)} words: {input_words[:10]}...")
+    logger.debug(
+        f"[string_matching] input has {len(input_words)} words in {len(match_input.segments)} strings"
+    )
 
     # Find matches
-    session_outputs = _get_session_outputs(session_id)
+    index = _get_session_index(session_id)
+    matched_before = set().union(*(segment.matched for segment in match_input.segments))
+    matcher = None
     matches = []
-
-    for node_id, output_word_lists in session_outputs.items():
-        for output_words in output_word_lists:
-            is_match, match_type, match_len, coverage = is_content_match(output_words, input_words)
-            if is_match:
-                logger.info(
-                    f"[string_matching] MATCH ({match_type}): node={node_id[:8]}, "
-                    f"match={match_len} words, coverage={coverage:.3f}"
-                )
-                matches.append(node_id)
-                break  # Only add node once even if multiple outputs match
-
-    get_graph_topology(session_id=session_id)
-
+    seen = set()
+
+    # Only outputs sharing enough k-grams with the input are verified, in node order
+    for (node_id, i), hits in index.hits_for(match_input.kgrams).items():
+        if node_id in seen:
+            continue  # Only add node once even if multiple outputs match
+        output_word_lists = _node_outputs(session_id, node_id)
+        if i >= len(output_word_lists):
+            continue  # The node's outputs were replaced meanwhile
+        output_words = output_word_lists[i]
+        if index.max_match_len(hits, len(output_words)) < min_match_len(len(output_words)):
+            continue
+        key = (node_id, i, index.version(node_id))
+        if key in matched_before:
+            # Matched within a string of an earlier input that this input contains too
+            matches.append(node_id)
+            seen.add(node_id)
+            continue
+        match_len, segment = _match_in_segments(output_words, index.kgrams(node_id), match_input)
+        if segment is None:
+            # Not quoted within one string: match the whole input
+            if matcher is None:
+                matcher = input_matcher(input_words)
+            match = longest_match(output_words, input_words, matcher)
+            match_len = match.size
+            segment = match_input.segment_of(match.b, match.size)
+        is_match, match_type, match_len, coverage = is_content_match(
+            output_words, input_words, match_len
+        )
+        if is_match:
+            logger.info(
+                f"[string_matching] MATCH ({match_type}): node={node_id[:8]}, "
+                f"match={match_len} words, coverage={coverage:.3f}"
+            )
+            matches.append(node_id)
+            seen.add(node_id)
+            if segment is not None:
+                segment.matched.add(key)
+
+    for node_id in matches:
+        _memory.touch(session_id, node_id)
+    _enforce_memory_budget()
     return matches
 
 
-def store_input_strings(
-    session_id: str,
-    node_id: str,
-    input_dict: Dict[str, Any],
-    api_type: str,
-) -> None:
+def store_input_strings(session_id: str, node_id: str, call: "InterceptedCall") -> None:
     """
     Store input strings from an LLM call for future containment checks.
 
     Args:
         session_id: The session this input belongs to
         node_id: The node ID that received this input
-        input_dict: The input dictionary for the LLM call
-        api_type: The API type identifier
+        call: The intercepted call
     """
-    input_text = extract_input_text(input_dict, api_type)
-    if not input_text:
-        return
-
-    input_words = tokenize(input_text)
-    if input_words:
+    match_input = matching_input(session_id, call)
+    if match_input.tokens:
+        # The token arrays of the strings, shared with the other inputs that contain them
         session_inputs = _get_session_inputs(session_id)
-        session_inputs[node_id] = input_words
+        session_inputs[node_id] = tuple(segment.tokens for segment in match_input.segments)
+        _session_containment.get(session_id, {}).pop(node_id, None)
+        _charge(session_id, node_id)
+        _enforce_memory_budget()
 
 
-def store_output_strings(
-    session_id: str,
-    node_id: str,
-    output_obj: Any,
-    api_type: str,
-) -> None:
+def store_output_strings(session_id: str, node_id: str, call: "InterceptedCall") -> None:
     """
     Store output strings from an LLM call for future matching.
 
@@ -305,16 +722,19 @@ def store_output_strings(
     Args:
         session_id: The session this output belongs to
         node_id: The node ID that produced this output
-        output_obj: The output object from the LLM call
-        api_type: The API type identifier
+        call: The intercepted call, with its output set
     """
+    if DB.replay_only:
+        return
+
     # Extract output strings
-    output_strings = extract_output_text(output_obj, api_type)
+    output_strings = call.output_strings
     if not output_strings:
         return
 
     # Split HTML content into separate chunks, then tokenize each
     session_outputs = _get_session_outputs(session_id)
+    vocabulary = _get_session_vocabulary(session_id)
     word_lists = []
 
     for output_str in output_strings:
@@ -323,13 +743,16 @@ def store_output_strings(
         for chunk in chunks:
             words = tokenize(chunk)
             if words:
-                word_lists.append(words)
+                word_lists.append(vocabulary.encode(words))
                 logger.debug(
                     f"[string_matching] stored output: {len(words)} words, " f"node={node_id[:8]}"
                 )
 
     if word_lists:
         session_outputs[node_id] = word_lists
+        _get_session_index(session_id).add(node_id, word_lists)
+        _charge(session_id, node_id)
+        _enforce_memory_budget()
 
 
 def output_contained_in_input(session_id: str, node_a_id: str, node_b_id: str) -> bool:
@@ -339,7 +762,7 @@ def output_contained_in_input(session_id: str, node_a_id: str, node_b_id: str) -
 
     We need to check if the output of A is subset of input to B. If so,
     we don't need A -> C.
-    
+
     Args:
         session_id: The session to search within
         output_node_id: The node whose output might be contained
@@ -348,16 +771,27 @@ def output_contained_in_input(session_id: str, node_a_id: str, node_b_id: str) -
     Returns:
         True if output_node's output is contained in input_node's input
     """
-    session_outputs = _get_session_outputs(session_id)
-    session_inputs = _get_session_inputs(session_id)
-
-    output_a = session_outputs.get(node_a_id, [])
-    input_b = session_inputs.get(node_b_id, [])
+    # Sources of a chat agent's calls are mostly those of its previous call: check pairs once
+    version = _get_session_index(session_id).version(node_a_id)
+    checked = _session_containment.setdefault(session_id, {}).setdefault(node_b_id, {})
+    if node_a_id in checked and checked[node_a_id][0] == version:
+        return checked[node_a_id][1]
+    contained = _output_contained_in_input(session_id, node_a_id, node_b_id)
+    checked[node_a_id] = (version, contained)
+    return contained
+
+
+def _output_contained_in_input(session_id: str, node_a_id: str, node_b_id: str) -> bool:
+    output_a = _node_outputs(session_id, node_a_id)
+    input_b = array("I")
+    for tokens in _node_inputs(session_id, node_b_id):
+        input_b.extend(tokens)
 
     if not output_a or not input_b:
         return False
 
-    total_match_len = sum(compute_longest_match(out_a, input_b) for out_a in output_a)
+    matcher = input_matcher(input_b)
+    total_match_len = sum(compute_longest_match(out_a, input_b, matcher) for out_a in output_a)
     total_output_len = sum(len(out_a) for out_a in output_a)
     coverage = total_match_len / total_output_len
     if total_output_len > 0 and coverage >= 0.9:
@@ -0,0 +1,218 @@
+"""
+Optional compression of the large llm_calls columns: input, input_overwrite,
+output and stack_trace.
+
+Agents resend the same system prompts, tool schemas and response envelopes on
+every call. With compression enabled (see DB_COMPRESSION in constants.py), values
+of at least DB_COMPRESSION_MIN_BYTES bytes are stored zlib-compressed with a
+preset dictionary per api_type and column. The dictionary of such a scope is
+built from the first DB_COMPRESSION_DICT_SAMPLES values written to it: the
+segments (text between JSON delimiters or newlines) that occur in more than one
+sample, the most common last, where zlib references them most cheaply. Values
+written before it exists are compressed without a dictionary.
+
+Dictionaries are stored in the compression_dicts table under the hash of their
+content and never change. Later runs reuse the latest dictionary of each scope.
+Reading needs no configuration, a compressed value names its dictionary.
+
+A compressed value is a format byte, the 8-byte id of its dictionary if it has
+one, and the zlib stream. SQLite stores it as a BLOB in the TEXT column.
+PostgreSQL TEXT cannot hold bytes, so it stores TEXT_PREFIX followed by base85
+(see `compressed_column` of the backends). The DatabaseManager decompresses a
+value where it uses it, e.g. a preloaded session keeps its outputs compressed
+until a call hits them.
+"""
+
+import base64
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ao.common.logger import logger
+
+# Stored value of a compressed column in text form, see to_text.
+TEXT_PREFIX = "\x1fz"
+
+_NO_DICT = 1
+_WITH_DICT = 2
+DICT_ID_BYTES = 8
+
+_SEGMENT_END = re.compile(rb"(?<=[,\n{}\[\]])")
+
+# Dictionary id -> dictionary, of all backends (ids are content hashes).
+_dicts: Dict[bytes, bytes] = {}
+
+
+def is_compressed(value) -> bool:
+    """Whether a stored column value is compressed."""
+    if isinstance(value, str):
+        return value.startswith(TEXT_PREFIX)
+    return isinstance(value, (bytes, memoryview))
+
+
+def to_text(data: bytes) -> str:
+    """Compressed value as text, for backends whose TEXT columns cannot hold bytes."""
+    return TEXT_PREFIX + base64.b85encode(data).decode("ascii")
+
+
+def dict_id(zdict: bytes) -> bytes:
+    return hashlib.sha256(zdict).digest()[:DICT_ID_BYTES]
+
+
+def train_dict(samples: List[bytes], max_bytes: int) -> bytes:
+    """
+    zlib preset dictionary of the segments shared by samples: those that save
+    the most (occurrences times length) up to max_bytes, the most common last.
+    Empty if the samples share nothing.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(set(_SEGMENT_END.split(sample)))
+    shared = [segment for segment, n in counts.items() if n > 1 and len(segment) > 3]
+    shared.sort(key=lambda segment: (counts[segment] * len(segment), segment), reverse=True)
+    chosen = []
+    size = 0
+    for segment in shared:
+        if size + len(segment) <= max_bytes:
+            chosen.append(segment)
+            size += len(segment)
+    chosen.sort(key=lambda segment: counts[segment])
+    return b"".join(chosen)
+
+
+def decompress(value, load_dict: Callable[[str], Optional[bytes]]):
+    """
+    Text of a stored column value, which is returned as is if not compressed.
+    load_dict returns a dictionary by its hex id (None if unknown).
+    """
+    if not is_compressed(value):
+        return value
+    if isinstance(value, str):
+        data = base64.b85decode(value[len(TEXT_PREFIX) :])
+    else:
+        data = bytes(value)
+    if data[0] == _NO_DICT:
+        return zlib.decompress(data[1:]).decode("utf-8")
+    if data[0] != _WITH_DICT:
+        raise ValueError(f"Unknown compressed value format {data[0]}")
+    key = data[1 : 1 + DICT_ID_BYTES]
+    zdict = _dicts.get(key)
+    if zdict is None:
+        zdict = load_dict(key.hex())
+        if zdict is None:
+            raise ValueError(f"Compression dictionary {key.hex()} not found")
+        _dicts[key] = zdict
+    decompressor = zlib.decompressobj(zdict=zdict)
+    text = decompressor.decompress(data[1 + DICT_ID_BYTES :]) + decompressor.flush()
+    return text.decode("utf-8")
+
+
+class BlobCompressor:
+    """
+    Compresses llm_calls values on write and builds the dictionary of each scope
+    (api_type and column). Used from the calling threads and the write-behind
+    writer.
+
+    Args:
+        get_backend: Returns the current backend module
+        min_bytes: Values shorter than this are stored as they are
+        level: zlib compression level
+        dict_samples: Number of values of a scope its dictionary is built from
+        dict_bytes: Maximum dictionary size (zlib only uses the last 32 KB)
+    """
+
+    def __init__(
+        self,
+        get_backend: Callable[[], Any],
+        min_bytes: int,
+        level: int,
+        dict_samples: int,
+        dict_bytes: int,
+    ):
+        self._get_backend = get_backend
+        self.min_bytes = min_bytes
+        self.level = level
+        self.dict_samples = dict_samples
+        self.dict_bytes = dict_bytes
+        self._lock = threading.Lock()
+        # scope -> (dictionary id, dictionary), None to compress without one.
+        # Loaded from the backend on first use.
+        self._scopes: Optional[Dict[str, Optional[Tuple[bytes, bytes]]]] = None
+        self._samples: Dict[str, List[bytes]] = {}
+        self.stats = {"values": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def reset(self) -> None:
+        """Forget the dictionaries of the scopes, e.g. after switching backends."""
+        with self._lock:
+            self._scopes = None
+            self._samples.clear()
+
+    def compress(self, value: Optional[str], api_type: str, column: str):
+        """
+        Stored form of a column value: compressed, or the value itself if it is
+        short, already compressed or does not get shorter.
+        """
+        if value is None or is_compressed(value):
+            return value
+        data = value.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return value
+        start = time.perf_counter()
+        scope_dict = self._scope_dict(f"{api_type}\n{column}", data)
+        if scope_dict is None:
+            packed = bytes([_NO_DICT]) + zlib.compress(data, self.level)
+        else:
+            key, zdict = scope_dict
+            compressor = zlib.compressobj(self.level, zdict=zdict)
+            packed = bytes([_WITH_DICT]) + key + compressor.compress(data) + compressor.flush()
+        stored = self._get_backend().compressed_column(packed)
+        if len(stored) >= len(data):
+            return value
+        self.stats["values"] += 1
+        self.stats["bytes_in"] += len(data)
+        self.stats["bytes_out"] += len(stored)
+        self.stats["seconds"] += time.perf_counter() - start
+        return stored
+
+    def _scope_dict(self, scope: str, data: bytes) -> Optional[Tuple[bytes, bytes]]:
+        with self._lock:
+            if self._scopes is None:
+                self._scopes = self._load_scopes()
+            if scope in self._scopes:
+                return self._scopes[scope]
+            samples = self._samples.setdefault(scope, [])
+            samples.append(data[: 4 * self.dict_bytes])
+            if len(samples) < self.dict_samples:
+                return None
+            del self._samples[scope]
+            zdict = train_dict(samples, self.dict_bytes)
+            scope_dict = None
+            if zdict:
+                key = dict_id(zdict)
+                try:
+                    self._get_backend().insert_compression_dict_query(
+                        key.hex(), scope, zdict, time.time()
+                    )
+                    _dicts[key] = zdict
+                    scope_dict = (key, zdict)
+                except Exception as e:
+                    logger.warning(f"Failed to store compression dictionary: {e}")
+            self._scopes[scope] = scope_dict
+            return scope_dict
+
+    def _load_scopes(self) -> Dict[str, Optional[Tuple[bytes, bytes]]]:
+        scopes = {}
+        try:
+            rows = self._get_backend().get_compression_dicts_query()
+        except Exception as e:
+            logger.warning(f"Failed to load compression dictionaries: {e}")
+            return scopes
+        for row in rows:  # Oldest first, the latest dictionary of a scope wins
+            key, zdict = bytes.fromhex(row["dict_id"]), bytes(row["data"])
+            _dicts[key] = zdict
+            scopes[row["scope"]] = (key, zdict)
+        return scopes
@@ -10,6 +10,7 @@ from urllib.parse import urlparse
 
 from ao.common.logger import logger
 from ao.common.constants import REMOTE_DATABASE_URL
+from ao.server.blob_compression import to_text
 
 # Global connection pool
 _connection_pool = None
@@ -137,6 +138,7 @@ def _init_db(conn):
             success TEXT CHECK (success IN ('', 'Satisfactory', 'Failed')),
             notes TEXT,
             log TEXT,
+            base_session_id TEXT,
             user_id INTEGER,
             FOREIGN KEY (parent_session_id) REFERENCES experiments (session_id),
             UNIQUE (parent_session_id, name)
@@ -144,6 +146,15 @@ def _init_db(conn):
     """
     )
 
+    # Forks (see DatabaseManager.fork_llm_calls) point at their base session.
+    # Add the column to databases created before forks existed.
+    c.execute("ALTER TABLE experiments ADD COLUMN IF NOT EXISTS base_session_id TEXT")
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS experiments_base_session_idx ON experiments(base_session_id)
+    """
+    )
+
     # Create llm_calls table
     # HACK: Renove foreign key constrain bc parallel inserts experiment and llm calls.
     c.execute(
@@ -175,6 +186,58 @@ def _init_db(conn):
         )
     """
     )
+    # Create call_metrics table (per-phase timings of profiled calls, see ao.runner.profiling)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS call_metrics (
+            session_id TEXT,
+            node_id TEXT,
+            api_type TEXT,
+            phase TEXT,
+            duration_ms REAL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS call_metrics_session_idx ON call_metrics(session_id)
+    """
+    )
+
+    # Create compression_dicts table (zlib dictionaries of compressed llm_calls values,
+    # see ao.server.blob_compression)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            dict_id TEXT PRIMARY KEY,
+            scope TEXT,
+            data BYTEA,
+            created_at DOUBLE PRECISION
+        )
+    """
+    )
+
+    # Create shared_outputs table (content-addressed LLM outputs shared across sessions,
+    # see DatabaseManager.enable_shared_cache). Times are epoch seconds.
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shared_outputs (
+            cache_key TEXT PRIMARY KEY,
+            api_type TEXT,
+            output TEXT,
+            size BIGINT,
+            created_at DOUBLE PRECISION,
+            last_used DOUBLE PRECISION
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS shared_outputs_last_used_idx ON shared_outputs(last_used)
+    """
+    )
+
     # Create indexes
     c.execute(
         """
@@ -276,6 +339,32 @@ def execute(sql, params=()):
         return_conn(conn)
 
 
+def executemany(sql, params_seq):
+    """Execute SQL statement for each parameter tuple in a single transaction"""
+    conn = get_conn()
+    try:
+        c = conn.cursor()
+        psycopg2.extras.execute_batch(c, sql, params_seq)
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        # Connection died - don't try to rollback, just close it
+        logger.warning(f"Connection died during executemany: {e}")
+        try:
+            conn.close()
+        except:
+            pass
+        raise
+    except Exception as e:
+        # Other errors - try to rollback
+        try:
+            conn.rollback()
+        except:
+            pass
+        raise
+    finally:
+        return_conn(conn)
+
+
 def add_experiment_query(
     session_id,
     parent_session_id,
@@ -443,21 +532,117 @@ def get_llm_call_by_session_and_hash_query(session_id, input_hash):
     )
 
 
+def get_llm_calls_by_session_for_lookup_query(session_id):
+    """Get the cache lookup columns of all LLM calls of a session (to preload get_in_out)."""
+    return query_all(
+        "SELECT node_id, input_hash, input_overwrite, output FROM llm_calls WHERE session_id=%s",
+        (session_id,),
+    )
+
+
+def get_llm_calls_by_sessions_and_hash_query(session_ids, input_hash):
+    """Get the LLM calls with input_hash of several sessions (a fork and its bases)."""
+    placeholders = ", ".join(["%s"] * len(session_ids))
+    return query_all(
+        f"SELECT session_id, node_id, input_overwrite, output FROM llm_calls WHERE session_id IN ({placeholders}) AND input_hash=%s",
+        (*session_ids, input_hash),
+    )
+
+
+_INSERT_LLM_CALL_WITH_OUTPUT_SQL = """
+    INSERT INTO llm_calls (session_id, input, input_hash, node_id, api_type, output, stack_trace)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (session_id, node_id)
+    DO UPDATE SET output = EXCLUDED.output, stack_trace = EXCLUDED.stack_trace
+"""
+
+
 def insert_llm_call_with_output_query(
     session_id, input_pickle, input_hash, node_id, api_type, output_pickle, stack_trace=None
 ):
     """Insert new LLM call record with output in a single operation (upsert)."""
+    execute(
+        _INSERT_LLM_CALL_WITH_OUTPUT_SQL,
+        (session_id, input_pickle, input_hash, node_id, api_type, output_pickle, stack_trace),
+    )
+
+
+def insert_llm_calls_with_output_query(rows):
+    """Insert (upsert) many LLM call records in one transaction. Rows as in the query above."""
+    executemany(_INSERT_LLM_CALL_WITH_OUTPUT_SQL, rows)
+
+
+# Call metrics queries
+def insert_call_metrics_query(rows):
+    """Insert call_metrics rows (session_id, node_id, api_type, phase, duration_ms)."""
+    executemany(
+        "INSERT INTO call_metrics (session_id, node_id, api_type, phase, duration_ms) VALUES (%s, %s, %s, %s, %s)",
+        rows,
+    )
+
+
+def get_call_metrics_query(session_id):
+    """Get all call_metrics rows of a session."""
+    return query_all(
+        "SELECT node_id, api_type, phase, duration_ms FROM call_metrics WHERE session_id=%s ORDER BY timestamp",
+        (session_id,),
+    )
+
+
+def delete_call_metrics_query(session_id):
+    """Delete the call_metrics rows of a session."""
+    execute("DELETE FROM call_metrics WHERE session_id=%s", (session_id,))
+
+
+def delete_all_call_metrics_query():
+    """Delete all records from call_metrics table."""
+    execute("DELETE FROM call_metrics")
+
+
+# Shared output queries
+def get_shared_output_query(cache_key, now):
+    """Get a shared output by cache key (None if unknown) and mark it as used at now."""
+    row = query_one("SELECT output FROM shared_outputs WHERE cache_key=%s", (cache_key,))
+    if row is None:
+        return None
+    execute("UPDATE shared_outputs SET last_used=%s WHERE cache_key=%s", (now, cache_key))
+    return row["output"]
+
+
+def insert_shared_output_query(cache_key, api_type, output, now):
+    """Insert (or refresh) a shared output."""
     execute(
         """
-        INSERT INTO llm_calls (session_id, input, input_hash, node_id, api_type, output, stack_trace)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (session_id, node_id)
-        DO UPDATE SET output = EXCLUDED.output, stack_trace = EXCLUDED.stack_trace
+        INSERT INTO shared_outputs (cache_key, api_type, output, size, created_at, last_used)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (cache_key)
+        DO UPDATE SET output = EXCLUDED.output, size = EXCLUDED.size, last_used = EXCLUDED.last_used
         """,
-        (session_id, input_pickle, input_hash, node_id, api_type, output_pickle, stack_trace),
+        (cache_key, api_type, output, len(output), now, now),
+    )
+
+
+def evict_shared_outputs_query(min_last_used, max_bytes):
+    """Delete shared outputs unused since min_last_used, then the least recently used beyond max_bytes."""
+    execute("DELETE FROM shared_outputs WHERE last_used < %s", (min_last_used,))
+    execute(
+        """
+        DELETE FROM shared_outputs WHERE cache_key IN (
+            SELECT cache_key FROM (
+                SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC, cache_key) AS total
+                FROM shared_outputs
+            ) AS ranked WHERE total > %s
+        )
+        """,
+        (max_bytes,),
     )
 
 
+def delete_all_shared_outputs_query():
+    """Delete all records from shared_outputs table."""
+    execute("DELETE FROM shared_outputs")
+
+
 # Experiment list and graph queries
 def get_finished_runs_query():
     """Get all finished runs ordered by timestamp."""
@@ -523,6 +708,107 @@ def copy_llm_calls_query(old_session_id, new_session_id):
     )
 
 
+def copy_llm_call_query(old_session_id, new_session_id, node_id):
+    """Copy one llm_calls row to another session (no-op if that session already has the node)."""
+    execute(
+        """
+        INSERT INTO llm_calls (session_id, node_id, input, input_hash, input_overwrite, output, color, label, api_type, stack_trace, timestamp)
+        SELECT %s, node_id, input, input_hash, input_overwrite, output, color, label, api_type, stack_trace, timestamp
+        FROM llm_calls WHERE session_id=%s AND node_id=%s
+        ON CONFLICT (session_id, node_id) DO NOTHING
+        """,
+        (new_session_id, old_session_id, node_id),
+    )
+
+
+def copy_missing_llm_calls_query(old_session_id, new_session_id):
+    """Copy the llm_calls rows of a session whose node the other session does not have."""
+    execute(
+        """
+        INSERT INTO llm_calls (session_id, node_id, input, input_hash, input_overwrite, output, color, label, api_type, stack_trace, timestamp)
+        SELECT %s, node_id, input, input_hash, input_overwrite, output, color, label, api_type, stack_trace, timestamp
+        FROM llm_calls WHERE session_id=%s
+        ON CONFLICT (session_id, node_id) DO NOTHING
+        """,
+        (new_session_id, old_session_id),
+    )
+
+
+# Fork queries
+def get_experiment_base_session_query(session_id):
+    """Get the base session of a fork (base_session_id is NULL for other sessions)."""
+    return query_one("SELECT base_session_id FROM experiments WHERE session_id=%s", (session_id,))
+
+
+def update_experiment_base_session_query(base_session_id, session_id):
+    """Set (or clear, with None) the base session of a fork."""
+    execute(
+        "UPDATE experiments SET base_session_id=%s WHERE session_id=%s",
+        (base_session_id, session_id),
+    )
+
+
+def get_forks_query(base_session_id):
+    """Get the sessions forked from a session."""
+    return query_all(
+        "SELECT session_id FROM experiments WHERE base_session_id=%s", (base_session_id,)
+    )
+
+
+# Storage format migration queries (see ao.server.llm_call_format)
+def get_llm_calls_page_query(after_session_id, after_node_id, limit):
+    """Get the stored columns of up to limit llm_calls rows after (after_session_id, after_node_id)."""
+    return query_all(
+        """SELECT session_id, node_id, api_type, input, input_overwrite, output, stack_trace
+           FROM llm_calls
+           WHERE (session_id, node_id) > (%s, %s) ORDER BY session_id, node_id LIMIT %s""",
+        (after_session_id, after_node_id, limit),
+    )
+
+
+def update_llm_calls_io_query(rows):
+    """Rewrite the stored columns of rows (input, input_overwrite, output, stack_trace, session_id, node_id)."""
+    executemany(
+        "UPDATE llm_calls SET input=%s, input_overwrite=%s, output=%s, stack_trace=%s WHERE session_id=%s AND node_id=%s",
+        rows,
+    )
+
+
+def vacuum_query():
+    """Reclaim the space of deleted and rewritten llm_calls rows (VACUUM cannot run in a transaction)."""
+    conn = get_conn()
+    try:
+        conn.autocommit = True
+        conn.cursor().execute("VACUUM llm_calls")
+    finally:
+        conn.autocommit = False
+        return_conn(conn)
+
+
+# Compressed llm_calls values (see ao.server.blob_compression)
+def compressed_column(data):
+    """Stored form of a compressed llm_calls value: TEXT cannot hold bytes, store base85 text."""
+    return to_text(data)
+
+
+def insert_compression_dict_query(dict_id, scope, data, created_at):
+    """Store a compression dictionary (no-op if it is already stored)."""
+    execute(
+        "INSERT INTO compression_dicts (dict_id, scope, data, created_at) VALUES (%s, %s, %s, %s) ON CONFLICT (dict_id) DO NOTHING",
+        (dict_id, scope, psycopg2.Binary(data), created_at),
+    )
+
+
+def get_compression_dicts_query():
+    """Get all compression dictionaries, oldest first."""
+    return query_all("SELECT dict_id, scope, data FROM compression_dicts ORDER BY created_at")
+
+
+def get_compression_dict_query(dict_id):
+    """Get a compression dictionary by id."""
+    return query_one("SELECT data FROM compression_dicts WHERE dict_id=%s", (dict_id,))
+
+
 # Database cleanup queries
 def delete_all_experiments_query():
     """Delete all records from experiments table."""
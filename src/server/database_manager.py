@@ -9,6 +9,10 @@ import time
 import uuid
 import json
 import random
+import atexit
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional, Any
 
@@ -17,13 +21,30 @@ from ao.common.logger import logger
 # NOTE: postgres backend is currently disabled - uncomment when needed
 # from ao.server.database_backends import postgres
 from ao.runner.monkey_patching.api_parser import (
-    func_kwargs_to_json_str,
     json_str_to_api_obj,
-    api_obj_to_json_str,
     json_str_to_original_inp_dict,
     api_obj_to_response_ok,
+    unwrap_json_dict,
 )
-from ao.common.utils import get_raw_model_name
+from ao.runner.monkey_patching.inline_media import REF_PREFIX, inline_media
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+from ao.runner.profiling import profile_phase
+from ao.server.blob_compression import decompress, is_compressed
+from ao.server.llm_call_format import (
+    decode,
+    encode_input_overwrite,
+    encode_output,
+    overwritten_input,
+)
+from ao.server.single_flight import SingleFlight, loop_running
+
+
+class ReplayMissError(RuntimeError):
+    """Raised in replay-only runs for an LLM call that has no recorded output."""
+
+    def __init__(self, miss: dict):
+        self.miss = miss
+        super().__init__(f"Replay-only run of session {miss['session_id']}: {miss['reason']}")
 
 
 @dataclass
@@ -35,22 +56,34 @@ class CacheOutput:
     and used for cache storage operations.
 
     Attributes:
-        input_dict: The (potentially modified) input dictionary for the LLM call
+        call: The InterceptedCall this cache operation belongs to
         output: The cached output object, None if not cached or cache miss
         node_id: Unique identifier for this LLM call node, None if new call
-        input_pickle: Serialized input data for caching purposes
-        input_hash: Hash of the input for efficient cache lookups
         session_id: The session ID associated with this cache operation
         stack_trace: Python stack trace at the point of the LLM call
+        shared_key: Key of the call in the shared output cache, set on misses
+            the output of which should be shared (see enable_shared_cache)
+        in_flight: (key, flight) led by this call on a miss, identical concurrent
+            calls wait until it is released (see single_flight.py)
     """
 
-    input_dict: dict
+    call: InterceptedCall
     output: Optional[Any]
     node_id: Optional[str]
-    input_pickle: bytes
-    input_hash: str
     session_id: str
     stack_trace: Optional[str] = None
+    shared_key: Optional[str] = None
+    in_flight: Optional[tuple] = None
+
+    @property
+    def input_dict(self) -> dict:
+        """The (potentially overwritten) input dictionary for the LLM call."""
+        return self.call.input_dict
+
+    @property
+    def input_hash(self) -> str:
+        """Hash of the input as the user sent it, the cache key."""
+        return self.call.input_hash
 
 
 class DatabaseManager:
@@ -70,12 +103,51 @@ class DatabaseManager:
         # Lazy-loaded backend module
         self._backend_module = None
 
+        # Lazy-created executor for the async API (see db_executor)
+        self._db_executor = None
+        self._db_executor_lock = threading.Lock()
+
+        # Queue of pending llm_calls inserts in write-behind mode (see enable_write_behind)
+        self._write_queue = None
+
+        # Compresses llm_calls values on write, None unless enabled (see enable_compression).
+        # Compressed values are decompressed on read either way.
+        self._compressor = None
+
+        # Preloaded llm_calls lookup rows of rerun sessions (see preload_session):
+        # session_id -> {input_hash -> row}. _preloading holds the rows cached while a
+        # session is still loading, they take precedence over the loaded snapshot.
+        self._preloaded = {}
+        self._preloading = {}
+        self._preload_lock = threading.Lock()
+
+        # Concurrent identical calls of a session: one calls the LLM, the others wait
+        self._in_flight = SingleFlight()
+
+        # Session followed by its bases, nearest first, of forks (see fork_llm_calls)
+        self._session_chains = {}
+
+        # Prefix of the shared output cache keys, None unless the shared cache is
+        # enabled with a project or global policy (see enable_shared_cache).
+        self._shared_cache_prefix = None
+
+        # Replay-only mode (see enable_replay_only): cache misses raise instead of
+        # calling the LLM. The misses and the number of replayed calls are reported.
+        self.replay_only = False
+        self.replay_misses = []
+        self.replayed_calls = 0
+
         # Check if and where to cache attachments.
         from ao.common.constants import ATTACHMENT_CACHE
 
         self.cache_attachments = True
         self.attachment_cache_dir = ATTACHMENT_CACHE
 
+        from ao.common.constants import DB_COMPRESSION
+
+        if DB_COMPRESSION:
+            self.enable_compression()
+
         logger.info(f"DatabaseManager initialized with backend: {self.get_current_mode()}")
 
     @property
@@ -111,6 +183,9 @@ class DatabaseManager:
         Raises:
             ValueError: If mode is not 'local' or 'remote'
         """
+        # Pending write-behind rows belong to the backend we are switching away from
+        self.flush_writes()
+
         if mode == "local":
             self._backend_type = "sqlite"
             logger.info("Switched to local SQLite database")
@@ -123,6 +198,8 @@ class DatabaseManager:
         # Clear cached backend and connections to force reload with new backend
         self._backend_module = None
         self._clear_backend_connections()
+        if self._compressor is not None:
+            self._compressor.reset()
 
     def _clear_backend_connections(self):
         """Clear cached connections in the current backend to force reconnection."""
@@ -189,20 +266,31 @@ class DatabaseManager:
     #     return self.backend.get_user_by_id_query(user_id)
 
     def set_input_overwrite(self, session_id, node_id, new_input):
-        # Make sure string repr. is uniform
-        new_input = json.dumps(json.loads(new_input), sort_keys=True)
-        row = self.backend.get_llm_call_input_api_type_query(session_id, node_id)
-        input_overwrite = json.loads(row["input"])
-        # Maybe what the UI gave us is the same (user didn't change anything).
-        # In this case, don't remove the output (this is what set_input_overwrite_query does)
-        if input_overwrite["input"] != new_input:
-            input_overwrite["input"] = new_input
-            input_overwrite = json.dumps(input_overwrite, sort_keys=True)
+        row = self.query_one_llm_call_input(session_id, node_id)
+        stored_input = decode(row["input"])
+        if stored_input is not None:
+            # Store the values of raw the edit changes. If it changes nothing (the
+            # user didn't change anything), don't remove the output (this is what
+            # set_input_overwrite_query does).
+            input_overwrite = encode_input_overwrite(stored_input.raw, json.loads(new_input))
+        else:
+            # Input that is not a wrapped {"raw", "to_show"} dict: store it whole.
+            # Make sure string repr. is uniform
+            new_input = json.dumps(json.loads(new_input), sort_keys=True)
+            input_overwrite = json.loads(row["input"])
+            if input_overwrite["input"] != new_input:
+                input_overwrite["input"] = new_input
+                input_overwrite = json.dumps(input_overwrite, sort_keys=True)
+            else:
+                input_overwrite = None
+        if input_overwrite is not None:
+            self._prepare_node_write(session_id, node_id)
+            input_overwrite = self._compress(input_overwrite, row["api_type"], "input_overwrite")
             self.backend.set_input_overwrite_query(input_overwrite, session_id, node_id)
 
     def set_output_overwrite(self, session_id, node_id, new_output: str):
         # Overwrite output for node.
-        row = self.backend.get_llm_call_output_api_type_query(session_id, node_id)
+        row = self.query_one_llm_call_output(session_id, node_id)
 
         if not row:
             logger.error(
@@ -213,7 +301,10 @@ class DatabaseManager:
         try:
             # try to parse the edit of the user
             json_str_to_api_obj(new_output, row["api_type"])
-            new_output = json.dumps(json.loads(new_output), sort_keys=True)
+            # Only raw is stored, with the edits of to_show merged in
+            new_output = encode_output(unwrap_json_dict(json.loads(new_output)))
+            new_output = self._compress(new_output, row["api_type"], "output")
+            self._prepare_node_write(session_id, node_id)
             self.backend.set_output_overwrite_query(new_output, session_id, node_id)
         except Exception as e:
             logger.error(f"Failed to parse output edit into API object: {e}")
@@ -223,7 +314,13 @@ class DatabaseManager:
         import json
 
         default_graph = json.dumps({"nodes": [], "edges": []})
+        self.detach_forks(session_id)
         self.backend.delete_llm_calls_query(session_id)
+        if len(self._session_chain(session_id)) > 1:
+            # An erased fork no longer sees the calls of its base.
+            self.backend.update_experiment_base_session_query(None, session_id)
+            self._session_chains.clear()
+        self.backend.delete_call_metrics_query(session_id)
         self.backend.update_experiment_graph_topology_query(default_graph, session_id)
 
     def add_experiment(
@@ -411,6 +508,39 @@ class DatabaseManager:
             return row["file_path"]
         return None
 
+    def _cache_media(self, call) -> bool:
+        """
+        Store the media hoisted out of the input of call (see inline_media.py).
+        False if some of it could not be stored.
+        """
+        import io
+
+        if not call.media:
+            return True
+        if not getattr(self, "cache_attachments", False):
+            return False
+        for file_id, (file_name, content) in call.media.items():
+            try:
+                self.cache_file(file_id, file_name, io.BytesIO(content))
+            except Exception as e:
+                logger.warning(f"Failed to cache inline media {file_id[:12]}: {e}")
+                return False
+        return True
+
+    def _load_media(self, call, file_id) -> Optional[bytes]:
+        """Content of hoisted media by its attachment id, None if it is not found."""
+        if file_id in call.media:
+            return call.media[file_id][1]
+        file_path = self.get_file_path(file_id)
+        if file_path is None:
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                return f.read()
+        except OSError as e:
+            logger.warning(f"Failed to read inline media {file_id[:12]}: {e}")
+            return None
+
     def attachment_ids_to_paths(self, attachment_ids):
         """Convert attachment IDs to file paths."""
         # file_path can be None if user doesn't want to cache?
@@ -418,42 +548,189 @@ class DatabaseManager:
         # assert all(f is not None for f in file_paths), "All file paths should be non-None"
         return [f for f in file_paths if f is not None]
 
-    def get_in_out(self, input_dict: dict, api_type: str) -> CacheOutput:
+    def get_in_out(self, call) -> CacheOutput:
         """Get input/output for LLM call, handling caching and overwrites."""
+        from ao.common.constants import SINGLE_FLIGHT_WAIT_S
         from ao.runner.context_manager import get_session_id
-        from ao.common.utils import hash_input, set_seed
         from ao.runner.monkey_patching.patching_utils import capture_stack_trace
 
         # Capture stack trace early (before any internal calls pollute it)
-        stack_trace = capture_stack_trace()
+        with profile_phase("stack_trace"):
+            stack_trace = capture_stack_trace()
 
-        # Pickle input object.
-        api_json_str, attachments = func_kwargs_to_json_str(input_dict, api_type)
-        model = get_raw_model_name(input_dict, api_type)
+        # Check if API call with same session_id & input has been made before.
+        session_id = get_session_id()
+        key = (session_id, call.input_hash)
+        with profile_phase("cache_lookup"):
+            if loop_running():
+                # Waiting would block the loop an async leader runs on: proceed untracked
+                flight, leader = None, False
+            else:
+                flight, leader = self._in_flight.acquire(key, threading.get_ident())
+            while flight is not None and not leader:
+                # An identical call is in flight: wait for it, then find its row.
+                with profile_phase("in_flight_wait"):
+                    released = self._in_flight.wait(flight, SINGLE_FLIGHT_WAIT_S)
+                if not released:
+                    logger.warning(f"Identical call still in flight after {SINGLE_FLIGHT_WAIT_S}s")
+                    flight = None
+                    break
+                flight, leader = self._in_flight.acquire(key, threading.get_ident())
+            try:
+                cache_result = self._lookup(call, session_id, stack_trace)
+            except BaseException:
+                if leader:
+                    self._in_flight.release(key, flight)
+                raise
+        return self._keep_flight(cache_result, key, flight if leader else None)
+
+    def _lookup(self, call, session_id, stack_trace) -> CacheOutput:
+        """The cache lookup of get_in_out."""
+        row = self._get_known_llm_call(session_id, call.input_hash)
+        if row is None:
+            row = self._get_llm_call(session_id, call.input_hash)
+        shared_key = self._shared_cache_key(call, row)
+        if shared_key is not None:
+            shared_output = self.backend.get_shared_output_query(shared_key, time.time())
+            if shared_output is not None:
+                cache_result = self._cache_output_from_shared(
+                    call, shared_output, session_id, stack_trace
+                )
+                self.cache_output(cache_result, cache_result.output, call.api_type)
+                return cache_result
+        cache_result = self._cache_output_from_row(call, row, session_id, stack_trace)
+        cache_result.shared_key = shared_key
+        return cache_result
+
+    async def get_in_out_async(self, call) -> CacheOutput:
+        """
+        Async variant of get_in_out for coroutine patches.
 
-        cacheable_input = {
-            "input": api_json_str,
-            "attachments": attachments,
-            "model": model,
-        }
-        input_pickle = json.dumps(cacheable_input, sort_keys=True)
-        input_hash = hash_input(input_pickle)
+        The DB lookup runs on the DB executor so the event loop keeps serving
+        other requests while this one waits for the DB lock / disk.
+        """
+        from ao.common.constants import SINGLE_FLIGHT_WAIT_S
+        from ao.runner.context_manager import get_session_id
+        from ao.runner.monkey_patching.patching_utils import capture_stack_trace
 
-        # Check if API call with same session_id & input has been made before.
+        # Stack trace and session id must be read on the caller's thread/context.
+        with profile_phase("stack_trace"):
+            stack_trace = capture_stack_trace()
         session_id = get_session_id()
+        key = (session_id, call.input_hash)
+        owner = asyncio.current_task()
+        with profile_phase("cache_lookup"):
+            flight, leader = self._in_flight.acquire(key, owner)
+            while flight is not None and not leader:
+                # An identical call is in flight: wait for it, then find its row.
+                with profile_phase("in_flight_wait"):
+                    released = await self._in_flight.wait_async(flight, SINGLE_FLIGHT_WAIT_S)
+                if not released:
+                    logger.warning(f"Identical call still in flight after {SINGLE_FLIGHT_WAIT_S}s")
+                    flight = None
+                    break
+                flight, leader = self._in_flight.acquire(key, owner)
+            try:
+                cache_result = await self._lookup_async(call, session_id, stack_trace)
+            except BaseException:
+                if leader:
+                    self._in_flight.release(key, flight)
+                raise
+        return self._keep_flight(cache_result, key, flight if leader else None)
+
+    async def _lookup_async(self, call, session_id, stack_trace) -> CacheOutput:
+        """The cache lookup of get_in_out_async."""
+        row = self._get_known_llm_call(session_id, call.input_hash)
+        if row is None:
+            row = await self._run_in_db_executor(self._get_llm_call, session_id, call.input_hash)
+        shared_key = self._shared_cache_key(call, row)
+        if shared_key is not None:
+            shared_output = await self._run_in_db_executor(
+                self.backend.get_shared_output_query, shared_key, time.time()
+            )
+            if shared_output is not None:
+                cache_result = self._cache_output_from_shared(
+                    call, shared_output, session_id, stack_trace
+                )
+                await self.cache_output_async(cache_result, cache_result.output, call.api_type)
+                return cache_result
+        cache_result = self._cache_output_from_row(call, row, session_id, stack_trace)
+        cache_result.shared_key = shared_key
+        return cache_result
+
+    def _keep_flight(self, cache_result: CacheOutput, key, flight) -> CacheOutput:
+        """
+        A leader keeps its flight until the output of a missed call is cached (see
+        cache_output and release_in_flight); a hit ends the flight right away.
+        """
+        if flight is not None:
+            if cache_result.output is None:
+                cache_result.in_flight = (key, flight)
+            else:
+                self._in_flight.release(key, flight)
+        return cache_result
+
+    def release_in_flight(self, cache_result: CacheOutput) -> None:
+        """
+        End the flight of a missed call without caching an output (e.g., the live
+        call raised). Waiting identical calls then look up the cache again.
+        """
+        if cache_result.in_flight is not None:
+            key, flight = cache_result.in_flight
+            cache_result.in_flight = None
+            self._in_flight.release(key, flight)
+
+    def _shared_cache_key(self, call, row) -> Optional[str]:
+        """
+        Key of a call in the shared output cache. None if the shared cache is off or
+        the session already knows the call (its row, possibly edited, takes precedence).
+        """
+        if self._shared_cache_prefix is None or row is not None or self.replay_only:
+            return None
+        from ao.common.utils import hash_input
+
+        return hash_input(f"{self._shared_cache_prefix}{call.model}\n{call.input_hash}")
+
+    def _cache_output_from_shared(self, call, output_json, session_id, stack_trace) -> CacheOutput:
+        """CacheOutput of a new call answered from the shared cache (node id not assigned yet)."""
+        logger.debug(
+            f"Shared cache hit: session_id {str(session_id)[:4]}, "
+            f"input_hash {str(call.input_hash)[:4]}"
+        )
+        return CacheOutput(
+            call=call,
+            output=json_str_to_api_obj(output_json, call.api_type),
+            node_id=None,
+            session_id=session_id,
+            stack_trace=stack_trace,
+        )
+
+    def _cache_output_from_row(self, call, row, session_id, stack_trace) -> CacheOutput:
+        """Build the CacheOutput of a lookup from the llm_calls row (None on cache miss)."""
+        from ao.common.utils import set_seed
 
-        row = self.backend.get_llm_call_by_session_and_hash_query(session_id, input_hash)
+        api_type = call.api_type
+        input_hash = call.input_hash
+
+        if self.replay_only and (row is None or row["output"] is None):
+            found = "has no recorded output" if row is not None else "was not recorded"
+            raise self.replay_miss(
+                session_id,
+                f"{call.label} call ({api_type}) with input hash {input_hash[:12]} {found}",
+                api_type=api_type,
+                model=call.model,
+                input_hash=input_hash,
+                stack_trace=stack_trace,
+            )
 
         if row is None:
             logger.debug(
                 f"Cache miss: session_id {str(session_id)[:4]}, input_hash {str(input_hash)[:4]}"
             )
             return CacheOutput(
-                input_dict=input_dict,
+                call=call,
                 output=None,
                 node_id=None,
-                input_pickle=input_pickle,
-                input_hash=input_hash,
                 session_id=session_id,
                 stack_trace=stack_trace,
             )
@@ -466,31 +743,42 @@ class DatabaseManager:
             logger.debug(
                 f"Cache hit (input overwritten): session_id {str(session_id)[:4]}, input_hash {str(input_hash)[:4]}"
             )
-            overwrite_json_str = row["input_overwrite"]
-            overwrite_text = json.loads(overwrite_json_str)["input"]
+            overwrite_text = overwritten_input(
+                self._decompress(row["input_overwrite"]), call.input_json_dict["raw"]
+            )
+            if REF_PREFIX in overwrite_text:
+                # The edits apply to the stored input: restore its inline media
+                overwrite_text = json.dumps(
+                    inline_media(
+                        json.loads(overwrite_text), lambda file_id: self._load_media(call, file_id)
+                    )
+                )
             # the format of the input is not always a JSON dict.
             # sometimes, you need to parse the JSON dict into a
             # specific input format. To do that, API libraries often
             # provide helper functions
-            input_dict = json_str_to_original_inp_dict(overwrite_text, input_dict, api_type)
+            call.input_dict = json_str_to_original_inp_dict(
+                overwrite_text, call.input_dict, api_type
+            )
 
         # Here, no matter if we made an edit to the input or not, the input dict should
         # be a valid input to the underlying function
 
         # TODO We can't distinguish between output and output_overwrite
         if row["output"] is not None:
-            output = json_str_to_api_obj(row["output"], api_type)
+            output = json_str_to_api_obj(self._decompress(row["output"]), api_type)
+            call.output_obj = output
             logger.debug(
                 f"Cache hit (output set): session_id {str(session_id)[:4]}, input_hash {str(input_hash)[:4]}"
             )
 
+        if self.replay_only:
+            self.replayed_calls += 1
         set_seed(node_id)
         return CacheOutput(
-            input_dict=input_dict,
+            call=call,
             output=output,
             node_id=node_id,
-            input_pickle=input_pickle,
-            input_hash=input_hash,
             session_id=session_id,
             stack_trace=stack_trace,
         )
@@ -510,6 +798,63 @@ class DatabaseManager:
         Returns:
             The node_id assigned to this LLM call
         """
+        try:
+            new_node = cache_result.node_id is None
+            insert_args = self._prepare_cache_output(cache_result, output_obj, api_type, cache)
+            if insert_args is None:
+                return
+            with profile_phase("db_write"):
+                if new_node and self._write_queue is not None:
+                    self._write_queue.put(insert_args)
+                else:
+                    self.backend.insert_llm_call_with_output_query(
+                        *self._compress_insert(insert_args)
+                    )
+                if cache_result.shared_key is not None:
+                    self.backend.insert_shared_output_query(
+                        cache_result.shared_key, api_type, insert_args[5], time.time()
+                    )
+        finally:
+            # The row is visible now: identical calls waiting for this one can hit it.
+            self.release_in_flight(cache_result)
+
+    async def cache_output_async(
+        self, cache_result: CacheOutput, output_obj: Any, api_type: str, cache: bool = True
+    ) -> None:
+        """Async variant of cache_output, the insert runs on the DB executor."""
+        try:
+            new_node = cache_result.node_id is None
+            insert_args = self._prepare_cache_output(cache_result, output_obj, api_type, cache)
+            if insert_args is None:
+                return
+            with profile_phase("db_write"):
+                if new_node and self._write_queue is not None:
+                    self._write_queue.put(insert_args)
+                else:
+                    await self._run_in_db_executor(
+                        self.backend.insert_llm_call_with_output_query,
+                        *self._compress_insert(insert_args),
+                    )
+                if cache_result.shared_key is not None:
+                    await self._run_in_db_executor(
+                        self.backend.insert_shared_output_query,
+                        cache_result.shared_key,
+                        api_type,
+                        insert_args[5],
+                        time.time(),
+                    )
+        finally:
+            self.release_in_flight(cache_result)
+
+    def _prepare_cache_output(
+        self, cache_result: CacheOutput, output_obj: Any, api_type: str, cache: bool
+    ) -> Optional[tuple]:
+        """
+        Assign the node id and serialize the output of an LLM call.
+
+        Returns:
+            Arguments for insert_llm_call_with_output_query, None if nothing is cached
+        """
         from ao.common.utils import set_seed
 
         # Insert new row with a new node_id. reset randomness to avoid
@@ -521,23 +866,494 @@ class DatabaseManager:
             node_id = str(uuid.uuid4())
         # Avoid caching bad http responses
         response_ok = api_obj_to_response_ok(output_obj, api_type)
+        cache_result.call.output_obj = output_obj
 
+        insert_args = None
         if response_ok and cache:
-            output_json_str = api_obj_to_json_str(output_obj, api_type)
-            self.backend.insert_llm_call_with_output_query(
+            stored_input = cache_result.call.stored_input
+            if not self._cache_media(cache_result.call):
+                # Keep the media inline rather than store references that cannot be resolved
+                stored_input = json.dumps(
+                    inline_media(
+                        json.loads(stored_input),
+                        lambda file_id: self._load_media(cache_result.call, file_id),
+                    )
+                )
+            insert_args = (
                 cache_result.session_id,
-                cache_result.input_pickle,
+                stored_input,
                 cache_result.input_hash,
                 node_id,
                 api_type,
-                output_json_str,
+                cache_result.call.stored_output,
                 cache_result.stack_trace,
             )
+            self._remember_llm_call(
+                cache_result.session_id, cache_result.input_hash, node_id, insert_args[5]
+            )
         else:
             logger.warning(f"Node {node_id} response not OK.")
         cache_result.node_id = node_id
         cache_result.output = output_obj
         set_seed(node_id)
+        return insert_args
+
+    def enable_write_behind(self) -> None:
+        """
+        Queue new llm_calls rows and write them in batches from a background thread.
+
+        Only rows of new nodes are queued: updates of existing rows (e.g., re-running
+        a node whose input was edited) are written directly. Pending rows are visible
+        to get_in_out. They are written on flush_writes(), which the runner calls on
+        deregister, and at process exit.
+        """
+        if self._write_queue is not None:
+            return
+        from ao.common.constants import (
+            WRITE_BEHIND_BATCH_ROWS,
+            WRITE_BEHIND_FLUSH_MS,
+            WRITE_BEHIND_MAX_PENDING,
+        )
+        from ao.server.write_behind import WriteBehindQueue
+
+        self._write_queue = WriteBehindQueue(
+            write_batch=lambda rows: self.backend.insert_llm_calls_with_output_query(
+                [self._compress_insert(row) for row in rows]
+            ),
+            batch_rows=WRITE_BEHIND_BATCH_ROWS,
+            flush_interval=WRITE_BEHIND_FLUSH_MS / 1000,
+            max_pending=WRITE_BEHIND_MAX_PENDING,
+        )
+        atexit.register(self.flush_writes)
+        logger.info("Write-behind mode enabled for LLM call inserts")
+
+    def flush_writes(self) -> None:
+        """Write all pending llm_calls rows (no-op if write-behind mode is off)."""
+        if self._write_queue is not None:
+            self._write_queue.flush()
+
+    def enable_compression(self) -> None:
+        """
+        Compress the large llm_calls values written from now on (see
+        ao.server.blob_compression). In write-behind mode, rows are compressed
+        on the writer thread.
+        """
+        if self._compressor is None:
+            self._compressor = self._new_compressor()
+            logger.info("Compression of LLM call columns enabled")
+
+    def _new_compressor(self):
+        from ao.common.constants import (
+            DB_COMPRESSION_DICT_BYTES,
+            DB_COMPRESSION_DICT_SAMPLES,
+            DB_COMPRESSION_LEVEL,
+            DB_COMPRESSION_MIN_BYTES,
+        )
+        from ao.server.blob_compression import BlobCompressor
+
+        return BlobCompressor(
+            lambda: self.backend,
+            min_bytes=DB_COMPRESSION_MIN_BYTES,
+            level=DB_COMPRESSION_LEVEL,
+            dict_samples=DB_COMPRESSION_DICT_SAMPLES,
+            dict_bytes=DB_COMPRESSION_DICT_BYTES,
+        )
+
+    def _compress(self, value, api_type, column):
+        """Stored form of an llm_calls value (the value itself if compression is off)."""
+        if self._compressor is None or value is None:
+            return value
+        with profile_phase("compress"):
+            return self._compressor.compress(value, api_type, column)
+
+    def _compress_insert(self, insert_args: tuple) -> tuple:
+        """Arguments of insert_llm_call_with_output_query with their values compressed."""
+        if self._compressor is None:
+            return insert_args
+        session_id, input_pickle, input_hash, node_id, api_type, output, stack_trace = insert_args
+        return (
+            session_id,
+            self._compress(input_pickle, api_type, "input"),
+            input_hash,
+            node_id,
+            api_type,
+            self._compress(output, api_type, "output"),
+            self._compress(stack_trace, api_type, "stack_trace"),
+        )
+
+    def _decompress(self, value):
+        """Text of a stored llm_calls value, compressed or not."""
+        if not is_compressed(value):
+            return value
+        with profile_phase("decompress"):
+            return decompress(value, self._load_compression_dict)
+
+    def _decompress_row(self, row):
+        """llm_calls row with its compressed values decompressed (the row itself if none is)."""
+        if row is None:
+            return None
+        columns = [
+            column
+            for column in ("input", "input_overwrite", "output", "stack_trace")
+            if column in row.keys() and is_compressed(row[column])
+        ]
+        if not columns:
+            return row
+        row = dict(row)
+        for column in columns:
+            row[column] = self._decompress(row[column])
+        return row
+
+    def _load_compression_dict(self, dict_id):
+        row = self.backend.get_compression_dict_query(dict_id)
+        return None if row is None else bytes(row["data"])
+
+    def preload_session(self, session_id, wait: bool = False) -> None:
+        """
+        Load the cache lookup rows of a session into memory on a background thread.
+
+        Used on reruns: get_in_out then answers from memory and only queries the DB
+        on misses (and for lookups issued before loading has finished). Calling this
+        again reloads the session, e.g. after the user edited it in the UI. With
+        wait, the rows are loaded on the calling thread before returning.
+        """
+        with self._preload_lock:
+            self._preloaded.pop(session_id, None)
+            self._preloading[session_id] = {}
+        if wait:
+            self._load_session(session_id)
+            return
+        threading.Thread(
+            target=self._load_session, args=(session_id,), name="ao-db-preload", daemon=True
+        ).start()
+
+    def _load_session(self, session_id) -> None:
+        try:
+            rows = []
+            nodes = set()
+            for chain_session_id in self._session_chain(session_id):
+                # A fork's rows shadow the rows of the same node in its bases.
+                for row in self.backend.get_llm_calls_by_session_for_lookup_query(chain_session_id):
+                    if row["node_id"] not in nodes:
+                        rows.append((chain_session_id, row))
+                nodes.update(row["node_id"] for _, row in rows)
+        except Exception as e:
+            logger.warning(f"Failed to preload LLM calls of session {session_id}: {e}")
+            with self._preload_lock:
+                self._preloading.pop(session_id, None)
+            return
+
+        index = {}
+        for row_session_id, row in rows:
+            # Keep the first row like the per-call lookup would.
+            index.setdefault(
+                row["input_hash"],
+                {
+                    "session_id": row_session_id,
+                    "node_id": row["node_id"],
+                    "input_overwrite": row["input_overwrite"],
+                    "output": row["output"],
+                },
+            )
+        with self._preload_lock:
+            updates = self._preloading.pop(session_id, None)
+            if updates is None:
+                return  # Dropped or reloaded in the meantime.
+            for input_hash, row in updates.items():
+                loaded = index.get(input_hash)
+                if loaded is not None and loaded["node_id"] == row["node_id"]:
+                    # Cached output of an existing node, keep its input overwrite.
+                    row["input_overwrite"] = loaded["input_overwrite"]
+                index[input_hash] = row
+            self._preloaded[session_id] = index
+        logger.debug(f"Preloaded {len(index)} LLM calls of session {session_id}")
+
+    def enable_shared_cache(
+        self, policy: str, salt: str = "", max_age_days: float = 30, max_mb: float = 1024
+    ) -> None:
+        """
+        Share the outputs of LLM calls across sessions, keyed by content.
+
+        New calls of a session (no llm_calls row for their input hash) are looked up
+        in shared_outputs by policy namespace, salt, model and input hash; a hit is
+        recorded as a node of the session without calling the LLM. Live outputs of
+        new calls are added to shared_outputs. Edited rows are never shared.
+
+        Args:
+            policy: "session" (nothing shared), "project" (runs of the same project
+                root) or "global" (all runs)
+            salt: Optional namespace, runs with different salts share nothing
+            max_age_days: Evict outputs unused for this long
+            max_mb: Then evict the least recently used outputs beyond this size
+        """
+        from ao.common.constants import AO_PROJECT_ROOT, SHARED_CACHE_POLICIES
+
+        if policy not in SHARED_CACHE_POLICIES:
+            raise ValueError(
+                f"Invalid shared cache policy: {policy}. Use one of {SHARED_CACHE_POLICIES}"
+            )
+        if policy == "session":
+            self._shared_cache_prefix = None
+            return
+        namespace = AO_PROJECT_ROOT if policy == "project" else ""
+        self._shared_cache_prefix = f"{policy}\n{namespace}\n{salt}\n"
+        try:
+            self.backend.evict_shared_outputs_query(
+                time.time() - max_age_days * 86400, int(max_mb * 1024 * 1024)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to evict shared LLM outputs: {e}")
+        logger.info(f"Shared LLM output cache enabled ({policy})")
+
+    def enable_replay_only(self) -> None:
+        """
+        Serve LLM calls from recorded llm_calls only: a lookup without a recorded
+        output raises ReplayMissError before the LLM is called. Used by
+        `ao-record --replay-only`, which also runs without the develop server.
+        """
+        self.replay_only = True
+
+    def replay_miss(self, session_id, reason: str, **details) -> ReplayMissError:
+        """Record a miss of a replay-only run, returns the error to raise."""
+        miss = {"session_id": session_id, "reason": reason, **details}
+        self.replay_misses.append(miss)
+        logger.error(f"Replay-only cache miss in session {session_id}: {reason}")
+        return ReplayMissError(miss)
+
+    def drop_preloaded_sessions(self) -> None:
+        """Forget all preloaded sessions, lookups go to the DB again."""
+        with self._preload_lock:
+            self._preloaded.clear()
+            self._preloading.clear()
+        self._session_chains.clear()
+
+    def drop_preloaded_session(self, session_id) -> None:
+        """Forget the preloaded rows of one session, e.g. when a subrun ends."""
+        with self._preload_lock:
+            self._preloaded.pop(session_id, None)
+            self._preloading.pop(session_id, None)
+            self._session_chains.pop(session_id, None)
+
+    # ============================================================
+    # Forks: copy-on-write copies of the LLM calls of a session
+    # ============================================================
+
+    def fork_llm_calls(self, base_session_id, session_id) -> None:
+        """
+        Make session_id a fork of the LLM calls of base_session_id.
+
+        No rows are copied: the fork points at its base and only stores the rows
+        that diverge (edited nodes, new outputs of its reruns). Reads of a fork
+        fall through to its bases, nearest first. Before a base is modified, its
+        forks are compacted (see detach_forks), so they keep seeing the base as
+        it was when they were forked. A fork of a base FORK_MAX_DEPTH forks deep
+        is compacted right away.
+        """
+        from ao.common.constants import FORK_MAX_DEPTH
+
+        self.backend.update_experiment_base_session_query(base_session_id, session_id)
+        self._session_chains.clear()
+        if len(self._session_chain(session_id)) - 1 > FORK_MAX_DEPTH:
+            self.compact_session(session_id)
+
+    def compact_session(self, session_id) -> int:
+        """
+        Flatten a fork: copy the rows it inherits from its bases and detach it.
+
+        Returns:
+            The number of bases the fork fell through to (0 if it was no fork)
+        """
+        self._session_chains.pop(session_id, None)
+        chain = self._session_chain(session_id)
+        for base_session_id in chain[1:]:
+            self.backend.copy_missing_llm_calls_query(base_session_id, session_id)
+        if len(chain) > 1:
+            self.backend.update_experiment_base_session_query(None, session_id)
+            self._session_chains.clear()
+        return len(chain) - 1
+
+    def detach_forks(self, session_id) -> None:
+        """Compact the forks of a session before the session is modified or rerun."""
+        for row in self.backend.get_forks_query(session_id):
+            logger.debug(f"Compacting fork {row['session_id']} of session {session_id}")
+            self.compact_session(row["session_id"])
+
+    def migrate_llm_calls(
+        self, vacuum: bool = False, batch_size: int = 500, compress: Optional[bool] = None
+    ) -> dict:
+        """
+        Rewrite the llm_calls rows stored in the old format, which kept to_show
+        next to raw (see ao.server.llm_call_format), batch by batch. Run it while
+        no session is being recorded or edited.
+
+        Args:
+            vacuum: Return the space freed by the rewrite to the file system
+            batch_size: Rows read and rewritten per batch
+            compress: True to also compress the values of all rows, False to store
+                them uncompressed, None to keep their encoding (see blob_compression.py)
+
+        Returns:
+            Number of rows read and rewritten, and size of the rewritten columns before and after
+        """
+        from ao.server.llm_call_format import migrate_row
+
+        columns = ("input", "input_overwrite", "output", "stack_trace")
+        compressor = None if compress is False else self._compressor or self._new_compressor()
+
+        def size(values):
+            return sum(
+                len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+                for value in values
+                if value is not None
+            )
+
+        def encode(row, column, old, old_text, text):
+            if text == old_text and (compress is None or compress == is_compressed(old)):
+                return old
+            if compress or (compress is None and is_compressed(old)):
+                return compressor.compress(text, row["api_type"], column)
+            return text
+
+        stats = {"rows": 0, "migrated": 0, "bytes_before": 0, "bytes_after": 0}
+        after = ("", "")
+        while True:
+            rows = self.backend.get_llm_calls_page_query(*after, batch_size)
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                stored = [row[column] for column in columns]
+                texts = [self._decompress(value) for value in stored]
+                migrated = migrate_row(dict(zip(columns, texts)))
+                new_texts = texts if migrated is None else [*migrated, texts[3]]
+                new = [encode(row, *values) for values in zip(columns, stored, texts, new_texts)]
+                if new != stored:
+                    updates.append((*new, row["session_id"], row["node_id"]))
+                    stats["bytes_before"] += size(stored)
+                    stats["bytes_after"] += size(new)
+            if updates:
+                self.backend.update_llm_calls_io_query(updates)
+            stats["rows"] += len(rows)
+            stats["migrated"] += len(updates)
+            after = (rows[-1]["session_id"], rows[-1]["node_id"])
+        if vacuum:
+            self.backend.vacuum_query()
+        return stats
+
+    def _session_chain(self, session_id) -> tuple:
+        """The session followed by its bases, nearest first (just the session if no fork)."""
+        chain = self._session_chains.get(session_id)
+        if chain is None:
+            chain = [session_id]
+            while True:
+                row = self.backend.get_experiment_base_session_query(chain[-1])
+                if row is None or not row["base_session_id"] or row["base_session_id"] in chain:
+                    break
+                chain.append(row["base_session_id"])
+            chain = tuple(chain)
+            self._session_chains[session_id] = chain
+        return chain
+
+    def _get_llm_call(self, session_id, input_hash):
+        """Lookup row of an LLM call of a session, or of its bases if it is a fork."""
+        chain = self._session_chain(session_id)
+        if len(chain) == 1:
+            return self.backend.get_llm_call_by_session_and_hash_query(session_id, input_hash)
+        rows = self.backend.get_llm_calls_by_sessions_and_hash_query(chain, input_hash)
+        if not rows:
+            return None
+        row = min(rows, key=lambda row: chain.index(row["session_id"]))
+        if row["session_id"] != session_id and row["output"] is None and not self.replay_only:
+            # Edited input of a base node that is about to be called: copy the row
+            # so the new output is stored next to its input overwrite.
+            self.backend.copy_llm_call_query(row["session_id"], session_id, row["node_id"])
+        return row
+
+    def _get_node_row(self, query, session_id, node_id):
+        """Run a (session_id, node_id) query on the session, then on its bases."""
+        for chain_session_id in self._session_chain(session_id):
+            row = query(chain_session_id, node_id)
+            if row is not None:
+                return row
+        return None
+
+    def _prepare_node_write(self, session_id, node_id) -> None:
+        """Before a node of a session is edited: compact its forks, copy the node into it if inherited."""
+        self.detach_forks(session_id)
+        for base_session_id in self._session_chain(session_id)[1:]:
+            # No-op once the session has its own row.
+            self.backend.copy_llm_call_query(base_session_id, session_id, node_id)
+
+    def _remember_llm_call(self, session_id, input_hash, node_id, output) -> None:
+        """Keep a preloaded session in sync with a row this process just cached."""
+        with self._preload_lock:
+            index = self._preloaded.get(session_id)
+            if index is None:
+                index = self._preloading.get(session_id)
+                if index is None:
+                    return
+            previous = index.get(input_hash)
+            input_overwrite = None
+            if previous is not None and previous["node_id"] == node_id:
+                input_overwrite = previous["input_overwrite"]
+            index[input_hash] = {
+                "session_id": session_id,
+                "node_id": node_id,
+                "input_overwrite": input_overwrite,
+                "output": output,
+            }
+
+    def _get_known_llm_call(self, session_id, input_hash):
+        """
+        Lookup row of an LLM call known without a DB query: queued in write-behind
+        mode or part of a preloaded session. None if unknown.
+        """
+        if self._write_queue is not None:
+            row = self._write_queue.get(session_id, input_hash)
+            if row is not None:
+                return row
+        index = self._preloaded.get(session_id)
+        if index is None:
+            return None
+        row = index.get(input_hash)
+        if (
+            row is not None
+            and row["session_id"] != session_id
+            and row["output"] is None
+            and not self.replay_only
+        ):
+            # Edited input of a base node, copy the row like _get_llm_call does
+            self.backend.copy_llm_call_query(row["session_id"], session_id, row["node_id"])
+            row["session_id"] = session_id
+        return row
+
+    @property
+    def db_executor(self) -> ThreadPoolExecutor:
+        """
+        Executor running the DB work of the async API (get_in_out_async, ...).
+
+        A single worker: backend calls are serialized by the backend lock anyway,
+        the point is to keep them off the event loop thread.
+        """
+        if self._db_executor is None:
+            with self._db_executor_lock:
+                if self._db_executor is None:
+                    self._db_executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="ao-db"
+                    )
+        return self._db_executor
+
+    async def _run_in_db_executor(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, fn, *args)
+
+    def add_call_metrics(self, rows):
+        """Insert call_metrics rows (session_id, node_id, api_type, phase, duration_ms)."""
+        self.backend.insert_call_metrics_query(rows)
+
+    def get_call_metrics(self, session_id):
+        """Get the call_metrics rows of a session (node_id, api_type, phase, duration_ms)."""
+        return self.backend.get_call_metrics_query(session_id)
 
     def get_finished_runs(self):
         """Get all finished runs."""
@@ -583,9 +1399,11 @@ class DatabaseManager:
         return row["cwd"], row["command"], json.loads(row["environment"])
 
     def clear_db(self):
-        """Delete all records from experiments and llm_calls tables."""
+        """Delete all records from experiments, llm_calls, call_metrics and shared_outputs."""
         self.backend.delete_all_experiments_query()
         self.backend.delete_all_llm_calls_query()
+        self.backend.delete_all_call_metrics_query()
+        self.backend.delete_all_shared_outputs_query()
 
     def get_session_name(self, session_id):
         """Get session name."""
@@ -597,11 +1415,15 @@ class DatabaseManager:
 
     def query_one_llm_call_input(self, session_id, node_id):
         """Get one llm-call input by session id and node id"""
-        return self.backend.get_llm_call_input_api_type_query(session_id, node_id)
+        return self._decompress_row(
+            self._get_node_row(self.backend.get_llm_call_input_api_type_query, session_id, node_id)
+        )
 
     def query_one_llm_call_output(self, session_id, node_id):
         """Get one llm-call output by session id and node id"""
-        return self.backend.get_llm_call_output_api_type_query(session_id, node_id)
+        return self._decompress_row(
+            self._get_node_row(self.backend.get_llm_call_output_api_type_query, session_id, node_id)
+        )
 
     def get_next_run_index(self):
         """Get the next run index based on how many runs already exist."""
@@ -614,11 +1436,20 @@ class DatabaseManager:
 
     def get_llm_calls_for_session(self, session_id):
         """Get all LLM calls for a session."""
-        return self.backend.get_llm_calls_for_session_query(session_id)
+        rows = []
+        nodes = set()
+        for chain_session_id in self._session_chain(session_id):
+            for row in self.backend.get_llm_calls_for_session_query(chain_session_id):
+                if row["node_id"] not in nodes:
+                    rows.append(row)
+            nodes.update(row["node_id"] for row in rows)
+        return [self._decompress_row(row) for row in rows]
 
     def get_llm_call_full(self, session_id, node_id):
         """Get full LLM call data including input, output, and overwrites."""
-        return self.backend.get_llm_call_full_query(session_id, node_id)
+        return self._decompress_row(
+            self._get_node_row(self.backend.get_llm_call_full_query, session_id, node_id)
+        )
 
     def copy_llm_calls(self, old_session_id, new_session_id):
         """Copy all LLM calls from one session to another."""
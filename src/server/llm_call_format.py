@@ -0,0 +1,147 @@
+"""
+Storage format of the input, input_overwrite and output columns of llm_calls.
+
+Intercepted inputs and outputs are wrapped as {"raw": ..., "to_show": ...} (see
+api_parser), to_show being the projection of raw shown in the UI. Rows used to
+store both, the input nesting its wrapped JSON as a string:
+
+    input            {"attachments": [...], "input": "{\"raw\": ..., \"to_show\": ...}", "model": ...}
+    input_overwrite  the input with the edited wrapped JSON
+    output           {"raw": ..., "to_show": ...}, edits of to_show not merged into raw
+
+to_show can be derived from raw, so rows now store raw only:
+
+    input            {"attachments": [...], "model": ..., "raw": {...}}
+    input_overwrite  {"edits": [[path, value], ...]}, the values of the input's raw the edit changes
+    output           {"raw": {...}}, edits merged into raw
+
+`decode` reads both formats and derives to_show on first access. The inline
+media of raw is stored as references to the attachment store (see
+inline_media.py). The input hash is still computed from the old input
+serialization, with to_show and the media inline (InterceptedCall.input_pickle),
+so recorded sessions keep hitting the cache. `migrate_row` rewrites a row stored
+in the old format (`ao-tool migrate`).
+"""
+
+import json
+from functools import cached_property
+from typing import Any, List, Optional, Tuple
+
+from ao.runner.monkey_patching.api_parser import apply_edits, filter_dict, unwrap_json_dict
+
+Edits = List[Tuple[list, Any]]
+
+
+class StoredIO:
+    """Decoded input or output column. to_show is derived from raw on first access."""
+
+    def __init__(self, raw, to_show=None, attachments=None, model=None, old_format=False):
+        self.raw = raw
+        self.attachments = attachments
+        self.model = model
+        self.old_format = old_format
+        if to_show is not None:
+            self.__dict__["to_show"] = to_show
+
+    @cached_property
+    def to_show(self) -> dict:
+        return filter_dict(self.raw)
+
+    def json_dict(self) -> dict:
+        """Wrapped {"raw": ..., "to_show": ...} dict."""
+        return {"raw": self.raw, "to_show": self.to_show}
+
+
+def encode_input(raw: dict, attachments: List[str], model: str) -> str:
+    return json.dumps({"attachments": attachments, "model": model, "raw": raw})
+
+
+def encode_output(raw: dict) -> str:
+    return json.dumps({"raw": raw})
+
+
+def decode(column: Optional[str]) -> Optional[StoredIO]:
+    """
+    Decoded input or output column, in either format. None if the column does
+    not hold a wrapped input or output.
+    """
+    try:
+        stored = json.loads(column)
+        attachments, model = stored.get("attachments"), stored.get("model")
+        if "input" in stored and "raw" not in stored:
+            stored = json.loads(stored["input"])
+        if "to_show" in stored:
+            # Old format, to_show may hold edits that raw does not have yet
+            return StoredIO(unwrap_json_dict(stored), stored["to_show"], attachments, model, True)
+        return StoredIO(stored["raw"], None, attachments, model)
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return None
+
+
+def raw_edits(old, new, path: Optional[list] = None, edits: Optional[Edits] = None) -> Edits:
+    """
+    (path, value) pairs that turn old into new with apply_edits: the changed
+    values, or the whole dict or list where keys or lengths differ.
+    """
+    path = [] if path is None else path
+    edits = [] if edits is None else edits
+    if isinstance(old, dict) and isinstance(new, dict) and old.keys() == new.keys():
+        for key, value in new.items():
+            raw_edits(old[key], value, path + [key], edits)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, value in enumerate(new):
+            raw_edits(old[index], value, path + [index], edits)
+    elif not (type(old) is type(new) and old == new):
+        edits.append((path, new))
+    return edits
+
+
+def encode_input_overwrite(raw: dict, edited: dict) -> Optional[str]:
+    """
+    input_overwrite of an input with the given raw, edited to the wrapped dict
+    edited (from the UI or ao-tool). None if the edit changes nothing.
+    """
+    edits = raw_edits(raw, unwrap_json_dict(edited))
+    return json.dumps({"edits": edits}) if edits else None
+
+
+def overwritten_input(input_overwrite: str, raw: dict) -> str:
+    """
+    Wrapped JSON of an edited input, given the raw input of the call (the same
+    as the stored one, since they have the same input hash).
+    """
+    overwrite = json.loads(input_overwrite)
+    if "edits" in overwrite:
+        return json.dumps({"raw": apply_edits(raw, overwrite["edits"])})
+    return overwrite["input"]
+
+
+def migrate_row(row) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    (input, input_overwrite, output) of an llm_calls row stored in the old
+    format, in the current one. None if the row needs no change.
+
+    Columns that are not wrapped inputs or outputs are left as they are.
+    """
+    input_column, overwrite, output = row["input"], row["input_overwrite"], row["output"]
+    stored_input = decode(input_column)
+    stored_output = decode(output)
+    changed = False
+    if stored_input is not None:
+        if overwrite is not None and "edits" not in json.loads(overwrite):
+            try:
+                edited = json.loads(json.loads(overwrite)["input"])
+                overwrite = encode_input_overwrite(stored_input.raw, edited)
+                overwrite = overwrite or json.dumps({"edits": []})
+                changed = True
+            except (TypeError, ValueError, KeyError, AttributeError):
+                pass
+        if stored_input.old_format:
+            input_column = encode_input(
+                stored_input.raw, stored_input.attachments, stored_input.model
+            )
+            changed = True
+    if stored_output is not None and stored_output.old_format:
+        output = encode_output(stored_output.raw)
+        changed = True
+    return (input_column, overwrite, output) if changed else None
@@ -0,0 +1,107 @@
+"""
+Single-flight deduplication of concurrent identical LLM calls.
+
+The llm_calls row of a call is only written once its response is back, so
+identical calls of a session issued at the same time (self-consistency sampling
+from a thread pool or `asyncio.gather`, retry storms) would all miss the cache
+and call the provider. `DatabaseManager.get_in_out` lets the first of them (the
+leader) do the lookup and, on a miss, the live call. The others (followers)
+wait until the leader's call is cached and then look up the cache again, where
+they find the leader's row and node id. If the leader's call fails, the next
+follower becomes the leader. A follower that waited SINGLE_FLIGHT_WAIT_S seconds
+makes its call live.
+
+A synchronous call on a thread running an event loop does not take part: it
+would block the loop an async leader needs to finish its call.
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class Flight:
+    """A call in flight. Followers wait until `done` is set."""
+
+    __slots__ = ("owner", "done", "_waiters")
+
+    def __init__(self, owner: Any):
+        self.owner = owner
+        self.done = threading.Event()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class SingleFlight:
+    """
+    Leader election among concurrent calls with the same key, for threads and coroutines.
+
+    The owner (thread id or asyncio task) of a flight never waits for it: a call
+    issued while the same thread or task leads an identical one proceeds on its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def acquire(self, key: Hashable, owner: Any) -> Tuple[Optional[Flight], bool]:
+        """
+        Join the flight of key.
+
+        Returns:
+            (flight, True) if the caller leads the new flight and must release it,
+            (flight, False) if the caller must wait for the flight and acquire again,
+            (None, False) if the caller already leads the flight and proceeds untracked
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight(owner)
+                return flight, True
+            if flight.owner == owner:
+                return None, False
+            return flight, False
+
+    def release(self, key: Hashable, flight: Flight) -> None:
+        """End a flight (its call is cached or failed) and wake its followers."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done.set()
+            waiters, flight._waiters = flight._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, flight: Flight, timeout: float) -> bool:
+        """Block the calling thread until the flight is released. False on timeout."""
+        return flight.done.wait(timeout)
+
+    async def wait_async(self, flight: Flight, timeout: float) -> bool:
+        """Wait until the flight is released without blocking the event loop. False on timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if flight.done.is_set():
+                return True
+            flight._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if (loop, future) in flight._waiters:
+                    flight._waiters.remove((loop, future))
+            return False
+        return True
+
+
+def loop_running() -> bool:
+    """Whether an event loop is running in the calling thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,133 @@
+"""
+Write-behind queue for llm_calls inserts.
+
+In write-behind mode, `DatabaseManager.cache_output` does not insert new
+llm_calls rows itself. It puts them into a bounded in-memory queue that a
+background writer drains in batched transactions (every `batch_rows` rows or
+`flush_interval` seconds). Pending rows stay visible to cache lookups until
+they are committed. A batch that fails to be written goes back to the queue:
+the writer retries it after `flush_interval`, and `flush()` and `close()` raise
+the error, so rows are not dropped silently.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ao.common.logger import logger
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of pending llm_calls rows, drained by a background writer thread.
+
+    Rows are the argument tuples of `insert_llm_call_with_output_query`:
+    (session_id, input_pickle, input_hash, node_id, api_type, output, stack_trace).
+
+    Args:
+        write_batch: Writes a list of rows in one transaction
+        batch_rows: Flush as soon as this many rows are pending
+        flush_interval: Flush pending rows at least this often (seconds)
+        max_pending: When this many rows are pending, put() flushes in the caller
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[tuple]], None],
+        batch_rows: int,
+        flush_interval: float,
+        max_pending: int,
+    ):
+        self._write_batch = write_batch
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        # (session_id, node_id) -> row, the key of llm_calls. _in_flight holds the
+        # batch that is being written, so rows stay visible to get() until they are
+        # committed. _by_hash indexes both by (session_id, input_hash) for get().
+        self._pending: Dict[Tuple[str, str], tuple] = {}
+        self._in_flight: Dict[Tuple[str, str], tuple] = {}
+        self._by_hash: Dict[Tuple[str, str], tuple] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+
+        self._writer = threading.Thread(target=self._run, name="ao-db-writer", daemon=True)
+        self._writer.start()
+
+    def put(self, row: tuple) -> None:
+        """Queue a row for insertion."""
+        session_id, _, input_hash, node_id = row[:4]
+        with self._cond:
+            self._pending[(session_id, node_id)] = row
+            self._by_hash[(session_id, input_hash)] = row
+            n_pending = len(self._pending)
+            if n_pending >= self.batch_rows:
+                self._cond.notify()
+        if n_pending >= self.max_pending:
+            # Writer fell behind: apply backpressure instead of growing unbounded.
+            try:
+                self.flush()
+            except Exception:
+                pass  # Logged by flush, the rows stay queued
+
+    def get(self, session_id: str, input_hash: str) -> Optional[dict]:
+        """
+        Return the pending row for (session_id, input_hash) in the shape of
+        `get_llm_call_by_session_and_hash_query`, or None.
+        """
+        with self._cond:
+            row = self._by_hash.get((session_id, input_hash))
+        if row is None:
+            return None
+        return {"node_id": row[3], "input_overwrite": None, "output": row[5]}
+
+    def flush(self) -> None:
+        """
+        Write all pending rows now (blocks until they are committed). If the
+        write fails, the rows are queued again and the error is raised.
+        """
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return
+                self._in_flight, self._pending = self._pending, {}
+            try:
+                self._write_batch(list(self._in_flight.values()))
+            except Exception as e:
+                logger.error(f"Failed to write {len(self._in_flight)} cached LLM calls: {e}")
+                with self._cond:
+                    # Rows queued since the batch was taken are newer, they win
+                    self._pending = {**self._in_flight, **self._pending}
+                    self._in_flight = {}
+                raise
+            with self._cond:
+                for key, row in self._in_flight.items():
+                    hash_key = (key[0], row[2])
+                    if self._by_hash.get(hash_key) is row:
+                        del self._by_hash[hash_key]
+                self._in_flight = {}
+
+    def close(self) -> None:
+        """Flush pending rows and stop the writer thread. Raises if the rows cannot be written."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.batch_rows,
+                    timeout=self.flush_interval,
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Retry the batch after flush_interval (or on close)
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=self.flush_interval)
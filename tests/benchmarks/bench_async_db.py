@@ -0,0 +1,132 @@
+"""
+Event loop throughput of the async patches: blocking vs. executor DB access.
+
+Sends N concurrent httpx.AsyncClient requests through the patched client to a
+local mock LLM server, once with cache misses (provider call + insert) and once
+with cache hits. "blocking" runs the DB lookup/insert on the event loop thread
+(the behaviour before get_in_out_async / cache_output_async), "executor" uses
+the async DB API. Also reports the worst event loop stall seen by a 1 ms ticker.
+
+--db-delay-ms adds a fixed delay to every llm_calls query, to emulate a slow
+disk or another process holding the SQLite write lock.
+
+Usage:
+    python tests/benchmarks/bench_async_db.py [--requests 200] [--db-delay-ms 2] [--json]
+"""
+
+import asyncio
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner, set_session
+    from tests.benchmarks.mock_llm_server import MockLLMServer
+except ImportError:
+    from harness import isolated_runner, set_session
+    from mock_llm_server import MockLLMServer
+
+
+def delay_llm_call_queries(backend, delay: float) -> None:
+    for name in ("get_llm_call_by_session_and_hash_query", "insert_llm_call_with_output_query"):
+        original = getattr(backend, name)
+
+        def delayed(*args, _original=original):
+            time.sleep(delay)
+            return _original(*args)
+
+        setattr(backend, name, delayed)
+
+
+def use_blocking_db(DB) -> None:
+    """Route the async DB API to the blocking implementation."""
+
+    async def get_in_out_async(call):
+        return DB.get_in_out(call)
+
+    async def cache_output_async(**kwargs):
+        return DB.cache_output(**kwargs)
+
+    DB.get_in_out_async = get_in_out_async
+    DB.cache_output_async = cache_output_async
+
+
+async def ticker(stop: asyncio.Event, stalls: list) -> None:
+    """Track the longest delay of a 1 ms sleep (event loop stall)."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - start - 0.001)
+
+
+async def run_round(url: str, n_requests: int, concurrency: int) -> dict:
+    import httpx
+
+    stop = asyncio.Event()
+    stalls = [0.0]
+    tick = asyncio.create_task(ticker(stop, stalls))
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+
+        async def one(i: int):
+            async with semaphore:
+                body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"q{i}"}]}
+                response = await client.post("/v1/chat/completions", json=body)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    return {
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(n_requests / elapsed, 1),
+        "max_loop_stall_ms": round(max(stalls) * 1000, 2),
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mock LLM latency")
+    parser.add_argument("--db-delay-ms", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    from ao.runner.monkey_patching.patches.httpx_patch import httpx_patch
+    from ao.server.database_manager import DB
+
+    httpx_patch()
+    if args.db_delay_ms:
+        delay_llm_call_queries(DB.backend, args.db_delay_ms / 1000)
+
+    results = []
+    with MockLLMServer(latency_ms=args.latency_ms) as server:
+        for mode in ("executor", "blocking"):
+            if mode == "blocking":
+                use_blocking_db(DB)
+            set_session(f"bench-async-db-{mode}")
+            for phase in ("miss", "hit"):
+                stats = asyncio.run(run_round(server.url, args.requests, args.concurrency))
+                results.append({"db_access": mode, "cache": phase, **stats})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'db access':>10}  {'cache':>5}  {'seconds':>8}  {'req/s':>8}  {'max stall ms':>12}")
+    for r in results:
+        print(
+            f"{r['db_access']:>10}  {r['cache']:>5}  {r['seconds']:>8.3f}  "
+            f"{r['requests_per_s']:>8.1f}  {r['max_loop_stall_ms']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Per-call serialization overhead: legacy pipeline vs. InterceptedCall.
+
+Before InterceptedCall, every stage of an intercepted call re-serialized the
+request/response on its own (edge detection, cache lookup, cache insert,
+output matching, input matching, graph update). This benchmark replays those
+stages on a synthetic chat completion call, without DB or server I/O, and
+reports the per-call time of both variants.
+
+Usage:
+    python tests/benchmarks/bench_call_record.py [--sizes 10000 50000 100000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+from ao.common.utils import get_node_label, get_raw_model_name, hash_input
+from ao.runner.monkey_patching.api_parser import func_kwargs_to_json_str, api_obj_to_json_str
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+from ao.runner.string_matching import (
+    clear_session_data,
+    extract_input_text,
+    extract_output_text,
+    matching_input,
+    tokenize,
+)
+
+try:
+    from tests.benchmarks.payloads import make_httpx_pair
+except ImportError:
+    from payloads import make_httpx_pair
+
+API_TYPE = "httpx.Client.send"
+SESSION_ID = "bench-session"
+
+
+def legacy_pipeline(input_dict, output_obj):
+    """The serialization work each stage used to do independently."""
+    # find_source_nodes
+    tokenize(extract_input_text(input_dict, API_TYPE))
+    # DB.get_in_out
+    api_json_str, attachments = func_kwargs_to_json_str(input_dict, API_TYPE)
+    model = get_raw_model_name(input_dict, API_TYPE)
+    input_pickle = json.dumps(
+        {"input": api_json_str, "attachments": attachments, "model": model}, sort_keys=True
+    )
+    hash_input(input_pickle)
+    # DB.cache_output
+    api_obj_to_json_str(output_obj, API_TYPE)
+    # store_output_strings
+    for text in extract_output_text(output_obj, API_TYPE):
+        tokenize(text)
+    # send_graph_node_and_edges (+ store_input_strings)
+    func_kwargs_to_json_str(input_dict, API_TYPE)
+    api_obj_to_json_str(output_obj, API_TYPE)
+    get_raw_model_name(input_dict, API_TYPE)
+    get_node_label(input_dict, API_TYPE)
+    tokenize(extract_input_text(input_dict, API_TYPE))
+
+
+def record_pipeline(input_dict, output_obj):
+    """The same stages reading from one InterceptedCall."""
+    clear_session_data(SESSION_ID)  # No input strings cached by earlier calls
+    call = InterceptedCall(input_dict, API_TYPE)
+    matching_input(SESSION_ID, call)
+    call.input_pickle
+    call.input_hash
+    call.output_obj = output_obj
+    call.output_json_str
+    for text in call.output_strings:
+        tokenize(text)
+    call.input_json_str
+    call.attachments
+    call.model
+    call.label
+    matching_input(SESSION_ID, call)
+
+
+def time_per_call(fn, input_dict, output_obj, repeat: int) -> float:
+    fn(input_dict, output_obj)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(input_dict, output_obj)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        request, response = make_httpx_pair(size)
+        input_dict = {"request": request}
+        before = time_per_call(legacy_pipeline, input_dict, response, args.repeat)
+        after = time_per_call(record_pipeline, input_dict, response, args.repeat)
+        results.append(
+            {
+                "prompt_bytes": size,
+                "before_ms": round(before * 1000, 3),
+                "after_ms": round(after * 1000, 3),
+                "speedup": round(before / after, 2),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'prompt bytes':>12}  {'before ms':>10}  {'after ms':>10}  {'speedup':>8}")
+    for r in results:
+        print(
+            f"{r['prompt_bytes']:>12}  {r['before_ms']:>10.3f}  {r['after_ms']:>10.3f}  "
+            f"{r['speedup']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Construction cost and memory per client: per-instance rebinding vs. class-level wrapper.
+
+The previous patches wrapped __init__ and bound a new closure to every client
+(`bound_obj.send = patched_function.__get__(bound_obj, bound_cls)`). The
+class-level wrapper from patch_class_method leaves construction untouched.
+Reports the time to build a client and the memory each live client holds, for
+httpx.Client (sharing one SSL context, as loading certificates would dominate)
+and requests.Session.
+
+Usage:
+    python tests/benchmarks/bench_client_construction.py [--clients 2000] [--json]
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from functools import wraps
+
+from ao.runner.monkey_patching.patches.httpx_patch import patch_httpx_send
+from ao.runner.monkey_patching.patches.requests_patch import patch_requests_send
+from ao.runner.monkey_patching.patching_utils import patch_class_method
+
+
+def legacy_patch_send(bound_obj, bound_cls):
+    """The previous per-instance rebinding, with the same closure shape."""
+    original_function = bound_obj.send
+
+    @wraps(original_function)
+    def patched_function(self, *args, **kwargs):
+        return original_function(*args, **kwargs)
+
+    bound_obj.send = patched_function.__get__(bound_obj, bound_cls)
+
+
+def legacy_patched(base):
+    class Legacy(base):
+        pass
+
+    original_init = Legacy.__init__
+
+    @wraps(original_init)
+    def patched_init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        legacy_patch_send(self, type(self))
+
+    Legacy.__init__ = patched_init
+    return Legacy
+
+
+def class_patched(base, make_patched):
+    class ClassLevel(base):
+        send = base.send
+
+    patch_class_method(ClassLevel, "send", make_patched)
+    return ClassLevel
+
+
+def time_per_client(cls, kwargs, n_clients: int) -> float:
+    cls(**kwargs)  # warm up
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        clients = [cls(**kwargs) for _ in range(n_clients)]
+        best = min(best, (time.perf_counter() - start) / n_clients)
+        del clients
+    return best
+
+
+def bytes_per_client(cls, kwargs, n_clients: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    clients = [cls(**kwargs) for _ in range(n_clients)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del clients
+    return size / n_clients
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    import httpx
+    import requests
+
+    targets = {
+        "httpx.Client": (httpx.Client, {"verify": httpx.create_ssl_context()}, patch_httpx_send),
+        "requests.Session": (requests.Session, {}, patch_requests_send),
+    }
+    results = []
+    for name, (base, kwargs, make_patched) in targets.items():
+        variants = {
+            "unpatched": base,
+            "per-instance": legacy_patched(base),
+            "class-level": class_patched(base, make_patched),
+        }
+        for variant, cls in variants.items():
+            results.append(
+                {
+                    "client": name,
+                    "variant": variant,
+                    "construct_us": round(time_per_client(cls, kwargs, args.clients) * 1e6, 1),
+                    "bytes_per_client": round(bytes_per_client(cls, kwargs, args.clients)),
+                }
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'client':>16}  {'variant':>12}  {'construct us':>12}  {'bytes/client':>12}")
+    for r in results:
+        print(
+            f"{r['client']:>16}  {r['variant']:>12}  {r['construct_us']:>12.1f}  "
+            f"{r['bytes_per_client']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Size and read/write cost of llm_calls rows: plain TEXT vs. zlib vs. zlib with a dictionary.
+
+Records a simulated tool-using agent session (DB.get_in_out + DB.cache_output,
+each turn resending the system prompt, tool schemas and the growing history) on
+a fresh SQLite DB, once per storage mode. Reports the stored size of the input,
+output and stack_trace columns and the compression ratio, the time per recorded
+call, and the time per cache hit when the session is replayed (lookup,
+decompression and decoding of the output).
+
+Usage:
+    python tests/benchmarks/bench_db_compression.py [--turns 50] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner, set_session
+    from tests.benchmarks.payloads import (
+        CHAT_URL,
+        make_chat_completion,
+        make_text,
+        make_tool_chat_body,
+    )
+except ImportError:
+    from harness import isolated_runner, set_session
+    from payloads import CHAT_URL, make_chat_completion, make_text, make_tool_chat_body
+
+API_TYPE = "httpx.Client.send"
+MODES = ("plain", "zlib", "zlib + dictionary")
+
+
+def make_turns(turns: int, step_bytes: int, output_bytes: int) -> list:
+    """(request, response) of each turn of one conversation."""
+    import httpx
+
+    pairs = []
+    for turn in range(1, turns + 1):
+        body = json.dumps(make_tool_chat_body(turn * step_bytes, n_tools=10)).encode("utf-8")
+        request = httpx.Request(
+            "POST", CHAT_URL, content=body, headers={"content-type": "application/json"}
+        )
+        response = httpx.Response(
+            200, json=make_chat_completion(make_text(output_bytes, seed=turn)), request=request
+        )
+        response.read()
+        pairs.append((request, response))
+    return pairs
+
+
+def column_bytes(DB, session_id: str) -> dict:
+    row = DB.query_one(
+        """SELECT SUM(LENGTH(CAST(input AS BLOB))) AS input,
+                  SUM(LENGTH(CAST(output AS BLOB))) AS output,
+                  SUM(LENGTH(CAST(stack_trace AS BLOB))) AS stack_trace
+           FROM llm_calls WHERE session_id=?""",
+        (session_id,),
+    )
+    return {column: row[column] for column in ("input", "output", "stack_trace")}
+
+
+def measure(DB, mode: str, pairs: list) -> dict:
+    from ao.common.constants import DB_COMPRESSION_DICT_SAMPLES
+    from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+
+    session_id = f"bench-compression-{mode}"
+    set_session(session_id)
+    DB._compressor = None if mode == "plain" else DB._new_compressor()
+    if mode == "zlib":
+        DB._compressor.dict_samples = len(pairs) + 1  # never builds a dictionary
+    elif mode != "plain":
+        DB._compressor.dict_samples = min(DB_COMPRESSION_DICT_SAMPLES, len(pairs))
+
+    calls = [InterceptedCall({"request": request}, API_TYPE) for request, _ in pairs]
+    for call in calls:
+        call.input_hash  # serialize outside the timed loop
+    start = time.perf_counter()
+    for call, (_, response) in zip(calls, pairs):
+        cache_output = DB.get_in_out(call)
+        DB.cache_output(cache_result=cache_output, output_obj=response, api_type=API_TYPE)
+    write = (time.perf_counter() - start) / len(pairs)
+
+    calls = [InterceptedCall({"request": request}, API_TYPE) for request, _ in pairs]
+    for call in calls:
+        call.input_hash
+    start = time.perf_counter()
+    for call in calls:
+        assert DB.get_in_out(call).output is not None
+    read = (time.perf_counter() - start) / len(pairs)
+
+    sizes = column_bytes(DB, session_id)
+    return {
+        "mode": mode,
+        **sizes,
+        "total": sum(sizes.values()),
+        "write_ms": round(write * 1000, 3),
+        "hit_ms": round(read * 1000, 3),
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--step-bytes", type=int, default=2000, help="History added per turn")
+    parser.add_argument("--output-bytes", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    from ao.server.database_manager import DB
+
+    pairs = make_turns(args.turns, args.step_bytes, args.output_bytes)
+    results = [measure(DB, mode, pairs) for mode in MODES]
+    for r in results:
+        r["ratio"] = round(results[0]["total"] / r["total"], 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'mode':>17}  {'input KB':>9}  {'output KB':>9}  {'stack KB':>8}  {'ratio':>6}  "
+        f"{'write ms':>8}  {'hit ms':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['mode']:>17}  {r['input'] / 1024:>9.1f}  {r['output'] / 1024:>9.1f}  "
+            f"{r['stack_trace'] / 1024:>8.1f}  {r['ratio']:>6.2f}  {r['write_ms']:>8.3f}  "
+            f"{r['hit_ms']:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-request overhead of the patches on non-LLM traffic.
+
+Compares the previous passthrough check (bind all arguments with
+get_input_dict, then try the whitelist pairs one by one on the full URL) with
+the endpoint classifier (read the request argument, one combined path regex,
+one host prefilter, cached per (host, path)). Also times a patched
+httpx.Client.send against an unpatched one on a mock transport, for repeated
+endpoints and for unique object-store style paths that miss the cache.
+
+Usage:
+    python tests/benchmarks/bench_endpoint_classifier.py [--repeat 50000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner
+except ImportError:
+    from harness import isolated_runner
+
+REPEATED_URLS = [
+    "https://telemetry.example.com/v1/traces",
+    "https://s3.amazonaws.com/bucket/object.json",
+    "https://api.github.com/repos/org/repo/issues",
+    "http://localhost:6333/collections/docs/points/search",
+]
+
+
+def make_requests(unique: bool, repeat: int):
+    import httpx
+
+    if unique:
+        urls = [f"https://s3.amazonaws.com/bucket/chunk-{i}.bin" for i in range(repeat)]
+    else:
+        urls = [REPEATED_URLS[i % len(REPEATED_URLS)] for i in range(repeat)]
+    return [httpx.Request("GET", url) for url in urls]
+
+
+def legacy_passthrough(send, request):
+    from ao.common.constants import COMPILED_ENDPOINT_PATTERNS
+    from ao.runner.monkey_patching.patching_utils import get_input_dict
+
+    input_dict = get_input_dict(send, request)
+    request = input_dict["request"]
+    url, path = str(request.url), request.url.path
+    for url_pattern, path_pattern in COMPILED_ENDPOINT_PATTERNS:
+        if url_pattern.search(url) and path_pattern.search(path):
+            return True
+    return False
+
+
+def classifier_passthrough(send, request):
+    from ao.common.utils import is_whitelisted_host_path
+
+    return is_whitelisted_host_path(request.url.host, request.url.path)
+
+
+def time_per_request(fn, requests, rounds: int = 3) -> float:
+    """Best of rounds, the mock transport makes single runs noisy."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for request in requests:
+            fn(request)
+        best = min(best, (time.perf_counter() - start) / len(requests))
+    return best
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50_000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    import httpx
+
+    from ao.common.utils import is_whitelisted_host_path
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"{}"))
+    plain_send = httpx.Client(transport=transport).send
+
+    from ao.runner.monkey_patching.patches.httpx_patch import httpx_patch
+
+    httpx_patch()
+    patched_send = httpx.Client(transport=transport).send
+
+    results = []
+    for unique in (False, True):
+        requests = make_requests(unique, args.repeat)
+        is_whitelisted_host_path.cache_clear()
+        legacy = time_per_request(lambda r: legacy_passthrough(plain_send, r), requests)
+        classifier = time_per_request(lambda r: classifier_passthrough(plain_send, r), requests)
+        unpatched = time_per_request(plain_send, requests)
+        patched = time_per_request(patched_send, requests)
+        results.append(
+            {
+                "endpoints": "unique" if unique else "repeated",
+                "legacy_check_us": round(legacy * 1e6, 2),
+                "classifier_us": round(classifier * 1e6, 2),
+                "unpatched_send_us": round(unpatched * 1e6, 2),
+                "patched_send_us": round(patched * 1e6, 2),
+                "overhead_us": round((patched - unpatched) * 1e6, 2),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'endpoints':>9}  {'legacy check us':>15}  {'classifier us':>13}  "
+        f"{'send us (plain/patched)':>23}  {'overhead us':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['endpoints']:>9}  {r['legacy_check_us']:>15.2f}  {r['classifier_us']:>13.2f}  "
+            f"{r['unpatched_send_us']:>11.2f} / {r['patched_send_us']:<9.2f}  "
+            f"{r['overhead_us']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Text extraction for content matching: flatten + regex filter vs. single walk.
+
+extract_strings used to flatten the whole to_show projection with
+flatten_json and test every flattened key against all of
+STRING_MATCH_EXCLUDE_PATTERNS. It now walks the projection once and matches
+the last part of each key against the patterns' suffixes. This benchmark times
+both on the to_show projection of tool-using chat requests (tool schemas, tool
+calls and tool results) and checks that they extract the same strings.
+
+Usage:
+    python tests/benchmarks/bench_extract_strings.py [--sizes 10000 100000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.payloads import make_tool_chat_body
+except ImportError:
+    from payloads import make_tool_chat_body
+
+from flatten_json import flatten
+
+from ao.common.constants import COMPILED_STRING_MATCH_EXCLUDE_PATTERNS
+from ao.runner.monkey_patching.api_parser import func_kwargs_to_json_dict
+from ao.runner.string_matching import extract_strings
+
+API_TYPE = "httpx.Client.send"
+CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+
+def flatten_extract_strings(to_show):
+    """extract_strings before the single walk."""
+    return [
+        v
+        for k, v in flatten(to_show, ".").items()
+        if isinstance(v, str)
+        and not any(p.match(k) for p in COMPILED_STRING_MATCH_EXCLUDE_PATTERNS)
+    ]
+
+
+def make_to_show(prompt_bytes: int):
+    import httpx
+
+    body = json.dumps(make_tool_chat_body(prompt_bytes)).encode("utf-8")
+    request = httpx.Request(
+        "POST", CHAT_URL, content=body, headers={"content-type": "application/json"}
+    )
+    return func_kwargs_to_json_dict({"request": request}, API_TYPE)[0]["to_show"], len(body)
+
+
+def time_per_call(fn, to_show, repeat: int) -> float:
+    fn(to_show)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(to_show)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        to_show, body_bytes = make_to_show(size)
+        before = time_per_call(flatten_extract_strings, to_show, args.repeat)
+        after = time_per_call(extract_strings, to_show, args.repeat)
+        results.append(
+            {
+                "body_bytes": body_bytes,
+                "strings": len(extract_strings(to_show)),
+                "flatten_ms": round(before * 1000, 3),
+                "walk_ms": round(after * 1000, 3),
+                "speedup": round(before / after, 1),
+                "same_strings": extract_strings(to_show) == flatten_extract_strings(to_show),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'body bytes':>10}  {'strings':>7}  {'flatten ms':>10}  {'walk ms':>8}  {'speedup':>8}  same"
+    )
+    for r in results:
+        print(
+            f"{r['body_bytes']:>10}  {r['strings']:>7}  {r['flatten_ms']:>10.3f}  "
+            f"{r['walk_ms']:>8.3f}  {r['speedup']:>7.1f}x  {r['same_strings']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Per-call argument binding time of get_input_dict.
+
+Compares the previous implementation (inspect.signature + Signature.bind on
+every call) with the cached binders, on the call shapes of the patched
+functions: httpx/requests `send`, MCP `send_request` and genai `async_request`.
+
+Usage:
+    python tests/benchmarks/bench_get_input_dict.py [--repeat 100000] [--json]
+"""
+
+import inspect
+import json
+import time
+from argparse import ArgumentParser
+
+from ao.runner.monkey_patching.patching_utils import _bind_with_signature, get_input_dict
+
+
+class ClientSession:
+    def send_request(self, request, result_type, request_read_timeout_seconds=None, **kwargs):
+        pass
+
+
+class BaseApiClient:
+    async def async_request(self, http_method, path, request_dict, http_options=None):
+        pass
+
+
+def shapes():
+    import httpx
+    import requests
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return {
+        "httpx.Client.send": (httpx.Client().send, (request,), {"stream": False}),
+        "requests.Session.send": (
+            requests.Session().send,
+            (request,),
+            {"timeout": 600, "verify": True, "proxies": {}, "stream": False, "cert": None},
+        ),
+        "MCP send_request": (ClientSession().send_request, (request, dict), {}),
+        "genai async_request": (
+            BaseApiClient().async_request,
+            ("post", "models/gemini-2.0-flash:generateContent", {"contents": []}),
+            {"http_options": None},
+        ),
+    }
+
+
+def legacy_get_input_dict(func, *args, **kwargs):
+    return _bind_with_signature(inspect.signature(func), args, kwargs)
+
+
+def time_per_call(fn, func, args, kwargs, repeat: int) -> float:
+    fn(func, *args, **kwargs)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(func, *args, **kwargs)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=100_000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name, (func, call_args, call_kwargs) in shapes().items():
+        assert get_input_dict(func, *call_args, **call_kwargs) == legacy_get_input_dict(
+            func, *call_args, **call_kwargs
+        )
+        before = time_per_call(legacy_get_input_dict, func, call_args, call_kwargs, args.repeat)
+        after = time_per_call(get_input_dict, func, call_args, call_kwargs, args.repeat)
+        results.append(
+            {
+                "shape": name,
+                "before_us": round(before * 1e6, 2),
+                "after_us": round(after * 1e6, 2),
+                "speedup": round(before / after, 1),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'shape':>22}  {'before us':>9}  {'after us':>8}  {'speedup':>7}")
+    for r in results:
+        print(
+            f"{r['shape']:>22}  {r['before_us']:>9.2f}  {r['after_us']:>8.2f}  "
+            f"{r['speedup']:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
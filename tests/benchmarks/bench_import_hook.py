@@ -0,0 +1,115 @@
+"""
+Import cost of the lazy patching hook: builtins.__import__ wrapper vs. meta_path finder.
+
+Each variant runs in a fresh interpreter: no hook, the previous
+builtins.__import__ wrapper, and the LazyPatchFinder installed by
+apply_all_monkey_patches. Reports the time to import an agent's dependencies
+(langchain, crewai, openai, ... whichever are installed; patches included) and
+the per-statement cost of a repeated function-level `from json import dumps`.
+
+Usage:
+    python tests/benchmarks/bench_import_hook.py [--modules openai anthropic] [--json]
+"""
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+DEFAULT_MODULES = ["langchain", "langchain_openai", "crewai", "openai", "anthropic", "requests"]
+
+VARIANT_SETUP = {
+    "no hook": "",
+    "builtins.__import__": """
+import builtins
+from ao.runner.monkey_patching.apply_monkey_patches import LAZY_PATCHES
+_original_import = builtins.__import__
+_applied_patches = set()
+
+def _patching_import(name, globals=None, locals=None, fromlist=(), level=0):
+    for module_prefix, (patch_module, patch_func_name) in list(LAZY_PATCHES.items()):
+        if module_prefix in _applied_patches:
+            continue
+        if name == module_prefix or name.startswith(module_prefix + "."):
+            _applied_patches.add(module_prefix)
+            patch_mod = _original_import(patch_module, fromlist=[patch_func_name])
+            getattr(patch_mod, patch_func_name)()
+    return _original_import(name, globals, locals, fromlist, level)
+
+builtins.__import__ = _patching_import
+""",
+    "meta_path finder": """
+from ao.runner.monkey_patching.apply_monkey_patches import apply_all_monkey_patches
+apply_all_monkey_patches()
+""",
+}
+
+MEASURE = """
+import importlib, json, time
+import ao.runner.monkey_patching.patches.httpx_patch  # patch modules loaded in every variant
+import ao.runner.monkey_patching.patches.requests_patch
+{setup}
+start = time.perf_counter()
+imported = []
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+        imported.append(name)
+    except ImportError:
+        pass
+import_s = time.perf_counter() - start
+
+def function_level_import():
+    from json import dumps
+    return dumps
+
+start = time.perf_counter()
+for _ in range({repeat}):
+    function_level_import()
+repeated_s = time.perf_counter() - start
+print(json.dumps({{"imported": imported, "import_s": import_s, "repeated_s": repeated_s}}))
+"""
+
+
+def run_variant(setup: str, modules, repeat: int) -> dict:
+    code = MEASURE.format(setup=setup, modules=modules, repeat=repeat)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per variant")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for variant, setup in VARIANT_SETUP.items():
+        runs = [run_variant(setup, args.modules, args.repeat) for _ in range(args.runs)]
+        results.append(
+            {
+                "variant": variant,
+                "modules": runs[0]["imported"],
+                "import_ms": round(min(r["import_s"] for r in runs) * 1000, 1),
+                "ns_per_repeated_import": round(
+                    min(r["repeated_s"] for r in runs) / args.repeat * 1e9, 1
+                ),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"modules: {', '.join(results[0]['modules'])}")
+    print(f"{'variant':>20}  {'import ms':>9}  {'ns/repeated import':>18}")
+    for r in results:
+        print(f"{r['variant']:>20}  {r['import_ms']:>9.1f}  {r['ns_per_repeated_import']:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
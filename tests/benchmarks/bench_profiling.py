@@ -0,0 +1,95 @@
+"""
+Cost of per-phase call profiling: disabled vs. sampled vs. every call.
+
+Records N chat completions through the patched httpx.Client against an
+in-process mock transport, then replays them from the cache (the path where
+AO's own work dominates). Reports the replay time per call (best of --repeat
+replays) with profiling off, at a 10% sample rate and for every call, plus the
+phase breakdown that `ao-tool profile` would show for the fully profiled run.
+
+Usage:
+    python tests/benchmarks/bench_profiling.py [--calls 200] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner, set_session
+    from tests.benchmarks.payloads import make_chat_body, make_chat_completion, make_text
+except ImportError:
+    from harness import isolated_runner, set_session
+    from payloads import make_chat_body, make_chat_completion, make_text
+
+URL = "https://api.openai.com/v1/chat/completions"
+VARIANTS = {"off": 0.0, "sampled 10%": 0.1, "every call": 1.0}
+
+
+def run_calls(client, bodies) -> float:
+    start = time.perf_counter()
+    for body in bodies:
+        client.post(URL, json=body)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--prompt-bytes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3, help="Replays per variant (best kept)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    import httpx
+
+    from ao.runner import profiling
+    from ao.runner.monkey_patching.patches.httpx_patch import httpx_patch
+    from ao.server.database_manager import DB
+
+    httpx_patch()
+    reply = make_chat_completion(make_text(500))
+    client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=reply))
+    )
+    bodies = [make_chat_body(args.prompt_bytes, seed=i) for i in range(args.calls)]
+
+    results = []
+    summary = None
+    for variant, rate in VARIANTS.items():
+        session_id = f"bench-profiling-{variant}"
+        set_session(session_id)
+        profiling.enable_profiling(rate)
+        run_calls(client, bodies)  # record
+        elapsed = min(run_calls(client, bodies) for _ in range(args.repeat))  # replay
+        profiling.flush_call_metrics()
+        rows = DB.get_call_metrics(session_id)
+        results.append(
+            {
+                "variant": variant,
+                "calls": args.calls,
+                "us_per_replayed_call": round(elapsed / args.calls * 1e6, 1),
+                "metric_rows": len(rows),
+            }
+        )
+        if rate == 1.0:
+            summary = profiling.summarize_call_metrics(rows)
+
+    if args.json:
+        print(json.dumps({"variants": results, "phases": summary["phases"]}, indent=2))
+        return
+
+    print(f"{'variant':>12}  {'calls':>6}  {'us/replayed call':>16}  {'metric rows':>11}")
+    for r in results:
+        print(
+            f"{r['variant']:>12}  {r['calls']:>6}  {r['us_per_replayed_call']:>16.1f}  "
+            f"{r['metric_rows']:>11}"
+        )
+    print(f"\n{'phase (every call)':>18}  {'mean ms':>8}  {'p95 ms':>8}")
+    for phase, stats in summary["phases"].items():
+        print(f"{phase:>18}  {stats['mean_ms']:>8.3f}  {stats['p95_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Redundant edge pruning cost against the number of nodes in a session.
+
+Simulates a session of N nodes (--nodes) made of chat conversations of --turns
+calls. Each call quotes the outputs of all earlier calls of its conversation, so
+they are all its sources and each output is in the next call's input. Times the
+reachability update and pruning of the last --measure nodes: the descendant
+sets and pairwise containment checks they replaced vs. Reachability and
+memoized checks, both with the real containment check. Also checks that both
+keep the same edges.
+
+Usage:
+    python tests/benchmarks/bench_reachability.py [--nodes 1000 10000] [--turns 30] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from types import SimpleNamespace
+
+try:
+    from tests.benchmarks.harness import isolated_runner
+    from tests.benchmarks.payloads import make_text
+except ImportError:
+    from harness import isolated_runner
+    from payloads import make_text
+
+SESSION_ID = "bench-session"
+
+
+def store_node(node_id, history, output):
+    from ao.runner import string_matching
+
+    call = SimpleNamespace(input_strings=list(history), matching_input=None)
+    string_matching.store_input_strings(SESSION_ID, node_id, call)
+    string_matching.store_output_strings(
+        SESSION_ID, node_id, SimpleNamespace(output_strings=[output])
+    )
+
+
+def pairwise_prune(reachable, node_id, source_node_ids):
+    """send_graph_node_and_edges before Reachability."""
+    from ao.runner.string_matching import _output_contained_in_input
+
+    for source_node_id in source_node_ids:
+        reachable[source_node_id].add(node_id)
+    for reachable_by_a in list(reachable.values()):
+        if any(source_node_id in reachable_by_a for source_node_id in source_node_ids):
+            reachable_by_a.add(node_id)
+    removed = set()
+    for node_a in source_node_ids:
+        for node_b in source_node_ids:
+            if node_a != node_b and node_b in reachable[node_a]:
+                if _output_contained_in_input(SESSION_ID, node_a, node_b):
+                    removed.add(node_a)
+    return [n for n in source_node_ids if n not in removed]
+
+
+def bitset_prune(reachability, node_id, source_node_ids):
+    from ao.runner.string_matching import output_contained_in_input
+
+    reachability.add(node_id, source_node_ids)
+    removed = reachability.redundant_sources(
+        source_node_ids, lambda a, b: output_contained_in_input(SESSION_ID, a, b)
+    )
+    return [n for n in source_node_ids if n not in removed]
+
+
+def measure(n_nodes: int, turns: int, n_measured: int):
+    from ao.runner.reachability import Reachability
+    from ao.runner.string_matching import clear_session_data
+
+    clear_session_data(SESSION_ID)
+    reachable = defaultdict(set)
+    reachability = Reachability()
+    system_prompt = make_text(500, seed=-1)
+    pairwise_s = bitset_s = 0.0
+    same_edges = True
+    conversation = []
+    for i in range(n_nodes):
+        if i % turns == 0:
+            conversation = []
+        node_id = f"node-{i}"
+        history = [system_prompt] + [output for _, output in conversation]
+        sources = [source_id for source_id, _ in conversation]
+        store_node(node_id, history, make_text(300, seed=i))
+
+        if i < n_nodes - n_measured:
+            # Same state as the pairwise update would leave, built directly
+            for source_id in sources:
+                reachable[source_id].add(node_id)
+            bitset_prune(reachability, node_id, sources)
+        else:
+            start = time.perf_counter()
+            pairwise_edges = pairwise_prune(reachable, node_id, sources)
+            pairwise_s += time.perf_counter() - start
+            start = time.perf_counter()
+            bitset_edges = bitset_prune(reachability, node_id, sources)
+            bitset_s += time.perf_counter() - start
+            same_edges = same_edges and pairwise_edges == bitset_edges
+        conversation.append((node_id, make_text(300, seed=i)))
+
+    return {
+        "nodes": n_nodes,
+        "pairwise_ms": round(pairwise_s / n_measured * 1e3, 3),
+        "bitset_ms": round(bitset_s / n_measured * 1e3, 3),
+        "speedup": round(pairwise_s / bitset_s, 1),
+        "same_edges": same_edges,
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--turns", type=int, default=30, help="Calls per conversation")
+    parser.add_argument("--measure", type=int, default=30, help="Nodes timed at the end")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner(SESSION_ID)
+    results = [measure(n, args.turns, args.measure) for n in args.nodes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'nodes':>7}  {'pairwise ms/node':>16}  {'bitset ms/node':>14}  {'speedup':>8}  same")
+    for r in results:
+        print(
+            f"{r['nodes']:>7}  {r['pairwise_ms']:>16.3f}  {r['bitset_ms']:>14.3f}  "
+            f"{r['speedup']:>7.1f}x  {r['same_edges']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Cache lookups of a fully cached rerun: per-call DB query vs. preloaded session.
+
+Records N LLM calls into one session, then replays the same N calls through
+DB.get_in_out, once querying the DB per call and once after
+DB.preload_session. Reports the time of the lookups (the decoded responses
+are the same in both variants) and of the preload itself.
+
+Usage:
+    python tests/benchmarks/bench_rerun_preload.py [--nodes 100 1000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner, set_session
+    from tests.benchmarks.payloads import make_httpx_pair
+except ImportError:
+    from harness import isolated_runner, set_session
+    from payloads import make_httpx_pair
+
+API_TYPE = "httpx.Client.send"
+
+
+def make_calls(n_nodes: int, prompt_bytes: int):
+    from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+
+    calls = []
+    for i in range(n_nodes):
+        request, response = make_httpx_pair(prompt_bytes, output_bytes=1000, seed=i)
+        call = InterceptedCall({"request": request}, API_TYPE)
+        call.input_hash  # serialize outside the timed loops
+        calls.append((call, response))
+    return calls
+
+
+def lookup_all(DB, backend, calls) -> float:
+    """Time the llm_calls lookups get_in_out does for calls."""
+    from ao.runner.context_manager import get_session_id
+
+    session_id = get_session_id()
+    start = time.perf_counter()
+    for call, _ in calls:
+        row = DB._get_known_llm_call(session_id, call.input_hash)
+        if row is None:
+            row = backend.get_llm_call_by_session_and_hash_query(session_id, call.input_hash)
+        assert row is not None and row["output"] is not None
+    return time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--prompt-bytes", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    from ao.server.database_manager import DB
+
+    results = []
+    for n_nodes in args.nodes:
+        session_id = f"bench-preload-{n_nodes}"
+        set_session(session_id)
+        calls = make_calls(n_nodes, args.prompt_bytes)
+        for call, response in calls:
+            cache_output = DB.get_in_out(call)
+            DB.cache_output(cache_result=cache_output, output_obj=response, api_type=API_TYPE)
+
+        DB.drop_preloaded_sessions()
+        per_call = lookup_all(DB, DB.backend, calls)
+
+        start = time.perf_counter()
+        DB.preload_session(session_id)
+        while session_id not in DB._preloaded:
+            time.sleep(0.0005)
+        preload = time.perf_counter() - start
+        preloaded = lookup_all(DB, DB.backend, calls)
+
+        full_hits = []
+        for variant in ("per-call query", "preloaded"):
+            if variant == "per-call query":
+                DB.drop_preloaded_sessions()
+            start = time.perf_counter()
+            for call, _ in calls:
+                assert DB.get_in_out(call).output is not None
+            full_hits.append(time.perf_counter() - start)
+
+        results.append(
+            {
+                "nodes": n_nodes,
+                "per_call_query_ms": round(per_call * 1000, 2),
+                "preload_ms": round(preload * 1000, 2),
+                "preloaded_lookup_ms": round(preloaded * 1000, 2),
+                "get_in_out_per_call_query_ms": round(full_hits[0] * 1000, 2),
+                "get_in_out_preloaded_ms": round(full_hits[1] * 1000, 2),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'nodes':>6}  {'per-call query ms':>17}  {'preload ms':>10}  {'preloaded ms':>12}  "
+        f"{'get_in_out query/preloaded ms':>30}"
+    )
+    for r in results:
+        print(
+            f"{r['nodes']:>6}  {r['per_call_query_ms']:>17.2f}  {r['preload_ms']:>10.2f}  "
+            f"{r['preloaded_lookup_ms']:>12.2f}  "
+            f"{r['get_in_out_per_call_query_ms']:>14.2f} / {r['get_in_out_preloaded_ms']:<13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
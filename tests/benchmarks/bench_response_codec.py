@@ -0,0 +1,106 @@
+"""
+Cached response codec: dill pickle vs. structured format.
+
+Compares the legacy codec (whole Response pickled with dill, base64 in
+"_obj_str") with the structured "http-response-v1" codec for httpx and
+requests responses. Reports encode time, decode time (cache hit) and the
+size of the string stored in llm_calls.output.
+
+Usage:
+    python tests/benchmarks/bench_response_codec.py [--sizes 1000 10000 100000] [--json]
+"""
+
+import base64
+import json
+import time
+from argparse import ArgumentParser
+
+import dill
+
+from ao.runner.monkey_patching.api_parser import (
+    api_obj_to_json_str,
+    filter_dict,
+    json_str_to_api_obj,
+)
+
+try:
+    from tests.benchmarks.payloads import make_httpx_pair, make_requests_pair
+except ImportError:
+    from payloads import make_httpx_pair, make_requests_pair
+
+API_TYPES = {
+    "httpx": ("httpx.Client.send", make_httpx_pair),
+    "requests": ("requests.Session.send", make_requests_pair),
+}
+
+
+def legacy_encode(response, api_type: str) -> str:
+    """The codec before the format tag: dill-pickle the whole response."""
+    encoding = response.encoding or "utf-8"
+    raw = {
+        "_obj_str": base64.b64encode(dill.dumps(response)).decode(encoding),
+        "_encoding": encoding,
+        "content": json.loads(response.content.decode(encoding)),
+    }
+    return json.dumps({"raw": raw, "to_show": filter_dict(raw)})
+
+
+def structured_encode(response, api_type: str) -> str:
+    return api_obj_to_json_str(response, api_type)
+
+
+def time_per_op(fn, *args, repeat: int) -> float:
+    fn(*args)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for library, (api_type, make_pair) in API_TYPES.items():
+        for size in args.sizes:
+            _, response = make_pair(prompt_bytes=1_000, output_bytes=size)
+            for codec, encode in (("dill", legacy_encode), ("structured", structured_encode)):
+                stored = encode(response, api_type)
+                results.append(
+                    {
+                        "library": library,
+                        "codec": codec,
+                        "body_bytes": len(response.content),
+                        "stored_bytes": len(stored.encode("utf-8")),
+                        "encode_us": round(
+                            time_per_op(encode, response, api_type, repeat=args.repeat) * 1e6, 1
+                        ),
+                        "decode_us": round(
+                            time_per_op(json_str_to_api_obj, stored, api_type, repeat=args.repeat)
+                            * 1e6,
+                            1,
+                        ),
+                    }
+                )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'library':>8}  {'codec':>10}  {'body B':>8}  {'stored B':>9}  "
+        f"{'encode us':>10}  {'decode us':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['library']:>8}  {r['codec']:>10}  {r['body_bytes']:>8}  {r['stored_bytes']:>9}  "
+            f"{r['encode_us']:>10.1f}  {r['decode_us']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Edge detection cost against the number of nodes in a session.
+
+Stores the outputs of N nodes (--nodes), then times find_source_nodes for
+inputs that quote a few of them among new text: the full scan it replaced
+(SequenceMatcher against every stored output) vs. the k-gram index. Also
+checks that both find the same source nodes.
+
+With --memory, reports the memory per 1M stored output words of the word
+store (list[str] per output vs. array('I') of interned ids plus the session
+vocabulary) and of the k-gram index (every position vs. sampled positions),
+and the time of compute_longest_match on words vs. ids.
+
+With --turns, simulates a chat agent resending its growing history (system
+prompt, all messages, tool schema) for that many turns and reports the edge
+detection time per turn, with and without the cache of input strings.
+
+Usage:
+    python tests/benchmarks/bench_string_matching.py [--nodes 100 1000 10000] [--memory]
+        [--turns 200] [--json]
+"""
+
+import json
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+try:
+    from tests.benchmarks.harness import isolated_runner
+    from tests.benchmarks.payloads import make_text
+except ImportError:
+    from harness import isolated_runner
+    from payloads import make_text
+
+SESSION_ID = "bench-session"
+
+
+def scan_source_nodes(input_text):
+    """find_source_nodes before the k-gram index: verify every stored output."""
+    from ao.runner.string_matching import (
+        _get_session_outputs,
+        _get_session_vocabulary,
+        is_content_match,
+        tokenize,
+    )
+
+    input_words = _get_session_vocabulary(SESSION_ID).encode(tokenize(input_text))
+    matches = []
+    for node_id, word_lists in _get_session_outputs(SESSION_ID).items():
+        if any(is_content_match(words, input_words)[0] for words in word_lists):
+            matches.append(node_id)
+    return matches
+
+
+def indexed_source_nodes(input_text):
+    from ao.runner.string_matching import find_source_nodes
+
+    call = SimpleNamespace(input_strings=[input_text], matching_input=None)
+    return find_source_nodes(SESSION_ID, call)
+
+
+def build_session(n_nodes: int, output_bytes: int):
+    from ao.runner.string_matching import clear_session_data, store_output_strings
+
+    clear_session_data(SESSION_ID)
+    outputs = []
+    for i in range(n_nodes):
+        output = make_text(output_bytes, seed=i)
+        store_output_strings(SESSION_ID, f"node-{i}", SimpleNamespace(output_strings=[output]))
+        outputs.append(output)
+    return outputs
+
+
+def make_inputs(outputs, n_inputs: int, input_bytes: int, quoted: int):
+    rng = random.Random(0)
+    inputs = []
+    for i in range(n_inputs):
+        parts = rng.sample(outputs, min(quoted, len(outputs)))
+        parts.append(make_text(input_bytes, seed=-1 - i))
+        inputs.append(" ".join(parts))
+    return inputs
+
+
+def time_per_input(fn, inputs, time_budget: float):
+    """Mean time per input and results, stopping early once time_budget is spent."""
+    results = []
+    start = time.perf_counter()
+    for input_text in inputs:
+        results.append(fn(input_text))
+        if time.perf_counter() - start > time_budget:
+            break
+    return (time.perf_counter() - start) / len(results), results
+
+
+def allocated_bytes(build):
+    """Bytes still allocated by build() (its result is kept alive until measured)."""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def measure_memory(n_tokens: int, output_bytes: int, repeat: int):
+    from ao.runner.kgram_index import KGramIndex
+    from ao.runner.string_matching import (
+        MIN_MATCH_WORDS,
+        Vocabulary,
+        compute_longest_match,
+        min_match_len,
+        tokenize,
+    )
+
+    texts, total = [], 0
+    while total < n_tokens:
+        texts.append(make_text(output_bytes, seed=len(texts)))
+        total += len(texts[-1].split())
+    k = MIN_MATCH_WORDS + 1
+
+    def words_store():
+        return {f"node-{i}": [tokenize(text)] for i, text in enumerate(texts)}
+
+    def ids_store():
+        vocabulary = Vocabulary()
+        return vocabulary, {
+            f"node-{i}": [vocabulary.encode(tokenize(text))] for i, text in enumerate(texts)
+        }
+
+    def index(store, min_len):
+        def build():
+            kgram_index = KGramIndex(k, min_len)
+            for node_id, token_lists in store.items():
+                kgram_index.add(node_id, token_lists)
+            return kgram_index
+
+        return build
+
+    words = words_store()
+    vocabulary, ids = ids_store()
+    scale = 1_000_000 / total
+    result = {
+        "tokens": total,
+        "words_store_mb": allocated_bytes(words_store) * scale / 1e6,
+        "ids_store_mb": allocated_bytes(ids_store) * scale / 1e6,
+        "full_index_mb": allocated_bytes(index(words, lambda n: k)) * scale / 1e6,
+        "sampled_index_mb": allocated_bytes(index(ids, min_match_len)) * scale / 1e6,
+    }
+
+    # Longest match of each output with a long input quoting it
+    word_lists = [token_lists[0] for token_lists in words.values()]
+    pairs = [(word_lists[i], sum(word_lists[i : i + 20], [])) for i in range(50)]
+    id_pairs = [(vocabulary.encode(out), vocabulary.encode(inp)) for out, inp in pairs]
+    for name, cases in (("words_match_us", pairs), ("ids_match_us", id_pairs)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for out, inp in cases:
+                compute_longest_match(out, inp)
+        result[name] = (time.perf_counter() - start) / (repeat * len(cases)) * 1e6
+    return {key: round(value, 2) for key, value in result.items()}
+
+
+def measure_conversation(turns: int, message_bytes: int):
+    """Edge detection time per turn of a growing conversation, with and without the input string cache."""
+    from ao.runner import string_matching
+
+    def run():
+        string_matching.clear_session_data(SESSION_ID)
+        rng = random.Random(0)
+        history = [make_text(2_000, seed=-1)]
+        tool_schema = make_text(1_000, seed=-2)
+        times = []
+        for turn in range(turns):
+            history.append(make_text(rng.randint(1, message_bytes), seed=-3 - turn))
+            call = SimpleNamespace(input_strings=history + [tool_schema], matching_input=None)
+            start = time.perf_counter()
+            string_matching.find_source_nodes(SESSION_ID, call)
+            string_matching.store_input_strings(SESSION_ID, f"node-{turn}", call)
+            times.append(time.perf_counter() - start)
+            output = make_text(rng.randint(1, message_bytes), seed=turn)
+            string_matching.store_output_strings(
+                SESSION_ID, f"node-{turn}", SimpleNamespace(output_strings=[output])
+            )
+            history.append(output)
+        return times
+
+    cached = run()
+    cache_tokens = string_matching.SEGMENT_CACHE_TOKENS
+    string_matching.SEGMENT_CACHE_TOKENS = 0
+    try:
+        uncached = run()
+    finally:
+        string_matching.SEGMENT_CACHE_TOKENS = cache_tokens
+    last = max(1, turns // 10)
+    return {
+        "turns": turns,
+        "uncached_total_ms": round(sum(uncached) * 1e3, 1),
+        "cached_total_ms": round(sum(cached) * 1e3, 1),
+        "uncached_last_turns_ms": round(sum(uncached[-last:]) / last * 1e3, 3),
+        "cached_last_turns_ms": round(sum(cached[-last:]) / last * 1e3, 3),
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--output-bytes", type=int, default=400)
+    parser.add_argument("--input-bytes", type=int, default=8_000)
+    parser.add_argument("--quoted", type=int, default=3, help="Outputs quoted per input")
+    parser.add_argument("--inputs", type=int, default=20)
+    parser.add_argument("--time-budget", type=float, default=10.0, help="Seconds per measurement")
+    parser.add_argument("--memory", action="store_true", help="Also measure memory per 1M words")
+    parser.add_argument("--turns", type=int, default=None, help="Also simulate a conversation")
+    parser.add_argument("--message-bytes", type=int, default=2_000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner(SESSION_ID)
+    memory = measure_memory(1_000_000, args.output_bytes, repeat=5) if args.memory else None
+    conversation = measure_conversation(args.turns, args.message_bytes) if args.turns else None
+
+    results = []
+    for n_nodes in args.nodes:
+        outputs = build_session(n_nodes, args.output_bytes)
+        inputs = make_inputs(outputs, args.inputs, args.input_bytes, args.quoted)
+        scan_s, scan_found = time_per_input(scan_source_nodes, inputs, args.time_budget)
+        index_s, index_found = time_per_input(indexed_source_nodes, inputs, args.time_budget)
+        n = min(len(scan_found), len(index_found))
+        results.append(
+            {
+                "nodes": n_nodes,
+                "input_words": len(inputs[0].split()),
+                "scan_ms": round(scan_s * 1e3, 3),
+                "index_ms": round(index_s * 1e3, 3),
+                "speedup": round(scan_s / index_s, 1),
+                "same_edges": scan_found[:n] == index_found[:n],
+            }
+        )
+
+    if args.json:
+        print(
+            json.dumps(
+                {"scaling": results, "memory": memory, "conversation": conversation}, indent=2
+            )
+        )
+        return
+
+    print(
+        f"{'nodes':>7}  {'input words':>11}  {'scan ms':>10}  {'index ms':>9}  {'speedup':>8}  same"
+    )
+    for r in results:
+        print(
+            f"{r['nodes']:>7}  {r['input_words']:>11}  {r['scan_ms']:>10.3f}  "
+            f"{r['index_ms']:>9.3f}  {r['speedup']:>7.1f}x  {r['same_edges']}"
+        )
+    if memory:
+        print(f"\nPer 1M stored words ({memory['tokens']} measured):")
+        print(
+            f"  word store   list[str] {memory['words_store_mb']:>8.1f} MB   ids {memory['ids_store_mb']:>8.1f} MB"
+        )
+        print(
+            f"  k-gram index all       {memory['full_index_mb']:>8.1f} MB   sampled {memory['sampled_index_mb']:>4.1f} MB"
+        )
+        print(
+            f"  longest match words    {memory['words_match_us']:>8.1f} us   ids {memory['ids_match_us']:>8.1f} us"
+        )
+
+    if conversation:
+        c = conversation
+        print(f"\nConversation of {c['turns']} turns, edge detection per turn (last 10%):")
+        print(
+            f"  without string cache {c['uncached_last_turns_ms']:>9.3f} ms  total {c['uncached_total_ms']:>9.1f} ms"
+        )
+        print(
+            f"  with string cache    {c['cached_last_turns_ms']:>9.3f} ms  total {c['cached_total_ms']:>9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Offline overhead suite: synthetic agents recorded and replayed through ao-record.
+
+Starts the mock LLM server and an isolated AO home (temporary directory, own
+develop-server port), then for every provider shape and scenario (calls, prompt
+size, fan-out, concurrency) runs synthetic_agent.py
+  - without AO (baseline),
+  - under ao-record (recording, every call is a cache miss),
+  - under ao-record with AO_SESSION_ID of that run (replay, every call must be
+    a cache hit and never reach the mock server),
+and streams add_node messages into the develop server to measure its message
+throughput. Reports per-call overhead, replay speed, server throughput and DB
+growth, as a JSON report (--output / --json) meant to be tracked over releases.
+No network access or API keys needed.
+
+Usage:
+    python tests/benchmarks/bench_suite.py [--providers openai-chat anthropic] [--calls 50]
+        [--prompt-bytes 1000] [--fan-out 1 4] [--concurrency 1 4] [--record-args=--write-behind]
+        [--output report.json] [--json]
+"""
+
+import itertools
+import json
+import os
+import platform
+import shlex
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+
+try:
+    from tests.benchmarks.mock_llm_server import MockLLMServer
+    from tests.benchmarks.payloads import PROVIDERS, make_text
+    from tests.benchmarks.synthetic_agent import RESULT_PREFIX
+except ImportError:
+    from mock_llm_server import MockLLMServer
+    from payloads import PROVIDERS, make_text
+    from synthetic_agent import RESULT_PREFIX
+
+REPORT_SCHEMA_VERSION = 1
+AGENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "synthetic_agent.py")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RUN_TIMEOUT_S = 600
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def isolated_env(ao_home: str, port: int) -> dict:
+    """Environment for AO processes that only touch ao_home and their own server."""
+    env = os.environ.copy()
+    for var in ("AO_HOME", "DB_PATH", "ATTACHMENT_CACHE", "AO_LOG_DIR"):
+        env[var] = ao_home
+    env["PYTHON_PORT"] = str(port)
+    env.pop("AO_SESSION_ID", None)
+    return env
+
+
+def start_develop_server(env, timeout_s: float = 30.0) -> None:
+    """Start the isolated develop server (it creates the DB) and wait until it accepts."""
+    subprocess.run(
+        [sys.executable, "-m", "ao.cli.ao_server", "start"],
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", int(env["PYTHON_PORT"])), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def run_agent(env, agent_args, record_args=None, session_id=None) -> dict:
+    """
+    Run the synthetic agent, under ao-record unless record_args is None.
+
+    Returns:
+        The agent's result line plus wall_s (process lifetime) and, under
+        ao-record, the session_id
+    """
+    env = dict(env)
+    cmd = [sys.executable]
+    if record_args is not None:
+        cmd += ["-m", "ao.cli.ao_record", *record_args]
+        env["AO_SESSION_FILE"] = os.path.join(env["AO_HOME"], f"session-{time.time_ns()}.json")
+        if session_id:
+            env["AO_SESSION_ID"] = session_id
+    cmd += [AGENT_PATH, *agent_args]
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=RUN_TIMEOUT_S)
+    wall_s = time.perf_counter() - start
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{shlex.join(cmd)} failed ({proc.returncode}):\n{proc.stderr[-3000:]}")
+
+    result = json.loads(lines[-1][len(RESULT_PREFIX) :])
+    result["wall_s"] = wall_s
+    if record_args is not None:
+        with open(env["AO_SESSION_FILE"]) as f:
+            result["session_id"] = json.load(f)["session_id"]
+    return result
+
+
+def db_size(ao_home: str) -> int:
+    """Size of the SQLite DB once its WAL is checkpointed (the WAL itself is reused space)."""
+    path = os.path.join(ao_home, "experiments.sqlite")
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return os.path.getsize(path)
+
+
+def session_stats(ao_home: str, session_id: str) -> dict:
+    """Rows, stored bytes and graph size of a recorded session."""
+    conn = sqlite3.connect(os.path.join(ao_home, "experiments.sqlite"), timeout=30)
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*), SUM(LENGTH(input) + LENGTH(output) + LENGTH(stack_trace)) "
+            "FROM llm_calls WHERE session_id=?",
+            (session_id,),
+        ).fetchone()
+        topology = conn.execute(
+            "SELECT graph_topology FROM experiments WHERE session_id=?", (session_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    graph = json.loads(topology[0]) if topology and topology[0] else {"nodes": [], "edges": []}
+    return {
+        "llm_calls_rows": row[0],
+        "llm_calls_bytes": row[1] or 0,
+        "graph_nodes": len(graph["nodes"]),
+        "graph_edges": len(graph["edges"]),
+    }
+
+
+def run_scenario(env, mock, provider, calls, prompt_bytes, fan_out, concurrency, args) -> dict:
+    agent_args = [
+        "--base-url", mock.url,
+        "--provider", provider,
+        "--calls", str(calls),
+        "--prompt-bytes", str(prompt_bytes),
+        "--fan-out", str(fan_out),
+        "--concurrency", str(concurrency),
+    ]  # fmt: skip
+    record_args = shlex.split(args.record_args)
+
+    baseline = min(run_agent(env, agent_args)["agent_s"] for _ in range(args.repeat))
+    records, replays = [], []
+    stats = None
+    for _ in range(args.repeat):
+        size_before = db_size(env["AO_HOME"])
+        record = run_agent(env, agent_args, record_args)
+        records.append(record)
+        if stats is None:
+            # Lower bound: a run that fits in existing free pages does not grow the file.
+            stats = session_stats(env["AO_HOME"], record["session_id"])
+            stats["db_growth_bytes"] = db_size(env["AO_HOME"]) - size_before
+
+        requests_before = mock.request_count
+        replay = run_agent(env, agent_args, record_args, session_id=record["session_id"])
+        replay["provider_requests"] = mock.request_count - requests_before
+        replays.append(replay)
+
+    record_s = min(r["agent_s"] for r in records)
+    replay_s = min(r["agent_s"] for r in replays)
+    return {
+        "provider": provider,
+        "calls": calls,
+        "prompt_bytes": prompt_bytes,
+        "fan_out": fan_out,
+        "concurrency": concurrency,
+        "baseline_ms_per_call": round(baseline / calls * 1000, 3),
+        "record_ms_per_call": round(record_s / calls * 1000, 3),
+        "record_overhead_ms_per_call": round((record_s - baseline) / calls * 1000, 3),
+        "replay_ms_per_call": round(replay_s / calls * 1000, 3),
+        "replay_calls_per_s": round(calls / replay_s, 1),
+        "replay_provider_requests": max(r["provider_requests"] for r in replays),
+        "record_wall_s": round(min(r["wall_s"] for r in records), 3),
+        "replay_wall_s": round(min(r["wall_s"] for r in replays), 3),
+        "db_bytes_per_call": round(stats["db_growth_bytes"] / calls),
+        "stored_bytes_per_call": round(stats["llm_calls_bytes"] / calls),
+        **stats,
+    }
+
+
+def _read_until(file_obj, msg_type: str) -> dict:
+    for line in file_obj:
+        msg = json.loads(line)
+        if msg.get("type") == msg_type:
+            return msg
+    raise ConnectionError(f"Develop server closed the connection before {msg_type}")
+
+
+def server_throughput(port: int, n_messages: int, input_bytes: int) -> dict:
+    """
+    Stream n_messages add_node messages (each node quoting the previous one, as
+    a chain of LLM calls) into the develop server as an agent runner, then time
+    until the server answers a get_graph sent after them.
+    """
+    with socket.create_connection(("127.0.0.1", port), timeout=RUN_TIMEOUT_S) as sock:
+        file_obj = sock.makefile(mode="r")
+        hello = {
+            "type": "hello",
+            "role": "agent-runner",
+            "name": "bench-server-throughput",
+            "cwd": os.getcwd(),
+            "environment": {},
+            "process_id": os.getpid(),
+            "prev_session_id": None,
+        }
+        sock.sendall((json.dumps(hello) + "\n").encode("utf-8"))
+        session_id = _read_until(file_obj, "session_id")["session_id"]
+
+        text = make_text(input_bytes)
+        messages = []
+        for i in range(n_messages):
+            node = {
+                "id": f"bench-node-{i}",
+                "input": json.dumps({"messages": [{"role": "user", "content": f"{i} {text}"}]}),
+                "output": json.dumps({"content": f"answer {i}"}),
+                "border_color": "#000000",
+                "label": "Bench",
+                "stack_trace": "bench_suite.py:1",
+                "model": "gpt-4o-mini",
+                "attachments": [],
+            }
+            edges = [f"bench-node-{i - 1}"] if i else []
+            msg = {
+                "type": "add_node",
+                "session_id": session_id,
+                "node": node,
+                "incoming_edges": edges,
+            }
+            messages.append((json.dumps(msg) + "\n").encode("utf-8"))
+        get_graph = {"type": "get_graph", "session_id": session_id}
+
+        start = time.perf_counter()
+        sock.sendall(b"".join(messages) + (json.dumps(get_graph) + "\n").encode("utf-8"))
+        graph = _read_until(file_obj, "graph_update")["payload"]
+        elapsed = time.perf_counter() - start
+        sock.sendall((json.dumps({"type": "deregister"}) + "\n").encode("utf-8"))
+
+    return {
+        "messages": n_messages,
+        "message_bytes": round(sum(len(m) for m in messages) / n_messages),
+        "nodes_in_graph": len(graph["nodes"]),
+        "seconds": round(elapsed, 3),
+        "messages_per_s": round(n_messages / elapsed, 1),
+    }
+
+
+def report_meta(args) -> dict:
+    try:
+        from importlib.metadata import version
+
+        ao_version = version("ao-dev")
+    except Exception:
+        ao_version = None
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        git_commit = ""
+    return {
+        "schema_version": REPORT_SCHEMA_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ao_version": ao_version,
+        "git_commit": git_commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "latency_ms": args.latency_ms,
+            "response_bytes": args.response_bytes,
+            "repeat": args.repeat,
+            "record_args": args.record_args,
+        },
+    }
+
+
+def print_table(report: dict) -> None:
+    print(
+        f"{'provider':>16}  {'calls':>5}  {'fan':>3}  {'conc':>4}  {'base ms':>8}  "
+        f"{'rec +ms':>8}  {'replay ms':>9}  {'hits':>4}  {'DB B/call':>9}  {'edges':>5}"
+    )
+    for r in report["scenarios"]:
+        hits = "ok" if r["replay_provider_requests"] == 0 else "MISS"
+        print(
+            f"{r['provider']:>16}  {r['calls']:>5}  {r['fan_out']:>3}  {r['concurrency']:>4}  "
+            f"{r['baseline_ms_per_call']:>8.2f}  {r['record_overhead_ms_per_call']:>8.2f}  "
+            f"{r['replay_ms_per_call']:>9.2f}  {hits:>4}  {r['db_bytes_per_call']:>9}  "
+            f"{r['graph_edges']:>5}"
+        )
+    server = report["server"]
+    print(
+        f"\ndevelop server: {server['messages']} add_node messages in {server['seconds']} s "
+        f"({server['messages_per_s']} msg/s)"
+    )
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--providers", nargs="+", choices=PROVIDERS, default=list(PROVIDERS))
+    parser.add_argument("--calls", nargs="+", type=int, default=[50])
+    parser.add_argument("--prompt-bytes", nargs="+", type=int, default=[1000])
+    parser.add_argument("--fan-out", nargs="+", type=int, default=[1, 4])
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 4],
+        help="Threads per agent, combinations with concurrency > fan-out are skipped",
+    )
+    parser.add_argument("--response-bytes", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mock LLM latency")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (best kept)")
+    parser.add_argument("--server-messages", type=int, default=1000)
+    parser.add_argument(
+        "--record-args",
+        default="",
+        help='Extra ao-record flags, e.g. --record-args="--write-behind --profile"',
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    ao_home = tempfile.mkdtemp(prefix="ao-bench-suite-")
+    env = isolated_env(ao_home, free_port())
+    report = {"meta": report_meta(args), "scenarios": []}
+    try:
+        start_develop_server(env)
+        with MockLLMServer(latency_ms=args.latency_ms, response_bytes=args.response_bytes) as mock:
+            # Warm-up: the first recording pays for imports and cold OS caches.
+            run_agent(env, ["--base-url", mock.url, "--calls", "1"], shlex.split(args.record_args))
+            for provider, calls, prompt_bytes, fan_out, concurrency in itertools.product(
+                args.providers, args.calls, args.prompt_bytes, args.fan_out, args.concurrency
+            ):
+                if concurrency > fan_out:
+                    continue
+                report["scenarios"].append(
+                    run_scenario(
+                        env, mock, provider, calls, prompt_bytes, fan_out, concurrency, args
+                    )
+                )
+        report["server"] = server_throughput(
+            int(env["PYTHON_PORT"]), args.server_messages, max(args.prompt_bytes)
+        )
+    finally:
+        subprocess.run(
+            [sys.executable, "-m", "ao.cli.ao_server", "stop"], env=env, capture_output=True
+        )
+        shutil.rmtree(ao_home, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+to_show projection and merge-back: flatten/unflatten pipeline vs. tree walk.
+
+filter_dict used to flatten the raw request, filter the flattened keys,
+unflatten them with unflatten_list and re-flatten the result for display;
+merge_filtered_into_raw flattened raw and to_show and unflattened raw again.
+Both now walk the documents once. This benchmark times both on tool-using chat
+requests, merging one edited message back, and checks that they give the same
+results.
+
+Usage:
+    python tests/benchmarks/bench_to_show.py [--sizes 10000 100000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.payloads import make_tool_chat_body
+except ImportError:
+    from payloads import make_tool_chat_body
+
+from flatten_json import flatten, unflatten_list
+
+from ao.runner.monkey_patching.api_parser import (
+    _filter_dict_flattened,
+    filter_dict,
+    merge_filtered_into_raw,
+    unflatten_to_show,
+)
+
+
+def flattened_merge(raw_dict, to_show_dict):
+    """merge_filtered_into_raw before the tree walk."""
+    flattened_raw = flatten(raw_dict, ".")
+    for key, value in flatten(unflatten_to_show(to_show_dict), ".").items():
+        if key in flattened_raw:
+            flattened_raw[key] = value
+    return unflatten_list(flattened_raw, ".")
+
+
+def time_per_call(fn, args, repeat: int) -> float:
+    fn(*args)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def measure(size: int, repeat: int) -> dict:
+    raw = {"url": "https://api.openai.com/v1/chat/completions", "body": make_tool_chat_body(size)}
+    to_show = filter_dict(raw)
+    to_show["body.messages"][1]["content"] = "edited"
+
+    flatten_filter = time_per_call(_filter_dict_flattened, (raw,), repeat)
+    walk_filter = time_per_call(filter_dict, (raw,), repeat)
+    flatten_merge = time_per_call(flattened_merge, (raw, to_show), repeat)
+    walk_merge = time_per_call(merge_filtered_into_raw, (raw, to_show), repeat)
+    return {
+        "body_bytes": len(json.dumps(raw["body"])),
+        "flatten_filter_ms": round(flatten_filter * 1000, 3),
+        "walk_filter_ms": round(walk_filter * 1000, 3),
+        "flatten_merge_ms": round(flatten_merge * 1000, 3),
+        "walk_merge_ms": round(walk_merge * 1000, 3),
+        "same": json.dumps(filter_dict(raw)) == json.dumps(_filter_dict_flattened(raw))
+        and merge_filtered_into_raw(raw, to_show) == flattened_merge(raw, to_show),
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [measure(size, args.repeat) for size in args.sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'body bytes':>10}  {'filter ms (flatten/walk)':>24}  {'merge ms (flatten/walk)':>23}  same"
+    )
+    for r in results:
+        print(
+            f"{r['body_bytes']:>10}  {r['flatten_filter_ms']:>11.3f} / {r['walk_filter_ms']:>10.3f}  "
+            f"{r['flatten_merge_ms']:>10.3f} / {r['walk_merge_ms']:>10.3f}  {r['same']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Per-call cost of recording LLM calls: one commit per call vs. write-behind.
+
+Runs N cache misses (DB.get_in_out + DB.cache_output) on a fresh SQLite DB,
+first with one commit per call and then in write-behind mode, and reports
+the time the caller spends per call plus the final flush.
+
+Usage:
+    python tests/benchmarks/bench_write_behind.py [--calls 2000] [--json]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+
+try:
+    from tests.benchmarks.harness import isolated_runner, set_session
+    from tests.benchmarks.payloads import make_httpx_pair
+except ImportError:
+    from harness import isolated_runner, set_session
+    from payloads import make_httpx_pair
+
+API_TYPE = "httpx.Client.send"
+
+
+def record_calls(DB, calls, response) -> float:
+    start = time.perf_counter()
+    for call in calls:
+        cache_output = DB.get_in_out(call)
+        DB.cache_output(cache_result=cache_output, output_obj=response, api_type=API_TYPE)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--prompt-bytes", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    isolated_runner()
+    from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+    from ao.server.database_manager import DB
+
+    results = []
+    for mode in ("per-call commit", "write-behind"):
+        set_session(f"bench-write-behind-{mode}")
+        if mode == "write-behind":
+            DB.enable_write_behind()
+
+        calls = []
+        for i in range(args.calls):
+            request, response = make_httpx_pair(args.prompt_bytes, output_bytes=200, seed=i)
+            call = InterceptedCall({"request": request}, API_TYPE)
+            call.input_hash  # serialize outside the timed loop
+            calls.append(call)
+
+        elapsed = record_calls(DB, calls, response)
+        start = time.perf_counter()
+        DB.flush_writes()
+        flush = time.perf_counter() - start
+        stored = DB.query_one(
+            "SELECT COUNT(*) AS n FROM llm_calls WHERE session_id=?",
+            (f"bench-write-behind-{mode}",),
+        )["n"]
+        results.append(
+            {
+                "mode": mode,
+                "calls": args.calls,
+                "us_per_call": round(elapsed / args.calls * 1e6, 1),
+                "final_flush_ms": round(flush * 1000, 2),
+                "rows_stored": stored,
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':>16}  {'calls':>6}  {'us/call':>8}  {'final flush ms':>14}  {'rows':>6}")
+    for r in results:
+        print(
+            f"{r['mode']:>16}  {r['calls']:>6}  {r['us_per_call']:>8.1f}  "
+            f"{r['final_flush_ms']:>14.2f}  {r['rows_stored']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
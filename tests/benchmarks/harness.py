@@ -0,0 +1,44 @@
+"""
+In-process runner setup for the benchmarks.
+
+Points AO_HOME / DB_PATH at a temporary directory and replaces the server
+connection with an in-memory sink, so the patched clients can be driven
+without `ao-record` or a running server. Call `isolated_runner()` before
+anything imports `ao.common.constants`.
+"""
+
+import io
+import logging
+import os
+import tempfile
+
+
+def isolated_runner(session_id: str = "bench-session") -> str:
+    """
+    Prepare an isolated runner environment for in-process benchmarks.
+
+    Args:
+        session_id: Session id the intercepted calls are recorded under
+
+    Returns:
+        The temporary directory holding the benchmark DB
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="ao-bench-")
+    for var in ("AO_HOME", "DB_PATH", "ATTACHMENT_CACHE", "AO_LOG_DIR"):
+        os.environ[var] = tmp_dir
+
+    from ao.common.logger import logger
+    from ao.runner import context_manager
+
+    logger.setLevel(logging.WARNING)
+    context_manager.server_file = io.StringIO()
+    set_session(session_id)
+    return tmp_dir
+
+
+def set_session(session_id: str) -> None:
+    """Record subsequent intercepted calls under session_id."""
+    from ao.runner import context_manager
+
+    context_manager.parent_session_id = session_id
+    context_manager.current_session_id.set(session_id)
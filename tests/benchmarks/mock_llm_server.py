@@ -0,0 +1,140 @@
+"""
+Local mock LLM server for the benchmarks.
+
+Answers the OpenAI /v1/chat/completions and /v1/responses, Anthropic
+/v1/messages, Gemini models/<model>:generateContent and Ollama /api/chat shapes
+with a canned answer that echoes the start of the prompt, after a configurable
+latency. Runs in a background thread, no network access or API keys needed.
+
+Usage (standalone):
+    python tests/benchmarks/mock_llm_server.py --port 8765 --latency-ms 50 [--response-bytes 500]
+"""
+
+import json
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from tests.benchmarks.payloads import (
+        make_provider_response,
+        make_text,
+        provider_prompt_text,
+    )
+except ImportError:
+    from payloads import make_provider_response, make_text, provider_prompt_text
+
+PROVIDER_PATHS = [
+    (re.compile(r"/v1/chat/completions$"), "openai-chat"),
+    (re.compile(r"/v1/responses$"), "openai-responses"),
+    (re.compile(r"/v1/messages$"), "anthropic"),
+    (re.compile(r"models/[^/]+:generateContent$"), "gemini"),
+    (re.compile(r"/api/chat$"), "ollama"),
+]
+
+
+def provider_for_path(path: str):
+    """Provider whose API shape path belongs to, or None."""
+    path = path.partition("?")[0].rstrip("/")
+    for pattern, provider in PROVIDER_PATHS:
+        if pattern.search(path):
+            return provider
+    return None
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, Nagle would delay the body.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.count_lock:
+            self.server.request_count += 1
+        time.sleep(self.server.latency)
+
+        provider = provider_for_path(self.path)
+        if provider is None:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        text = f"Answer to: {provider_prompt_text(provider, body)[:200]}"
+        if self.server.response_padding:
+            text = f"{text} {self.server.response_padding}"
+        self._send_json(200, make_provider_response(provider, text))
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    # Benchmarks open hundreds of connections at once.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class MockLLMServer:
+    """
+    Mock LLM server running in a daemon thread.
+
+    Attributes:
+        url: Base URL of the server (e.g., "http://127.0.0.1:8765")
+    """
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, response_bytes: int = 0):
+        self._httpd = _ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+        self._httpd.latency = latency_ms / 1000
+        # Same filler for every answer, so replays see identical outputs.
+        self._httpd.response_padding = make_text(response_bytes) if response_bytes else ""
+        self._httpd.request_count = 0
+        self._httpd.count_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    @property
+    def request_count(self) -> int:
+        return self._httpd.request_count
+
+    def start(self) -> "MockLLMServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--response-bytes", type=int, default=0, help="Filler added to answers")
+    args = parser.parse_args()
+
+    with MockLLMServer(args.port, args.latency_ms, args.response_bytes) as server:
+        print(f"Mock LLM server listening on {server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Synthetic LLM requests and responses for the benchmarks.
+
+Everything is built in-process (no network): requests are real httpx/requests
+objects with an OpenAI-style chat completion body, responses carry a matching
+completion body. The provider helpers at the bottom build the request and
+response bodies of every API shape the mock LLM server speaks.
+"""
+
+import json
+import random
+
+WORDS = (
+    "agent tool call result search query document answer context model token "
+    "prompt summary plan step observation reason final output input message "
+    "system user assistant function argument value table chart report data"
+).split()
+
+CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+
+def make_text(n_bytes: int, seed: int = 0) -> str:
+    """Return roughly n_bytes of pseudo-random English-like text."""
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < n_bytes:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def make_chat_body(prompt_bytes: int, n_messages: int = 4, seed: int = 0) -> dict:
+    """OpenAI chat completion request body with ~prompt_bytes of message content."""
+    per_message = max(1, prompt_bytes // n_messages)
+    messages = [{"role": "system", "content": make_text(per_message, seed)}]
+    for i in range(1, n_messages):
+        role = "user" if i % 2 else "assistant"
+        messages.append({"role": role, "content": make_text(per_message, seed + i)})
+    return {"model": "gpt-4o-mini", "temperature": 0.0, "messages": messages}
+
+
+def make_tool_chat_body(prompt_bytes: int, n_tools: int = 20, seed: int = 0) -> dict:
+    """OpenAI chat completion request body of a tool-using agent: tool schemas, tool calls and results."""
+    rng = random.Random(seed)
+    tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": f"tool_{i}",
+                "description": make_text(200, seed + i),
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        f"arg_{j}": {
+                            "type": "string",
+                            "description": make_text(60, seed + i * 10 + j),
+                        }
+                        for j in range(4)
+                    },
+                    "required": ["arg_0"],
+                },
+            },
+        }
+        for i in range(n_tools)
+    ]
+    messages = [{"role": "system", "content": make_text(1_000, seed)}]
+    size, turn = 0, 0
+    while size < prompt_bytes:
+        turn += 1
+        call_id = f"call_{seed}_{turn}"
+        arguments = json.dumps({"arg_0": make_text(100, seed + turn), "arg_1": rng.randint(0, 99)})
+        result = json.dumps({"rows": [make_text(80, seed + turn * 7 + k) for k in range(5)]})
+        messages += [
+            {"role": "user", "content": make_text(300, seed + turn)},
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {"name": f"tool_{turn % n_tools}", "arguments": arguments},
+                    }
+                ],
+            },
+            {"role": "tool", "tool_call_id": call_id, "content": result},
+        ]
+        size += 300 + len(arguments) + len(result)
+    return {"model": "gpt-4o-mini", "temperature": 0.0, "messages": messages, "tools": tools}
+
+
+def make_chat_completion(text: str) -> dict:
+    """OpenAI chat completion response body."""
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+    }
+
+
+def make_httpx_pair(prompt_bytes: int, output_bytes: int = 2000, seed: int = 0):
+    """Return (httpx.Request, httpx.Response) for a chat completion call."""
+    import httpx
+
+    body = json.dumps(make_chat_body(prompt_bytes, seed=seed)).encode("utf-8")
+    request = httpx.Request(
+        "POST", CHAT_URL, content=body, headers={"content-type": "application/json"}
+    )
+    response = httpx.Response(
+        200,
+        json=make_chat_completion(make_text(output_bytes, seed + 1000)),
+        request=request,
+    )
+    response.read()
+    return request, response
+
+
+def make_requests_pair(prompt_bytes: int, output_bytes: int = 2000, seed: int = 0):
+    """Return (requests.PreparedRequest, requests.Response) for a chat completion call."""
+    import requests
+
+    request = requests.Request(
+        "POST", CHAT_URL, json=make_chat_body(prompt_bytes, seed=seed)
+    ).prepare()
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["content-type"] = "application/json"
+    response.encoding = "utf-8"
+    response._content = json.dumps(
+        make_chat_completion(make_text(output_bytes, seed + 1000))
+    ).encode("utf-8")
+    response.url = CHAT_URL
+    response.request = request
+    return request, response
+
+
+# Request/response shapes of the providers the mock server speaks, keyed by provider name.
+PROVIDERS = ("openai-chat", "openai-responses", "anthropic", "gemini", "ollama")
+
+
+def make_provider_request(provider: str, prompt: str):
+    """Return (path, JSON body) of a single-turn request to provider."""
+    if provider == "openai-chat":
+        return "/v1/chat/completions", {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    if provider == "openai-responses":
+        return "/v1/responses", {"model": "gpt-4o-mini", "input": prompt}
+    if provider == "anthropic":
+        return "/v1/messages", {
+            "model": "claude-3-5-haiku-latest",
+            "max_tokens": 1024,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    if provider == "gemini":
+        return "/v1beta/models/gemini-2.0-flash:generateContent", {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        }
+    if provider == "ollama":
+        return "/api/chat", {
+            "model": "llama3.2",
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False,
+        }
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def make_provider_response(provider: str, text: str) -> dict:
+    """Response body of provider answering with text."""
+    if provider == "openai-chat":
+        return make_chat_completion(text)
+    if provider == "openai-responses":
+        return {
+            "id": "resp_bench",
+            "object": "response",
+            "created_at": 1700000000,
+            "model": "gpt-4o-mini",
+            "status": "completed",
+            "output": [
+                {
+                    "type": "message",
+                    "id": "msg_bench",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            ],
+            "usage": {"input_tokens": 100, "output_tokens": 20, "total_tokens": 120},
+        }
+    if provider == "anthropic":
+        return {
+            "id": "msg_bench",
+            "type": "message",
+            "role": "assistant",
+            "model": "claude-3-5-haiku-latest",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 20},
+        }
+    if provider == "gemini":
+        return {
+            "candidates": [
+                {
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }
+            ],
+            "usageMetadata": {
+                "promptTokenCount": 100,
+                "candidatesTokenCount": 20,
+                "totalTokenCount": 120,
+            },
+            "modelVersion": "gemini-2.0-flash",
+        }
+    if provider == "ollama":
+        return {
+            "model": "llama3.2",
+            "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": text},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 100,
+            "eval_count": 20,
+        }
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def provider_prompt_text(provider: str, body: dict) -> str:
+    """Text of the last user turn in a request body of provider."""
+    if provider == "openai-responses":
+        turns = body.get("input", "")
+        if isinstance(turns, str):
+            return turns
+    elif provider == "gemini":
+        parts = (body.get("contents") or [{}])[-1].get("parts", [])
+        return " ".join(part.get("text", "") for part in parts)
+    else:
+        turns = body.get("messages", [])
+    content = turns[-1].get("content", "") if turns else ""
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return str(content)
+
+
+def provider_reply_text(provider: str, response: dict) -> str:
+    """Answer text in a response body of provider."""
+    if provider == "openai-chat":
+        return response["choices"][0]["message"]["content"]
+    if provider == "openai-responses":
+        return response["output"][0]["content"][0]["text"]
+    if provider == "anthropic":
+        return response["content"][0]["text"]
+    if provider == "gemini":
+        return response["candidates"][0]["content"]["parts"][0]["text"]
+    if provider == "ollama":
+        return response["message"]["content"]
+    raise ValueError(f"Unknown provider: {provider}")
@@ -0,0 +1,92 @@
+"""
+Synthetic agent for the offline benchmark suite.
+
+Talks to the mock LLM server over HTTP (httpx) in the API shape of one
+provider. The agent runs in steps: every step asks `--fan-out` questions in
+parallel (on `--concurrency` threads), and every question quotes the answers of
+the previous step, so AO records a layered graph with content-based edges.
+Prompts are deterministic, a rerun asks exactly the same questions.
+
+Prints one line `AO_BENCH_RESULT {"calls": ..., "agent_s": ...}` at the end,
+timing only the LLM calls (not interpreter startup or ao-record's setup).
+
+Usage (normally started by bench_suite.py, with or without ao-record):
+    python tests/benchmarks/synthetic_agent.py --base-url http://127.0.0.1:8765 \\
+        [--provider openai-chat] [--calls 50] [--prompt-bytes 1000] [--fan-out 1] [--concurrency 1]
+"""
+
+import json
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+try:
+    from tests.benchmarks.payloads import (
+        PROVIDERS,
+        make_provider_request,
+        make_text,
+        provider_reply_text,
+    )
+except ImportError:
+    from payloads import PROVIDERS, make_provider_request, make_text, provider_reply_text
+
+RESULT_PREFIX = "AO_BENCH_RESULT "
+
+
+def ask(client: httpx.Client, base_url: str, provider: str, prompt: str) -> str:
+    path, body = make_provider_request(provider, prompt)
+    response = client.post(base_url + path, json=body)
+    response.raise_for_status()
+    return provider_reply_text(provider, response.json())
+
+
+def run_agent(client, base_url, provider, calls, prompt_bytes, fan_out, concurrency) -> int:
+    """Run the agent, returns the number of LLM calls made."""
+    done = 0
+    step = 0
+    answers = []
+    with ThreadPoolExecutor(concurrency) as pool:
+        while done < calls:
+            width = min(fan_out, calls - done)
+            context = "\n".join(answers)
+            prompts = [
+                f"Step {step}, branch {branch}.\n{context}\n"
+                f"{make_text(prompt_bytes, seed=done + branch)}"
+                for branch in range(width)
+            ]
+            answers = list(pool.map(lambda p: ask(client, base_url, provider, p), prompts))
+            done += width
+            step += 1
+    return done
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", required=True, help="URL of the mock LLM server")
+    parser.add_argument("--provider", choices=PROVIDERS, default="openai-chat")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--prompt-bytes", type=int, default=1000)
+    parser.add_argument("--fan-out", type=int, default=1, help="Parallel questions per step")
+    parser.add_argument("--concurrency", type=int, default=1, help="Threads asking them")
+    args = parser.parse_args()
+
+    # Built before timing: loading the CA bundle alone takes tens of milliseconds.
+    with httpx.Client(timeout=60) as client:
+        start = time.perf_counter()
+        calls = run_agent(
+            client,
+            args.base_url,
+            args.provider,
+            args.calls,
+            args.prompt_bytes,
+            max(1, args.fan_out),
+            max(1, args.concurrency),
+        )
+        elapsed = time.perf_counter() - start
+    print(RESULT_PREFIX + json.dumps({"calls": calls, "agent_s": elapsed}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
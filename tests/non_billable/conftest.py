@@ -0,0 +1,95 @@
+"""
+Fixtures shared by the tests of the DatabaseManager.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from ao.runner import context_manager
+from ao.runner.monkey_patching.intercepted_call import InterceptedCall
+from ao.server.database_backends import sqlite
+from ao.server.database_manager import DB
+from tests.benchmarks.payloads import CHAT_URL, make_chat_body, make_chat_completion, make_text
+
+API_TYPE = "httpx.Client.send"
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """DB on an empty SQLite database (and attachment store) in tmp_path, without write-behind."""
+    sqlite.clear_connections()
+    monkeypatch.setattr(sqlite, "DB_PATH", str(tmp_path))
+    monkeypatch.setattr(DB, "_backend_module", sqlite)
+    monkeypatch.setattr(DB, "_write_queue", None)
+    monkeypatch.setattr(DB, "attachment_cache_dir", str(tmp_path))
+    DB.drop_preloaded_sessions()
+    yield sqlite
+    DB.drop_preloaded_sessions()
+    sqlite.clear_connections()
+
+
+@pytest.fixture
+def session(backend):
+    """backend with the experiment of session "s"."""
+    DB.add_experiment("s", "s", datetime.now(), "/tmp", "python x.py", {})
+    return backend
+
+
+def _make_call(seed=0, prompt_bytes=100, output_bytes=100, body=None):
+    """InterceptedCall of a chat completion over httpx, with its response as output_obj.
+
+    The request body is body if given, else ~prompt_bytes of messages generated from seed.
+    """
+    import httpx
+
+    if body is None:
+        body = make_chat_body(prompt_bytes, seed=seed)
+    request = httpx.Request(
+        "POST",
+        CHAT_URL,
+        content=json.dumps(body).encode("utf-8"),
+        headers={"content-type": "application/json"},
+    )
+    response = httpx.Response(
+        200, json=make_chat_completion(make_text(output_bytes, seed + 1000)), request=request
+    )
+    response.read()
+    call = InterceptedCall({"request": request}, API_TYPE)
+    call.output_obj = response
+    return call
+
+
+@pytest.fixture
+def make_call():
+    """Factory of chat completion calls: make_call(seed=0, prompt_bytes=100, output_bytes=100)."""
+    return _make_call
+
+
+@pytest.fixture
+def run_call():
+    """Intercept one call like the httpx patch does: run_call(session_id="s", llm=None, **call_args).
+
+    call_args are passed to make_call. On a miss, llm(request) is called with the request sent
+    (it may raise to fail the call) and the response is cached. Returns (result, request sent to
+    the LLM or None on a hit).
+    """
+
+    def run(session_id="s", llm=None, **call_args):
+        context_manager.current_session_id.set(session_id)
+        call = _make_call(**call_args)
+        cache_output = DB.get_in_out(call)
+        if cache_output.output is not None:
+            return cache_output, None
+        request = cache_output.input_dict["request"]
+        try:
+            if llm is not None:
+                llm(request)
+        except BaseException:
+            DB.release_in_flight(cache_output)
+            raise
+        DB.cache_output(cache_result=cache_output, output_obj=call.output_obj, api_type=API_TYPE)
+        return cache_output, request
+
+    return run
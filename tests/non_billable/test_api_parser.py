@@ -0,0 +1,203 @@
+"""
+Equivalence of the one-walk to_show projection and merge-back with the
+flatten/unflatten pipeline they replaced.
+"""
+
+import copy
+import json
+import random
+
+import pytest
+from flatten_json import flatten, unflatten_list
+
+from ao.runner.monkey_patching.api_parser import (
+    _filter_dict_flattened,
+    api_obj_to_json_dict,
+    filter_dict,
+    func_kwargs_to_json_dict,
+    merge_filtered_into_raw,
+    unflatten_to_show,
+)
+from tests.benchmarks.payloads import (
+    PROVIDERS,
+    make_chat_body,
+    make_httpx_pair,
+    make_provider_request,
+    make_provider_response,
+    make_requests_pair,
+    make_text,
+    make_tool_chat_body,
+)
+
+
+def flattened_merge(raw_dict, to_show_dict):
+    """merge_filtered_into_raw before the tree walk."""
+    flattened_raw = flatten(raw_dict, ".")
+    for key, value in flatten(unflatten_to_show(to_show_dict), ".").items():
+        if key in flattened_raw:
+            flattened_raw[key] = value
+    return unflatten_list(flattened_raw, ".")
+
+
+def recorded_raws():
+    raws = []
+    for make_pair, api_type in (
+        (make_httpx_pair, "httpx.Client.send"),
+        (make_requests_pair, "requests.Session.send"),
+    ):
+        request, response = make_pair(prompt_bytes=300, output_bytes=200)
+        raws.append(func_kwargs_to_json_dict({"request": request}, api_type)[0]["raw"])
+        raws.append(api_obj_to_json_dict(response, api_type)["raw"])
+    for provider in PROVIDERS:
+        path, body = make_provider_request(provider, make_text(200))
+        raws.append({"url": f"http://localhost{path}", "body": body})
+        raws.append({"content": make_provider_response(provider, make_text(200, seed=1))})
+    raws.append({"body": make_chat_body(2000, n_messages=6)})
+    raws.append({"body": make_tool_chat_body(2000, n_tools=5)})
+    return raws
+
+
+RECORDED = recorded_raws()
+
+KEYS = [
+    "content",
+    "choices",
+    "message",
+    "tools",
+    "index",
+    "type",
+    "id",
+    "_meta",
+    "max_tokens",
+    "stream",
+    "usage",
+    "text",
+    "0",
+    "1",
+    "2",
+]
+LEAVES = ["x", "", 0, 0.0, 1, 1.5, True, False, None, [], {}]
+
+
+def random_tree(rng, depth=0):
+    if depth > 4 or rng.random() < 0.3:
+        return rng.choice(LEAVES)
+    if rng.random() < 0.4:
+        return [random_tree(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {rng.choice(KEYS): random_tree(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def random_raws(n, keys=()):
+    rng = random.Random(0)
+    pool = KEYS + list(keys)
+    raws = []
+    while len(raws) < n:
+        raw = {rng.choice(pool): random_tree(rng) for _ in range(rng.randint(1, 5))}
+        try:
+            _filter_dict_flattened(copy.deepcopy(raw))
+        except Exception:
+            continue  # the flatten pipeline cannot rebuild it either
+        raws.append(raw)
+    return raws
+
+
+def edit_leaves(to_show, rng):
+    """to_show with some of its leaves changed, including the types of numbers."""
+    if isinstance(to_show, dict):
+        return {k: edit_leaves(v, rng) for k, v in to_show.items()}
+    if isinstance(to_show, list):
+        return [edit_leaves(v, rng) for v in to_show]
+    if rng.random() < 0.3:
+        return rng.choice(["edited", 7, 0, 0.0, None, [], {"new": 1}])
+    return to_show
+
+
+class TestFilterDict:
+    @pytest.mark.parametrize("raw", RECORDED)
+    def test_recorded_payloads(self, raw):
+        assert json.dumps(filter_dict(raw)) == json.dumps(_filter_dict_flattened(raw))
+
+    def test_random_documents(self):
+        for raw in random_raws(500):
+            assert json.dumps(filter_dict(raw)) == json.dumps(_filter_dict_flattened(raw)), raw
+
+    def test_keys_the_walk_cannot_map(self):
+        # Dotted, empty and non-canonical numeric keys go through the flatten pipeline
+        for raw in random_raws(200, keys=["a.b", "", "01"]):
+            assert json.dumps(filter_dict(raw)) == json.dumps(_filter_dict_flattened(raw)), raw
+
+    def test_gaps_in_lists(self):
+        raw = {"content": {"choices": [{"index": 0}, {"index": 1, "x": 1}, {"index": 2}]}}
+        assert filter_dict(raw) == {"content.choices.1.x": 1}
+        assert json.dumps(filter_dict(raw)) == json.dumps(_filter_dict_flattened(raw))
+
+    def test_display_keys(self):
+        raw = {"a": [{"b": {"c": 1}}, [{"d": 1}]], "e": {"f": 2}, "_private": 3, "g": []}
+        assert filter_dict(raw) == {"a": [{"b.c": 1}, [{"d": 1}]], "e.f": 2}
+
+
+class TestMergeFilteredIntoRaw:
+    @pytest.mark.parametrize("raw", RECORDED)
+    def test_recorded_payloads(self, raw):
+        rng = random.Random(1)
+        for _ in range(5):
+            to_show = edit_leaves(filter_dict(raw), rng)
+            assert merge_filtered_into_raw(raw, to_show) == flattened_merge(raw, to_show)
+
+    def test_random_documents(self):
+        rng = random.Random(2)
+        for raw in random_raws(500):
+            to_show = edit_leaves(filter_dict(raw), rng)
+            try:
+                expected = flattened_merge(raw, to_show)
+            except Exception:
+                continue
+            if has_numbered_dict(raw):
+                continue  # unflatten_list turned these dicts into lists
+            assert merge_filtered_into_raw(raw, to_show) == expected, (raw, to_show)
+
+    def test_fully_flattened_to_show(self):
+        # ao-tool edits pass to_show flattened down to the list indices
+        raw = {"body": make_chat_body(200)}
+        to_show = flatten(filter_dict(raw), ".")
+        to_show["body.messages.1.content"] = "edited"
+        merged = merge_filtered_into_raw(raw, to_show)
+        assert merged == flattened_merge(raw, to_show)
+        assert merged["body"]["messages"][1]["content"] == "edited"
+
+    def test_copies_only_edited_paths(self):
+        raw = {"body": make_chat_body(200), "headers": {"a": "b"}}
+        before = copy.deepcopy(raw)
+        to_show = filter_dict(raw)
+        to_show["body.messages"][0]["content"] = "edited"
+
+        merged = merge_filtered_into_raw(raw, to_show)
+        assert raw == before
+        assert merged["headers"] is raw["headers"]
+        assert merged["body"]["messages"][1] is raw["body"]["messages"][1]
+        assert merged["body"]["messages"][0]["content"] == "edited"
+        assert list(merged["body"]) == list(raw["body"])
+
+    def test_containers_are_not_replaced(self):
+        raw = {"a": {"b": 1}, "c": [], "d": 0.0, "e": "x"}
+        to_show = {"a": "x", "c": [1], "d": 0, "e": []}
+        merged = merge_filtered_into_raw(raw, to_show)
+        assert merged == flattened_merge(raw, to_show)
+        assert merged == {"a": {"b": 1}, "c": [], "d": 0, "e": []}
+        assert type(merged["d"]) is int
+
+    def test_dotted_raw_keys(self):
+        # The flatten pipeline rebuilt these as {"a": {"b": ...}}
+        raw = {"body": {"a.b": 1, "c": {"d.e": [1, 2]}}}
+        merged = merge_filtered_into_raw(raw, {"body.a.b": 2, "body.c.d.e": [1, 3]})
+        assert merged == {"body": {"a.b": 2, "c": {"d.e": [1, 3]}}}
+
+
+def has_numbered_dict(node):
+    if isinstance(node, dict):
+        if node and all(k.isdigit() for k in node):
+            return True
+        return any(has_numbered_dict(v) for v in node.values())
+    if isinstance(node, list):
+        return any(has_numbered_dict(v) for v in node)
+    return False
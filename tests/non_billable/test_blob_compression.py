@@ -0,0 +1,136 @@
+"""
+Tests for the optional compression of llm_calls values (see ao.server.blob_compression).
+"""
+
+import json
+
+import pytest
+
+from ao.server import blob_compression
+from ao.server.blob_compression import (
+    decompress,
+    is_compressed,
+    to_text,
+    train_dict,
+)
+from ao.server.database_manager import DB
+from ao.server.llm_call_format import decode
+
+API_TYPE = "httpx.Client.send"
+
+
+@pytest.fixture(autouse=True)
+def fresh_dicts(monkeypatch):
+    monkeypatch.setattr(blob_compression, "_dicts", {})
+
+
+@pytest.fixture
+def compressed(session, monkeypatch):
+    compressor = DB._new_compressor()
+    compressor.dict_samples = 2
+    monkeypatch.setattr(DB, "_compressor", compressor)
+    yield compressor
+
+
+@pytest.fixture
+def run_call(run_call):
+    """run_call of calls large enough to be compressed. Returns (result, llm_called)."""
+
+    def run(seed=0):
+        cache_output, sent = run_call(seed=seed, prompt_bytes=2000, output_bytes=1000)
+        return cache_output, sent is not None
+
+    return run
+
+
+def stored_row(node_id):
+    return DB.query_one(
+        "SELECT input, input_overwrite, output, stack_trace FROM llm_calls WHERE node_id=?",
+        (node_id,),
+    )
+
+
+def no_dict(dict_id):
+    raise AssertionError(f"unexpected dictionary lookup {dict_id}")
+
+
+class TestEncoding:
+    def test_train_dict_keeps_shared_segments(self):
+        samples = [b'{"system": "be brief", "tools": [1, 2]}, "turn": %d' % i for i in range(3)]
+        zdict = train_dict(samples, max_bytes=1000)
+        assert b'"be brief",' in zdict and b'"turn"' not in zdict
+        assert train_dict([b"abcdef,", b"ghijkl,"], max_bytes=1000) == b""
+        assert len(train_dict(samples, max_bytes=10)) <= 10
+
+    def test_values_round_trip(self, session):
+        compressor = DB._new_compressor()
+        compressor.dict_samples = 2
+        texts = [json.dumps({"system": "x" * 500, "turn": i, "é": "ü"}) for i in range(4)]
+        stored = [compressor.compress(text, API_TYPE, "input") for text in texts]
+        assert all(isinstance(value, bytes) for value in stored)
+        # The first values are compressed before the dictionary exists
+        assert stored[0][0] == 1 and stored[3][0] == 2
+        assert [DB._decompress(value) for value in stored] == texts
+        assert decompress(to_text(stored[0]), no_dict) == texts[0]
+        assert is_compressed(to_text(stored[0])) and not is_compressed(texts[0])
+
+    def test_short_values_are_kept(self, session):
+        compressor = DB._new_compressor()
+        assert compressor.compress("short", API_TYPE, "input") == "short"
+        assert compressor.compress(None, API_TYPE, "input") is None
+        assert decompress("short", no_dict) == "short"
+
+
+class TestCompressedRows:
+    def test_rows_are_read_back(self, compressed, run_call):
+        first, llm_called = run_call()
+        assert llm_called
+        row = stored_row(first.node_id)
+        assert is_compressed(row["input"]) and is_compressed(row["output"])
+
+        full = DB.get_llm_call_full("s", first.node_id)
+        assert decode(full["input"]).json_dict() == first.call.input_json_dict
+        assert full["stack_trace"] == first.stack_trace
+
+        second, llm_called = run_call()
+        assert not llm_called
+        assert second.output.json() == first.output.json()
+
+    def test_dictionaries_are_reused(self, compressed, run_call, monkeypatch):
+        nodes = [run_call(seed)[0].node_id for seed in range(3)]
+        assert stored_row(nodes[2])["output"][0] == 2
+        scope = DB.query_one("SELECT scope FROM compression_dicts WHERE scope LIKE '%output'")
+        assert scope["scope"] == f"{API_TYPE}\noutput"
+
+        # A new process: dictionaries come from the DB
+        monkeypatch.setattr(blob_compression, "_dicts", {})
+        monkeypatch.setattr(DB, "_compressor", DB._new_compressor())
+        node_id = run_call(seed=3)[0].node_id
+        assert stored_row(node_id)["output"][0] == 2
+        monkeypatch.setattr(blob_compression, "_dicts", {})
+        assert run_call(seed=0)[1] is False
+
+    def test_overwrites_are_compressed(self, compressed, run_call):
+        first, _ = run_call()
+        wrapped = first.call.output_json_dict
+        wrapped["to_show"]["content.choices"][0]["message.content"] = "edited " * 100
+        DB.set_output_overwrite("s", first.node_id, json.dumps(wrapped))
+        assert is_compressed(stored_row(first.node_id)["output"])
+        output = DB.query_one_llm_call_output("s", first.node_id)["output"]
+        assert (
+            decode(output).raw["content"]["choices"][0]["message"]["content"].startswith("edited")
+        )
+
+    def test_migrate_compresses_and_decompresses(self, session, run_call):
+        nodes = [run_call(seed)[0].node_id for seed in range(3)]
+        plain = [dict(stored_row(node_id)) for node_id in nodes]
+
+        stats = DB.migrate_llm_calls(compress=True)
+        assert stats["migrated"] == 3 and stats["bytes_after"] < stats["bytes_before"] / 2
+        assert all(is_compressed(stored_row(node_id)["input"]) for node_id in nodes)
+        assert DB.migrate_llm_calls(compress=True)["migrated"] == 0
+        assert DB.migrate_llm_calls()["migrated"] == 0
+        assert run_call(seed=1)[1] is False
+
+        assert DB.migrate_llm_calls(compress=False)["migrated"] == 3
+        assert [dict(stored_row(node_id)) for node_id in nodes] == plain
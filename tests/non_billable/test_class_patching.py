@@ -0,0 +1,84 @@
+"""
+Tests for patch_class_method, the class-level wrappers the patches install.
+"""
+
+import asyncio
+import inspect
+
+from ao.runner.monkey_patching.patching_utils import patch_class_method
+
+
+def recording_patch(records):
+    def make_patched(original):
+        def patched(self, request):
+            records.append((type(self).__name__, request))
+            return original(self, request)
+
+        return patched
+
+    return make_patched
+
+
+class TestPatchClassMethod:
+    def test_existing_instances_and_subclasses_record_once(self):
+        class Client:
+            def send(self, request):
+                return f"client:{request}"
+
+        class Override(Client):
+            def send(self, request):
+                return "override+" + super().send(request)
+
+        class Plain(Client):
+            pass
+
+        existing = Client()
+        records = []
+        patch_class_method(Client, "send", recording_patch(records))
+
+        assert existing.send("a") == "client:a"
+        assert Override().send("b") == "override+client:b"
+        assert Plain().send("c") == "client:c"
+        assert records == [("Client", "a"), ("Override", "b"), ("Plain", "c")]
+        assert "send" not in existing.__dict__
+
+    def test_subclasses_defined_after_patching(self):
+        class Client:
+            def __init_subclass__(cls, tag=None, **kwargs):
+                super().__init_subclass__(**kwargs)
+                cls.tag = tag
+
+            def send(self, request):
+                return request
+
+        records = []
+        patch_class_method(Client, "send", recording_patch(records))
+
+        class Later(Client, tag="later"):
+            def send(self, request):
+                return super().send(request) * 2
+
+        assert Later.tag == "later"
+        assert Later().send("x") == "xx"
+        assert records == [("Later", "x")]
+
+    def test_async_methods_stay_coroutine_functions(self):
+        class AsyncClient:
+            async def send(self, request):
+                return request
+
+        records = []
+
+        def make_patched(original):
+            async def patched(self, request):
+                records.append(request)
+                return await original(self, request)
+
+            return patched
+
+        patch_class_method(AsyncClient, "send", make_patched)
+        patch_class_method(AsyncClient, "send", make_patched)  # applying twice is a no-op
+
+        assert inspect.iscoroutinefunction(AsyncClient.send)
+        assert asyncio.run(AsyncClient().send("r")) == "r"
+        assert records == ["r"]
@@ -0,0 +1,70 @@
+"""
+The combined endpoint classifier must agree with matching the whitelist pairs one by one.
+"""
+
+import pytest
+
+from ao.common.constants import COMPILED_ENDPOINT_PATTERNS
+from ao.common.utils import is_whitelisted_endpoint, is_whitelisted_host_path
+
+
+def pairwise_match(host, path):
+    return any(
+        url_pattern.search(host) and path_pattern.search(path)
+        for url_pattern, path_pattern in COMPILED_ENDPOINT_PATTERNS
+    )
+
+
+HOSTS = [
+    "",
+    "api.openai.com",
+    "api.anthropic.com",
+    "localhost",
+    "google.serper.dev",
+    "api.search.brave.com",
+    "r.jina.ai",
+    "api.brightdata.com",
+    "api.patronus.ai",
+    "api.contextual.ai",
+    "api.parallel.ai",
+    "s3.amazonaws.com",
+    "telemetry.example.com",
+]
+PATHS = [
+    "/",
+    "/v1/messages",
+    "/v1/responses",
+    "/v1/chat/completions",
+    "/v1beta/models/gemini-2.0-flash:generateContent",
+    "models/gemini-2.0-flash:streamGenerateContent",
+    "/api/chat",
+    "/api/embeddings",
+    "/res/v1/web/search",
+    "/request",
+    "/v1/evaluate",
+    "/v1/datastores/ds-1/query",
+    "/v1/rerank",
+    "/v1beta/search",
+    "/bucket/object.json",
+    "/v1/traces",
+]
+
+
+class TestEndpointClassifier:
+    @pytest.mark.parametrize("host", HOSTS)
+    def test_matches_pairwise_whitelist(self, host):
+        for path in PATHS:
+            assert is_whitelisted_host_path(host, path) == pairwise_match(host, path), path
+
+    def test_is_whitelisted_endpoint_uses_host_and_path(self):
+        assert is_whitelisted_endpoint(
+            "https://api.openai.com/v1/chat/completions", "/v1/chat/completions"
+        )
+        assert is_whitelisted_endpoint(
+            "https://api.search.brave.com/res/v1/web/search?q=x", "/res/v1/web/search?q=x"
+        )
+        assert is_whitelisted_endpoint("*", "models/gemini-2.0-flash:generateContent")
+        assert not is_whitelisted_endpoint("*", "/v1/evaluate")
+        assert not is_whitelisted_endpoint(
+            "https://s3.amazonaws.com/b/o?r.jina.ai", "/b/o?r.jina.ai"
+        )
@@ -0,0 +1,145 @@
+"""
+Tests for copy-on-write forks of a session's LLM calls (`ao-tool edit-and-rerun`).
+"""
+
+import json
+from datetime import datetime
+
+from ao.runner.monkey_patching.api_parser import api_obj_to_json_str
+from ao.server.database_manager import DB
+from ao.server.llm_call_format import decode
+from tests.benchmarks.payloads import make_httpx_pair
+
+API_TYPE = "httpx.Client.send"
+
+
+def add_session(session_id, nodes=()):
+    DB.add_experiment(session_id, session_id, datetime.now(), "/tmp", "python x.py", {})
+    for node in nodes:
+        DB.backend.insert_llm_call_with_output_query(
+            session_id,
+            json.dumps({"input": json.dumps({"prompt": node})}),
+            f"hash-{node}",
+            node,
+            API_TYPE,
+            f"out-{node}",
+        )
+
+
+def edited_output():
+    _, response = make_httpx_pair(prompt_bytes=100, output_bytes=100)
+    return api_obj_to_json_str(response, API_TYPE)
+
+
+def count_rows(session_id):
+    return DB.query_one("SELECT COUNT(*) AS n FROM llm_calls WHERE session_id=?", (session_id,))[
+        "n"
+    ]
+
+
+def outputs(session_id):
+    return {row["node_id"]: row["output"] for row in DB.get_llm_calls_for_session(session_id)}
+
+
+class TestForks:
+    def test_fork_reads_through_base(self, backend):
+        add_session("base", ["a", "b"])
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+
+        assert count_rows("fork") == 0
+        assert outputs("fork") == {"a": "out-a", "b": "out-b"}
+        assert DB._get_llm_call("fork", "hash-a")["node_id"] == "a"
+        assert DB.get_llm_call_full("fork", "b")["output"] == "out-b"
+
+        DB.preload_session("fork", wait=True)
+        assert DB._get_known_llm_call("fork", "hash-b")["output"] == "out-b"
+
+    def test_replay_only_does_not_copy_edited_base_nodes(self, backend, monkeypatch):
+        add_session("base", ["a"])
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+        DB.backend.set_input_overwrite_query(json.dumps({"edits": []}), "base", "a")
+
+        monkeypatch.setattr(DB, "replay_only", True)
+        assert DB._get_llm_call("fork", "hash-a")["output"] is None
+        assert count_rows("fork") == 0
+
+        monkeypatch.setattr(DB, "replay_only", False)
+        DB._get_llm_call("fork", "hash-a")
+        assert count_rows("fork") == 1
+
+    def test_edits_copy_only_the_edited_node(self, backend):
+        add_session("base", ["a", "b"])
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+
+        edit = edited_output()
+        DB.set_output_overwrite("fork", "a", edit)
+        assert count_rows("fork") == 1
+        assert decode(outputs("fork")["a"]).json_dict() == json.loads(edit)
+        assert outputs("base")["a"] == "out-a"
+
+        DB.set_input_overwrite("fork", "b", json.dumps({"prompt": "edited"}))
+        row = DB._get_llm_call("fork", "hash-b")
+        assert row["session_id"] == "fork"
+        assert row["input_overwrite"] is not None and row["output"] is None
+
+    def test_base_edit_compacts_forks(self, backend):
+        add_session("base", ["a"])
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+
+        DB.set_output_overwrite("base", "a", edited_output())
+        assert outputs("base")["a"] != "out-a"
+        assert outputs("fork") == {"a": "out-a"}
+        assert DB._session_chain("fork") == ("fork",)
+
+        DB.erase("base")
+        assert outputs("fork") == {"a": "out-a"}
+
+    def test_lookup_of_edited_base_input_copies_the_row(self, backend):
+        add_session("base", ["a"])
+        DB.set_input_overwrite("base", "a", json.dumps({"prompt": "edited"}))
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+
+        row = DB._get_llm_call("fork", "hash-a")
+        assert row["output"] is None
+        # The live output will be upserted next to the fork's copy of the overwrite
+        assert DB.backend.get_llm_call_full_query("fork", "a")["input_overwrite"] is not None
+
+    def test_preloaded_lookup_of_edited_base_input_copies_the_row(self, backend):
+        add_session("base", ["a"])
+        DB.set_input_overwrite("base", "a", json.dumps({"prompt": "edited"}))
+        add_session("fork")
+        DB.fork_llm_calls("base", "fork")
+        DB.preload_session("fork", wait=True)
+
+        row = DB._get_known_llm_call("fork", "hash-a")
+        assert row["output"] is None
+        assert DB.backend.get_llm_call_full_query("fork", "a")["input_overwrite"] is not None
+
+        DB.backend.insert_llm_call_with_output_query(
+            "fork", "input-a", "hash-a", "a", API_TYPE, "out-edited"
+        )
+        fork_row = DB.backend.get_llm_call_full_query("fork", "a")
+        assert fork_row["input_overwrite"] is not None and fork_row["output"] == "out-edited"
+
+    def test_compact_and_deep_chains(self, backend, monkeypatch):
+        from ao.common import constants
+
+        monkeypatch.setattr(constants, "FORK_MAX_DEPTH", 2)
+        add_session("s0", ["a"])
+        for i in range(1, 4):
+            add_session(f"s{i}", [f"n{i}"])
+            DB.fork_llm_calls(f"s{i - 1}", f"s{i}")
+
+        # s3 would have 3 bases: flattened when forked
+        assert DB._session_chain("s2") == ("s2", "s1", "s0")
+        assert DB._session_chain("s3") == ("s3",)
+        assert set(outputs("s3")) == {"a", "n1", "n2", "n3"}
+
+        assert DB.compact_session("s2") == 2
+        assert count_rows("s2") == 3
+        assert DB.compact_session("s2") == 0
@@ -0,0 +1,65 @@
+"""
+get_input_dict must give the same dicts as binding with inspect.signature.
+"""
+
+import inspect
+
+import pytest
+
+from ao.runner.monkey_patching.patching_utils import _bind_with_signature, get_input_dict
+
+SENTINEL = object()
+
+
+class Client:
+    def send(self, request, *, stream=False, auth=SENTINEL, follow_redirects=SENTINEL):
+        pass
+
+
+class Session:
+    def send(self, request, **kwargs):
+        pass
+
+
+class ClientSession:
+    def send_request(self, request, result_type, request_read_timeout_seconds=None, **kwargs):
+        pass
+
+
+class ApiClient:
+    async def async_request(self, http_method, path, request_dict, http_options=None):
+        pass
+
+
+def varargs(a, *args, b=1, **kwargs):
+    pass
+
+
+CASES = [
+    (Client().send, ("req",), {}),
+    (Client().send, ("req",), {"stream": True}),
+    (Client().send, (), {"request": "req", "follow_redirects": False}),
+    (Session().send, ("req",), {"timeout": 5, "verify": False}),
+    (Session().send, (), {"request": "req", "stream": True}),
+    (ClientSession().send_request, ("req", int), {}),
+    (ClientSession().send_request, ("req",), {"result_type": int, "metadata": {"a": 1}}),
+    (ApiClient().async_request, ("POST", "models/x:generateContent", {"a": 1}), {}),
+    (ApiClient().async_request, ("POST",), {"path": "p", "request_dict": {}, "http_options": 1}),
+    (varargs, (1, 2, 3), {"c": 4}),
+]
+
+
+class TestGetInputDict:
+    @pytest.mark.parametrize("func,args,kwargs", CASES)
+    def test_matches_signature_bind(self, func, args, kwargs):
+        expected = _bind_with_signature(inspect.signature(func), args, kwargs)
+        for _ in range(2):  # binder is built on the first call and reused
+            result = get_input_dict(func, *args, **kwargs)
+            assert result == expected
+            assert list(result) == list(expected)
+
+    def test_invalid_arguments_raise(self):
+        with pytest.raises(TypeError):
+            get_input_dict(Client().send)
+        with pytest.raises(TypeError):
+            get_input_dict(ApiClient().async_request, "POST", "path", {}, None, "extra")
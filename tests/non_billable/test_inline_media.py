@@ -0,0 +1,120 @@
+"""
+Tests for hoisting inline base64 media out of inputs (see ao.runner.monkey_patching.inline_media).
+"""
+
+import base64
+import hashlib
+import json
+
+from ao.common.utils import hash_input
+from ao.runner.monkey_patching.api_parser import api_obj_to_json_str, func_kwargs_to_json_str
+from ao.runner.monkey_patching.inline_media import REF_PREFIX, hoist_media, inline_media
+from ao.server.database_manager import DB
+from ao.server.llm_call_format import decode
+
+API_TYPE = "httpx.Client.send"
+IMAGE = bytes(range(256)) * 40
+IMAGE_B64 = base64.b64encode(IMAGE).decode("ascii")
+IMAGE_ID = hashlib.sha256(IMAGE).hexdigest()
+
+
+def vision_body(prompt="What is in this image?"):
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/png;base64,{IMAGE_B64}"},
+                    },
+                ],
+            }
+        ],
+    }
+
+
+class TestHoisting:
+    def test_provider_formats(self):
+        document = {
+            "anthropic": {"type": "base64", "media_type": "image/png", "data": IMAGE_B64},
+            "openai": {"image_url": {"url": f"data:image/png;base64,{IMAGE_B64}"}},
+            "file": {"file_data": f"data:application/pdf;base64,{IMAGE_B64}"},
+        }
+        hoisted, media = hoist_media(document)
+        assert hoisted["anthropic"]["data"] == REF_PREFIX + IMAGE_ID
+        assert (
+            hoisted["openai"]["image_url"]["url"] == f"data:image/png;base64,{REF_PREFIX}{IMAGE_ID}"
+        )
+        assert hoisted["file"]["file_data"].startswith("data:application/pdf;base64,")
+        assert list(media) == [IMAGE_ID] and media[IMAGE_ID][1] == IMAGE
+        assert media[IMAGE_ID][0].startswith(IMAGE_ID[:16])
+        assert inline_media(hoisted, {IMAGE_ID: IMAGE}.get) == document
+        assert inline_media(hoisted, lambda file_id: None) == hoisted
+
+    def test_other_strings_are_kept(self):
+        text = "word " * 2000
+        document = {
+            "short": base64.b64encode(b"tiny").decode("ascii"),
+            "text": text,
+            "not_canonical": IMAGE_B64[:-2] + "x=",
+            "shared": [1, {"a": "b"}],
+        }
+        hoisted, media = hoist_media(document)
+        assert hoisted is document and media == {}
+
+
+class TestInterceptedCall:
+    def test_hash_is_computed_with_media_inline(self, make_call):
+        call = make_call(body=vision_body())
+        assert IMAGE_B64 in call.input_pickle
+        assert REF_PREFIX + IMAGE_ID in call.input_json_str
+        assert list(call.media) == [IMAGE_ID]
+        assert len(call.stored_input) < len(IMAGE_B64)
+        assert decode(call.stored_input).json_dict() == call.input_json_dict
+
+    def test_media_is_stored_and_restored_on_replay(self, session, run_call):
+        first, sent = run_call(body=vision_body())
+        assert IMAGE_B64 in sent.content.decode("utf-8")
+        with open(DB.get_file_path(IMAGE_ID), "rb") as f:
+            assert f.read() == IMAGE
+        assert run_call(body=vision_body())[1] is None
+
+        wrapped = first.call.input_json_dict
+        wrapped["to_show"]["body.messages"][0]["content"][0]["text"] = "Describe it."
+        DB.set_input_overwrite("s", first.node_id, json.dumps(wrapped))
+        _, sent = run_call(body=vision_body())
+        body = json.loads(sent.content)
+        assert body == vision_body("Describe it.")
+
+    def test_sessions_recorded_before_hoisting_hit(self, session, make_call, run_call):
+        call = make_call(body=vision_body())
+        # Input hash and row of a session recorded before media was hoisted
+        api_json_str, attachments = func_kwargs_to_json_str(call.input_dict, API_TYPE)
+        input_pickle = json.dumps(
+            {"input": api_json_str, "attachments": attachments, "model": call.model},
+            sort_keys=True,
+        )
+        DB.backend.insert_llm_call_with_output_query(
+            "s",
+            input_pickle,
+            hash_input(input_pickle),
+            "old",
+            API_TYPE,
+            api_obj_to_json_str(call.output_obj, API_TYPE),
+        )
+
+        cache_output, sent = run_call(body=vision_body())
+        assert sent is None and cache_output.node_id == "old"
+
+    def test_media_stays_inline_if_it_cannot_be_stored(self, session, run_call, monkeypatch):
+        def failing_cache_file(*args):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(DB, "cache_file", failing_cache_file)
+        first, _ = run_call(body=vision_body())
+        stored = DB.get_llm_call_full("s", first.node_id)["input"]
+        assert IMAGE_B64 in stored and REF_PREFIX not in stored
+        assert run_call(body=vision_body())[1] is None
@@ -0,0 +1,68 @@
+"""
+Tests for the sys.meta_path finder that applies LAZY_PATCHES on first import.
+"""
+
+import importlib
+import sys
+
+import pytest
+
+from ao.runner.monkey_patching.apply_monkey_patches import LazyPatchFinder
+
+PATCH_MODULE = """
+calls = []
+
+
+def patch_target():
+    import ao_lazy_target
+
+    ao_lazy_target.PATCHED = True
+    calls.append(ao_lazy_target.__name__)
+"""
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    (tmp_path / "ao_lazy_target").mkdir()
+    (tmp_path / "ao_lazy_target" / "__init__.py").write_text("PATCHED = False\n")
+    (tmp_path / "ao_lazy_target" / "sub.py").write_text("VALUE = 1\n")
+    (tmp_path / "ao_lazy_patch.py").write_text(PATCH_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    yield
+    for name in ("ao_lazy_target", "ao_lazy_target.sub", "ao_lazy_patch"):
+        sys.modules.pop(name, None)
+
+
+class TestLazyPatchFinder:
+    def test_patches_once_on_first_import_and_uninstalls(self, modules):
+        finder = LazyPatchFinder({"ao_lazy_target": ("ao_lazy_patch", "patch_target")})
+        finder.install()
+        assert finder in sys.meta_path
+
+        import ao_lazy_target.sub
+
+        patch_module = importlib.import_module("ao_lazy_patch")
+        assert ao_lazy_target.PATCHED
+        assert patch_module.calls == ["ao_lazy_target"]
+        assert finder not in sys.meta_path
+        assert ao_lazy_target.__loader__ is ao_lazy_target.__spec__.loader
+        assert type(ao_lazy_target.__loader__).__name__ == "SourceFileLoader"
+
+        importlib.reload(ao_lazy_target)
+        assert patch_module.calls == ["ao_lazy_target"]
+
+    def test_already_imported_modules_are_patched_on_install(self, modules):
+        import ao_lazy_target
+
+        finder = LazyPatchFinder({"ao_lazy_target": ("ao_lazy_patch", "patch_target")})
+        finder.install()
+        assert ao_lazy_target.PATCHED
+        assert finder not in sys.meta_path
+
+    def test_missing_modules_are_left_to_the_import_system(self, modules):
+        finder = LazyPatchFinder({"ao_lazy_missing": ("ao_lazy_patch", "patch_target")})
+        finder.install()
+        with pytest.raises(ImportError):
+            import ao_lazy_missing  # noqa: F401
+        assert "ao_lazy_patch" not in sys.modules
@@ -0,0 +1,153 @@
+"""
+Tests for the llm_calls storage format (raw only, to_show derived on read) and
+the migration of rows stored with to_show.
+"""
+
+import json
+
+from ao.common.utils import hash_input
+from ao.runner.monkey_patching.api_parser import json_str_to_api_obj, json_str_to_original_inp_dict
+from ao.server.database_manager import DB
+from ao.server.llm_call_format import decode, migrate_row, overwritten_input, raw_edits
+
+API_TYPE = "httpx.Client.send"
+
+
+def insert(call, node_id, old_format=False):
+    DB.backend.insert_llm_call_with_output_query(
+        "s",
+        call.input_pickle if old_format else call.stored_input,
+        call.input_hash,
+        node_id,
+        API_TYPE,
+        call.output_json_str if old_format else call.stored_output,
+    )
+
+
+def edited(wrapped: dict, content: str) -> str:
+    wrapped = json.loads(json.dumps(wrapped))
+    if "content.choices" in wrapped["to_show"]:
+        wrapped["to_show"]["content.choices"][0]["message.content"] = content
+    else:
+        wrapped["to_show"]["body.messages"][-1]["content"] = content
+    return json.dumps(wrapped)
+
+
+class TestStoredFormat:
+    def test_to_show_derived_on_read(self, make_call):
+        call = make_call()
+        assert decode(call.stored_input).json_dict() == call.input_json_dict
+        assert decode(call.stored_output).json_dict() == call.output_json_dict
+        assert decode(call.input_pickle).json_dict() == call.input_json_dict
+        assert len(call.stored_input) < len(call.input_pickle)
+        assert len(call.stored_output) < len(call.output_json_str)
+
+    def test_input_hash_can_be_rebuilt(self, make_call):
+        call = make_call()
+        stored = decode(call.stored_input)
+        input_pickle = json.dumps(
+            {
+                "input": json.dumps(stored.json_dict()),
+                "attachments": stored.attachments,
+                "model": stored.model,
+            },
+            sort_keys=True,
+        )
+        assert hash_input(input_pickle) == call.input_hash
+
+    def test_other_columns(self):
+        assert decode(None) is None
+        assert decode("out-a") is None
+        assert decode(json.dumps({"input": json.dumps({"prompt": "a"})})) is None
+
+    def test_raw_edits(self):
+        old = {"a": [1, {"b": 2.0}], "c": {"d": "x"}, "e": [1]}
+        new = {"a": [1, {"b": 2}], "c": {"d": "x", "f": 1}, "e": [1, 2]}
+        assert raw_edits(old, new) == [
+            (["a", 1, "b"], 2),
+            (["c"], {"d": "x", "f": 1}),
+            (["e"], [1, 2]),
+        ]
+        assert raw_edits(old, old) == []
+
+
+class TestOverwrites:
+    def test_input_overwrite_stores_edits(self, session, make_call):
+        call = make_call()
+        insert(call, "n")
+        DB.set_input_overwrite("s", "n", edited(call.input_json_dict, "edited prompt"))
+
+        row = DB.get_llm_call_full("s", "n")
+        assert row["output"] is None
+        overwrite = json.loads(row["input_overwrite"])
+        assert len(overwrite["edits"]) == 1
+
+        overwrite_text = overwritten_input(row["input_overwrite"], call.input_json_dict["raw"])
+        input_dict = json_str_to_original_inp_dict(overwrite_text, make_call().input_dict, API_TYPE)
+        body = json.loads(input_dict["request"].content)
+        assert body["messages"][-1]["content"] == "edited prompt"
+
+    def test_unchanged_input_keeps_output(self, session, make_call):
+        call = make_call()
+        insert(call, "n")
+        DB.set_input_overwrite("s", "n", call.input_json_str)
+        row = DB.get_llm_call_full("s", "n")
+        assert row["input_overwrite"] is None and row["output"] is not None
+
+    def test_output_overwrite_is_merged_into_raw(self, session, make_call):
+        call = make_call()
+        insert(call, "n")
+        DB.set_output_overwrite("s", "n", edited(call.output_json_dict, "edited answer"))
+
+        output = DB.get_llm_call_full("s", "n")["output"]
+        assert "to_show" not in json.loads(output)
+        assert decode(output).to_show["content.choices"][0]["message.content"] == "edited answer"
+        response = json_str_to_api_obj(output, API_TYPE)
+        assert response.json()["choices"][0]["message"]["content"] == "edited answer"
+
+
+class TestMigration:
+    def test_migrates_old_rows(self, session, make_call):
+        calls = [make_call(seed) for seed in range(3)]
+        for i, call in enumerate(calls):
+            insert(call, f"n{i}", old_format=True)
+        # Old-format overwrites: the whole edited input, and an edited output
+        old_overwrite = json.loads(calls[0].input_pickle)
+        old_overwrite["input"] = edited(calls[0].input_json_dict, "edited prompt")
+        DB.backend.set_input_overwrite_query(json.dumps(old_overwrite, sort_keys=True), "s", "n0")
+        DB.backend.set_output_overwrite_query(
+            edited(calls[1].output_json_dict, "edited answer"), "s", "n1"
+        )
+        DB.backend.insert_llm_call_with_output_query(
+            "s",
+            json.dumps({"input": json.dumps({"prompt": "x"})}),
+            "hash-x",
+            "x",
+            API_TYPE,
+            "out-x",
+        )
+
+        stats = DB.migrate_llm_calls(batch_size=2)
+        assert stats["rows"] == 4 and stats["migrated"] == 3
+        assert stats["bytes_after"] < stats["bytes_before"]
+        assert DB.migrate_llm_calls()["migrated"] == 0
+
+        rows = {row["node_id"]: row for row in DB.get_llm_calls_for_session("s")}
+        for i, call in enumerate(calls):
+            assert decode(rows[f"n{i}"]["input"]).json_dict() == call.input_json_dict
+            assert DB._get_llm_call("s", call.input_hash)["node_id"] == f"n{i}"
+        overwrite_text = overwritten_input(
+            rows["n0"]["input_overwrite"], calls[0].input_json_dict["raw"]
+        )
+        assert (
+            json.loads(overwrite_text)["raw"]["body"]["messages"][-1]["content"] == "edited prompt"
+        )
+        output = json_str_to_api_obj(rows["n1"]["output"], API_TYPE)
+        assert output.json()["choices"][0]["message"]["content"] == "edited answer"
+        assert decode(rows["n2"]["output"]).json_dict() == calls[2].output_json_dict
+        assert rows["x"]["output"] == "out-x"
+
+    def test_new_rows_are_left_alone(self, make_call):
+        call = make_call()
+        row = {"input": call.stored_input, "input_overwrite": None, "output": call.stored_output}
+        assert migrate_row(row) is None
@@ -0,0 +1,21 @@
+"""
+Tests for preloading the cache lookups of a rerun session (see DB.preload_session).
+"""
+
+from ao.runner import context_manager
+from ao.server.database_manager import DB
+
+
+class TestPreload:
+    def test_subrun_preload_is_dropped_on_exit(self, session, monkeypatch):
+        monkeypatch.setattr(context_manager, "run_names", set())
+        monkeypatch.setattr(context_manager, "parent_session_id", "parent")
+        monkeypatch.setattr(context_manager, "send_to_server", lambda msg: None)
+        monkeypatch.setattr(DB, "get_parent_environment", lambda session_id: {})
+        monkeypatch.setattr(DB, "get_subrun_id", lambda session_id, run_name: "s")
+        monkeypatch.setattr(DB, "replay_only", True)  # Rerun without a develop server
+
+        with context_manager.ao_launch("subrun"):
+            assert "s" in DB._preloaded
+        assert "s" not in DB._preloaded
+        assert "s" not in DB._session_chains
@@ -0,0 +1,86 @@
+"""
+Tests for the per-phase call profiling behind `ao-record --profile`.
+"""
+
+import time
+
+import pytest
+
+from ao.runner import profiling
+from ao.runner.profiling import (
+    TOTAL,
+    finish_call_profile,
+    profile_phase,
+    start_call_profile,
+    summarize_call_metrics,
+)
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(profiling, "_sample_rate", 1.0)
+    monkeypatch.setattr(profiling, "_pending_rows", [])
+    yield profiling._pending_rows
+    profiling._current_profile.set(None)
+
+
+def metric_row(node_id, phase, ms):
+    return {"node_id": node_id, "api_type": "httpx.Client.send", "phase": phase, "duration_ms": ms}
+
+
+class TestCallProfile:
+    def test_disabled_profiling_is_a_no_op(self):
+        assert start_call_profile("httpx.Client.send") is None
+        with profile_phase("bind") as phase:
+            assert phase is None
+        finish_call_profile(None, "session", "node")
+        assert profiling._pending_rows == []
+
+    def test_nested_phases_are_exclusive(self, profiling_enabled):
+        profile = start_call_profile("httpx.Client.send")
+        with profile_phase("string_matching"):
+            time.sleep(0.01)
+            with profile_phase("reachability"):
+                time.sleep(0.02)
+        finish_call_profile(profile, "session", "node")
+
+        ms = {row[3]: row[4] for row in profiling_enabled}
+        assert set(ms) == {"string_matching", "reachability", TOTAL}
+        assert 10 <= ms["string_matching"] < 20
+        assert ms["reachability"] >= 20
+        assert ms[TOTAL] >= ms["string_matching"] + ms["reachability"]
+        assert profile_phase("bind") is profiling._NO_PHASE
+
+    def test_unsampled_calls_are_not_profiled(self, profiling_enabled, monkeypatch):
+        monkeypatch.setattr(profiling, "_sample_rate", 0.5)
+        monkeypatch.setattr(profiling._sampler, "random", lambda: 0.9)
+        assert start_call_profile("httpx.Client.send") is None
+        assert profile_phase("bind") is profiling._NO_PHASE
+
+
+class TestSummarizeCallMetrics:
+    def test_overhead_and_phase_statistics(self):
+        rows = [
+            metric_row("a", "bind", 1.0),
+            metric_row("a", "llm_call", 100.0),
+            metric_row("a", TOTAL, 104.0),
+            metric_row("b", "bind", 3.0),
+            metric_row("b", "cache_lookup", 2.0),
+            metric_row("b", TOTAL, 6.0),
+        ]
+        summary = summarize_call_metrics(rows)
+
+        assert summary["calls"] == 2
+        assert summary["total_ms"] == 110.0
+        assert summary["overhead_ms"] == 10.0
+        assert summary["overhead_per_call_ms"] == 5.0
+        assert list(summary["phases"]) == ["bind", "cache_lookup", "llm_call"]
+        assert summary["phases"]["bind"]["mean_ms"] == 2.0
+        assert summary["phases"]["bind"]["max_ms"] == 3.0
+        assert [node["overhead_ms"] for node in summary["nodes"]] == [4.0, 6.0]
+
+    def test_rerecorded_nodes_are_averaged(self):
+        rows = [metric_row("a", TOTAL, 4.0), metric_row("a", TOTAL, 8.0)]
+        [node] = summarize_call_metrics(rows)["nodes"]
+        assert node["recordings"] == 2
+        assert node["total_ms"] == 6.0
@@ -0,0 +1,117 @@
+"""
+Tests for redundant edge pruning (reachability.py and the containment check it calls).
+"""
+
+import random
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from ao.runner import string_matching
+from ao.runner.monkey_patching import patching_utils
+from ao.runner.reachability import Reachability, iter_bits
+from tests.benchmarks.payloads import make_text
+
+SESSION_ID = "session-1"
+
+
+@pytest.fixture(autouse=True)
+def clean_session():
+    patching_utils.forget_session(SESSION_ID)
+    yield
+    patching_utils.forget_session(SESSION_ID)
+
+
+def pairwise_redundant(reachable, source_node_ids, contained):
+    """Reference: the pairwise check over descendant sets that Reachability replaced."""
+    return {
+        a
+        for a in source_node_ids
+        for b in source_node_ids
+        if a != b and b in reachable[a] and contained(a, b)
+    }
+
+
+def test_iter_bits():
+    assert list(iter_bits(0)) == []
+    assert list(iter_bits(0b1011 | 1 << 200)) == [0, 1, 3, 200]
+
+
+def test_same_redundant_sources_as_pairwise_check():
+    rng = random.Random(0)
+    reachability = Reachability()
+    reachable = defaultdict(set)  # node -> descendants
+    contained_pairs = set()
+    for n in range(300):
+        node_id = f"node-{n}"
+        sources = rng.sample([f"node-{i}" for i in range(n)], min(n, rng.randint(0, 6)))
+        for a in sources:
+            reachable[a].add(node_id)
+        for descendants in list(reachable.values()):
+            if any(a in descendants for a in sources):
+                descendants.add(node_id)
+        reachability.add(node_id, sources)
+        contained_pairs.update((a, b) for a in sources for b in sources if rng.random() < 0.5)
+
+        contained = lambda a, b: (a, b) in contained_pairs
+        assert reachability.redundant_sources(sources, contained) == pairwise_redundant(
+            reachable, sources, contained
+        )
+        for a in sources:
+            assert reachability.reaches(a, node_id)
+            assert not reachability.reaches(node_id, a)
+
+
+def test_chain_checks_each_source_once():
+    """A chat agent: every call quotes all previous outputs, each in the previous input."""
+    reachability = Reachability()
+    for n in range(200):
+        reachability.add(f"node-{n}", [f"node-{i}" for i in range(n)])
+
+    checked = []
+    sources = [f"node-{i}" for i in range(200)]
+    redundant = reachability.redundant_sources(sources, lambda a, b: checked.append((a, b)) or True)
+    assert redundant == set(sources[:-1])
+    assert len(checked) == 199
+
+
+def test_removed_nodes_are_not_sources():
+    reachability = Reachability()
+    reachability.add("a", [])
+    reachability.add("b", ["a"])
+    reachability.add("c", ["b"])
+    reachability.remove("a")
+    assert not reachability.reaches("a", "c")
+    assert reachability.reaches("b", "c")
+    assert reachability.redundant_sources(["a", "b", "c"], lambda a, b: True) == {"b"}
+
+
+def test_containment_checks_are_memoized(monkeypatch):
+    output = make_text(300, seed=1)
+    string_matching.store_output_strings(
+        SESSION_ID, "node-a", SimpleNamespace(output_strings=[output])
+    )
+    call = SimpleNamespace(input_strings=[output], matching_input=None)
+    string_matching.store_input_strings(SESSION_ID, "node-b", call)
+
+    checks = []
+    check = string_matching._output_contained_in_input
+    monkeypatch.setattr(
+        string_matching,
+        "_output_contained_in_input",
+        lambda *args: checks.append(args) or check(*args),
+    )
+    assert string_matching.output_contained_in_input(SESSION_ID, "node-a", "node-b")
+    assert string_matching.output_contained_in_input(SESSION_ID, "node-a", "node-b")
+    assert len(checks) == 1
+
+    # A new output of node-a or input of node-b is checked again
+    string_matching.store_output_strings(
+        SESSION_ID, "node-a", SimpleNamespace(output_strings=[make_text(300, seed=2)])
+    )
+    assert not string_matching.output_contained_in_input(SESSION_ID, "node-a", "node-b")
+    call = SimpleNamespace(input_strings=[make_text(300, seed=2)], matching_input=None)
+    string_matching.store_input_strings(SESSION_ID, "node-b", call)
+    assert string_matching.output_contained_in_input(SESSION_ID, "node-a", "node-b")
+    assert len(checks) == 3
@@ -0,0 +1,54 @@
+"""
+Tests for the cache-miss handling of replay-only runs (`ao-record --replay-only`).
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from ao.server.database_manager import DB, ReplayMissError
+
+
+def fake_call():
+    return SimpleNamespace(
+        input_dict={"messages": []},
+        api_type="httpx.Client.send",
+        input_pickle=b"",
+        input_hash="0123456789abcdef0123",
+        label="GPT-4o",
+        model="gpt-4o",
+    )
+
+
+@pytest.fixture
+def replay_only(monkeypatch):
+    monkeypatch.setattr(DB, "replay_only", True)
+    monkeypatch.setattr(DB, "replay_misses", [])
+    monkeypatch.setattr(DB, "replayed_calls", 0)
+    return DB
+
+
+class TestReplayOnly:
+    def test_live_runs_return_misses(self, monkeypatch):
+        monkeypatch.setattr(DB, "replay_only", False)
+        result = DB._cache_output_from_row(fake_call(), None, "session", "trace")
+        assert result.output is None
+        assert result.node_id is None
+
+    def test_unrecorded_call_raises(self, replay_only):
+        with pytest.raises(ReplayMissError) as error:
+            replay_only._cache_output_from_row(fake_call(), None, "session", "trace")
+
+        miss = error.value.miss
+        assert replay_only.replay_misses == [miss]
+        assert miss["session_id"] == "session"
+        assert miss["input_hash"] == "0123456789abcdef0123"
+        assert miss["stack_trace"] == "trace"
+        assert "was not recorded" in miss["reason"]
+        assert replay_only.replayed_calls == 0
+
+    def test_call_without_output_raises(self, replay_only):
+        row = {"node_id": "node", "input_overwrite": None, "output": None}
+        with pytest.raises(ReplayMissError, match="has no recorded output"):
+            replay_only._cache_output_from_row(fake_call(), row, "session", None)
+        assert len(replay_only.replay_misses) == 1
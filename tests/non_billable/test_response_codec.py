@@ -0,0 +1,57 @@
+"""
+Round-trip tests for the cached httpx/requests response codec, including
+responses cached with the old dill format.
+"""
+
+import base64
+import json
+
+import dill
+import pytest
+
+from ao.runner.monkey_patching.api_parser import api_obj_to_json_str, json_str_to_api_obj
+from tests.benchmarks.payloads import make_httpx_pair, make_requests_pair
+
+CASES = [
+    ("httpx.Client.send", make_httpx_pair),
+    ("requests.Session.send", make_requests_pair),
+]
+
+
+class TestResponseCodec:
+    @pytest.mark.parametrize("api_type,make_pair", CASES)
+    def test_round_trip(self, api_type, make_pair):
+        _, response = make_pair(prompt_bytes=100, output_bytes=100)
+        stored = api_obj_to_json_str(response, api_type)
+        assert "_obj_str" not in json.loads(stored)["raw"]
+
+        restored = json_str_to_api_obj(stored, api_type)
+        assert type(restored) is type(response)
+        assert restored.status_code == response.status_code
+        assert restored.json() == response.json()
+        assert restored.headers["content-type"] == response.headers["content-type"]
+        assert restored.request.method == "POST"
+        restored.raise_for_status()
+        restored.close()
+
+    @pytest.mark.parametrize("api_type,make_pair", CASES)
+    def test_edited_content(self, api_type, make_pair):
+        _, response = make_pair(prompt_bytes=100, output_bytes=100)
+        stored = json.loads(api_obj_to_json_str(response, api_type))
+        stored["to_show"]["content.choices"][0]["message.content"] = "edited"
+
+        restored = json_str_to_api_obj(json.dumps(stored), api_type)
+        assert restored.json()["choices"][0]["message"]["content"] == "edited"
+
+    @pytest.mark.parametrize("api_type,make_pair", CASES)
+    def test_legacy_dill_format(self, api_type, make_pair):
+        _, response = make_pair(prompt_bytes=100, output_bytes=100)
+        raw = {
+            "_obj_str": base64.b64encode(dill.dumps(response)).decode("utf-8"),
+            "_encoding": "utf-8",
+            "content": response.json(),
+        }
+        stored = json.dumps({"raw": raw, "to_show": {}})
+
+        restored = json_str_to_api_obj(stored, api_type)
+        assert restored.json() == response.json()
@@ -0,0 +1,66 @@
+"""
+Tests for the content-addressed LLM output cache shared across sessions.
+"""
+
+import pytest
+
+from ao.server.database_manager import DB
+
+API_TYPE = "httpx.Client.send"
+
+
+@pytest.fixture
+def shared_cache(backend):
+    DB.enable_shared_cache("global", salt="tests")
+    yield DB
+    DB._shared_cache_prefix = None
+
+
+class TestSharedOutputsQueries:
+    def test_lookup_marks_outputs_as_used(self, backend):
+        backend.insert_shared_output_query("a", API_TYPE, "out", 10.0)
+        assert backend.get_shared_output_query("a", 20.0) == "out"
+        assert backend.get_shared_output_query("b", 20.0) is None
+        row = backend.query_one("SELECT last_used FROM shared_outputs WHERE cache_key='a'")
+        assert row["last_used"] == 20.0
+
+    def test_eviction_by_age_then_size(self, backend):
+        for i, key in enumerate("abcd"):
+            backend.insert_shared_output_query(key, API_TYPE, "x" * 10, float(i))
+        backend.evict_shared_outputs_query(min_last_used=1.0, max_bytes=25)
+
+        rows = backend.query_all("SELECT cache_key FROM shared_outputs ORDER BY cache_key")
+        # "a" is too old, "b" is the least recently used beyond 25 bytes
+        assert [row["cache_key"] for row in rows] == ["c", "d"]
+
+
+class TestSharedCache:
+    def test_new_session_reuses_outputs(self, shared_cache, run_call):
+        first, sent = run_call("session-1")
+        assert sent is not None
+
+        second, sent = run_call("session-2")
+        assert sent is None
+        assert second.output.json() == first.output.json()
+        # The hit is recorded as a node of the new session
+        assert second.node_id is not None and second.node_id != first.node_id
+        row = DB.backend.get_llm_call_by_session_and_hash_query("session-2", second.input_hash)
+        assert row["node_id"] == second.node_id
+
+    def test_other_inputs_and_salts_miss(self, shared_cache, run_call):
+        run_call("session-1", seed=0)
+        assert run_call("session-2", seed=1)[1] is not None
+
+        DB.enable_shared_cache("global", salt="other")
+        assert run_call("session-3", seed=0)[1] is not None
+
+    def test_session_policy_shares_nothing(self, backend, run_call, monkeypatch):
+        monkeypatch.setattr(DB, "_write_queue", None)
+        DB.enable_shared_cache("session")
+        run_call("session-1")
+        assert run_call("session-2")[1] is not None
+        assert backend.query_one("SELECT COUNT(*) AS n FROM shared_outputs")["n"] == 0
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            DB.enable_shared_cache("team")
@@ -0,0 +1,122 @@
+"""
+Tests for the single-flight deduplication of concurrent identical LLM calls.
+"""
+
+import asyncio
+import threading
+import time
+
+from ao.runner import context_manager
+from ao.server.database_manager import DB
+from ao.server.single_flight import SingleFlight
+
+LLM_LATENCY = 0.05
+
+
+def llm(llm_calls, fail_first=False):
+    """'LLM' of run_call counting its live calls, failing the first one if fail_first."""
+
+    def call(request):
+        llm_calls.append(threading.get_ident())
+        time.sleep(LLM_LATENCY)
+        if fail_first and len(llm_calls) == 1:
+            raise ConnectionError("provider unavailable")
+
+    return call
+
+
+async def run_call_async(make_call, llm_calls):
+    call = make_call()
+    cache_output = await DB.get_in_out_async(call)
+    if cache_output.output is None:
+        llm_calls.append(asyncio.current_task())
+        await asyncio.sleep(LLM_LATENCY)
+        await DB.cache_output_async(
+            cache_result=cache_output, output_obj=call.output_obj, api_type=call.api_type
+        )
+    return cache_output.node_id
+
+
+def run_threads(target, n):
+    results, errors = [], []
+
+    def worker():
+        context_manager.current_session_id.set("session-1")
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    def test_owner_does_not_wait_for_itself(self):
+        flights = SingleFlight()
+        flight, leader = flights.acquire("key", owner=1)
+        assert leader
+        assert flights.acquire("key", owner=1) == (None, False)
+        assert flights.acquire("key", owner=2) == (flight, False)
+
+        flights.release("key", flight)
+        assert flight.done.is_set()
+        assert flights.acquire("key", owner=2)[1]
+
+    def test_wait_times_out(self):
+        flights = SingleFlight()
+        flight, _ = flights.acquire("key", owner=1)
+        assert not flights.wait(flight, timeout=0.01)
+        assert not asyncio.run(flights.wait_async(flight, timeout=0.01))
+        flights.release("key", flight)
+        assert flights.wait(flight, timeout=0.01)
+
+
+class TestConcurrentCalls:
+    def test_threads_share_one_llm_call(self, backend, run_call):
+        llm_calls = []
+        node_ids, errors = run_threads(lambda: run_call("session-1", llm(llm_calls))[0].node_id, 8)
+
+        assert not errors
+        assert len(llm_calls) == 1
+        assert len(set(node_ids)) == 1
+        assert len(DB.get_llm_calls_for_session("session-1")) == 1
+
+    def test_tasks_share_one_llm_call(self, backend, make_call):
+        llm_calls = []
+
+        async def main():
+            context_manager.current_session_id.set("session-1")
+            return await asyncio.gather(*(run_call_async(make_call, llm_calls) for _ in range(8)))
+
+        node_ids = asyncio.run(main())
+        assert len(llm_calls) == 1
+        assert len(set(node_ids)) == 1
+
+    def test_failed_leader_hands_over(self, backend, run_call):
+        llm_calls = []
+        node_ids, errors = run_threads(
+            lambda: run_call("session-1", llm(llm_calls, fail_first=True))[0].node_id, 4
+        )
+        # Only the failing call raised, a follower took over and the others reused its output
+        assert len(errors) == 1
+        assert len(llm_calls) == 2
+        assert len(set(node_ids)) == 1
+
+    def test_sync_call_on_the_loop_thread_does_not_wait(self, backend, make_call, run_call):
+        llm_calls = []
+
+        async def main():
+            context_manager.current_session_id.set("session-1")
+            leader = asyncio.create_task(run_call_async(make_call, llm_calls))
+            await asyncio.sleep(0)  # The async leader is in flight
+            # Would deadlock the loop if it waited for the leader
+            run_call("session-1", llm(llm_calls))
+            await leader
+
+        asyncio.run(asyncio.wait_for(main(), timeout=5))
+        assert len(llm_calls) == 2
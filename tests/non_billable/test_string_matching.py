@@ -0,0 +1,324 @@
+"""
+Tests for content-based edge detection in string_matching.py.
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+from flatten_json import flatten
+
+from ao.common.constants import COMPILED_STRING_MATCH_EXCLUDE_PATTERNS
+from ao.runner import string_matching
+from ao.runner.kgram_index import KGramIndex
+from ao.runner.match_memory import MatchMemory, SpillStore
+from ao.runner.monkey_patching import patching_utils
+from ao.runner.string_matching import (
+    KeyFilter,
+    Vocabulary,
+    extract_strings,
+    find_source_nodes,
+    is_content_match,
+    min_match_len,
+    store_output_strings,
+    tokenize,
+)
+from tests.benchmarks.payloads import make_text, make_tool_chat_body
+
+SESSION_ID = "session-1"
+
+
+@pytest.fixture(autouse=True)
+def clean_session():
+    patching_utils.forget_session(SESSION_ID)
+    yield
+    patching_utils.forget_session(SESSION_ID)
+
+
+def store_output(node_id, *texts):
+    store_output_strings(SESSION_ID, node_id, SimpleNamespace(output_strings=list(texts)))
+
+
+def input_call(*strings):
+    return SimpleNamespace(input_strings=list(strings), matching_input=None)
+
+
+def find_sources(*strings):
+    return find_source_nodes(SESSION_ID, input_call(*strings))
+
+
+def scan_source_nodes(*strings):
+    """Reference: check every stored output against the whole input, without any index or cache."""
+    input_words = [word for string in strings for word in tokenize(string)]
+    input_words = string_matching._get_session_vocabulary(SESSION_ID).encode(input_words)
+    matches = []
+    for node_id, word_lists in string_matching._get_session_outputs(SESSION_ID).items():
+        if any(is_content_match(words, input_words)[0] for words in word_lists):
+            matches.append(node_id)
+    return matches
+
+
+def flatten_extract_strings(to_show):
+    """Reference: extract_strings before the single walk (flatten, then filter every key)."""
+    return [
+        v
+        for k, v in flatten(to_show, ".").items()
+        if isinstance(v, str)
+        and not any(p.match(k) for p in COMPILED_STRING_MATCH_EXCLUDE_PATTERNS)
+    ]
+
+
+class TestExtractStrings:
+    KEYS = [
+        "content",
+        "text",
+        "role",
+        "id",
+        "uuid",
+        "tools",
+        "tool_calls",
+        "function",
+        "name",
+        "arguments",
+        "usage",
+        "metadata",
+        "parts",
+        "multi\nline_id",
+        "model\n",
+    ]
+
+    def make_tree(self, rng, depth):
+        kind = rng.random()
+        if depth == 0 or kind < 0.3:
+            return rng.choice(
+                [make_text(rng.randint(0, 40), seed=rng.randint(0, 99)), "", 0, None, 1.5]
+            )
+        if kind < 0.5:
+            return [self.make_tree(rng, depth - 1) for _ in range(rng.randint(0, 4))]
+        if kind < 0.55:
+            return tuple(self.make_tree(rng, depth - 1) for _ in range(rng.randint(0, 3)))
+        return {
+            rng.choice(self.KEYS): self.make_tree(rng, depth - 1) for _ in range(rng.randint(0, 5))
+        }
+
+    def test_same_strings_as_flatten(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            to_show = {
+                rng.choice(self.KEYS): self.make_tree(rng, 5) for _ in range(rng.randint(0, 6))
+            }
+            assert extract_strings(to_show) == flatten_extract_strings(to_show)
+
+    def test_tool_payload(self):
+        to_show = make_tool_chat_body(5_000)
+        strings = extract_strings(to_show)
+        assert strings == flatten_extract_strings(to_show)
+        assert to_show["messages"][0]["content"] in strings
+        assert "gpt-4o-mini" not in strings  # model
+        assert "user" not in strings  # role
+
+    def test_non_suffix_patterns_use_regex(self):
+        import re
+
+        key_filter = KeyFilter([re.compile(r".*id$"), re.compile(r"^messages\.\d+\.name$")])
+        assert key_filter.excluded("messages.0.id", "id")
+        assert key_filter.excluded("messages.0.name", "name")
+        assert not key_filter.excluded("tools.0.name", "name")
+        assert not key_filter.excluded("a\nb.id\nx", "id\nx")
+
+    def test_colliding_keys_are_all_kept(self):
+        # flatten keeps one value per flattened key ("a.b"), extract_strings keeps both
+        assert extract_strings({"a.b": "first", "a": {"b": "second"}}) == ["first", "second"]
+        assert flatten_extract_strings({"a.b": "first", "a": {"b": "second"}}) == ["second"]
+
+    def test_list_under_an_empty_key(self):
+        to_show = {"": ["text", {"": ["nested"]}]}
+        # flatten keys these items by their int index, which the key patterns cannot match
+        assert extract_strings(to_show) == ["text", "nested"]
+
+    def test_to_show_must_be_a_dict(self):
+        with pytest.raises(TypeError):
+            extract_strings(["text"])
+
+
+class TestVocabulary:
+    def test_words_are_interned(self):
+        vocabulary = Vocabulary()
+        first = vocabulary.encode(["a", "b", "a"])
+        assert first.typecode == "I"
+        assert list(first) == [first[0], first[1], first[0]]
+        assert first[0] != first[1]
+        assert list(vocabulary.encode(["b", "c"]))[0] == first[1]
+        assert len(vocabulary) == 3
+
+
+class TestKGramIndex:
+    def test_hits_bound_longest_match(self):
+        index = KGramIndex(4, lambda n: 4)
+        index.add("a", [tokenize("the quick brown fox jumps over the lazy dog")])
+        hits = index.hits(tokenize("a quick brown fox jumps high"))
+        # "quick brown fox jumps" is a 4-word run: one 4-gram
+        assert hits == {("a", 0): 1}
+        assert index.max_match_len(1, 9) == 4
+
+    def test_long_outputs_are_sampled(self):
+        index = KGramIndex(4, min_match_len)
+        words = [f"w{i}" for i in range(100)]
+        # A match must cover 51 words (48 4-grams), so two of every 24th 4-gram
+        assert index.stride(len(words)) == 24
+        index.add("a", [words])
+        assert index.hits(words[10:61]) == {("a", 0): 2}
+        assert index.hits(words[:50]) == {("a", 0): 2}
+        assert index.max_match_len(1, 100) < min_match_len(100) <= index.max_match_len(2, 100)
+        assert index.stride(3) is None
+
+    def test_replaced_and_removed_nodes(self):
+        index = KGramIndex(2, lambda n: 2)
+        index.add("a", [["x", "y", "z"]])
+        index.add("b", [["x", "y"]])
+        index.add("a", [["u", "v"]])
+        assert list(index.hits(["x", "y", "u", "v"])) == [("a", 0), ("b", 0)]
+        index.remove("a")
+        assert list(index.hits(["x", "y", "u", "v"])) == [("b", 0)]
+        assert len(index) == 1
+
+
+class TestFindSourceNodes:
+    def test_matching_output_is_found(self):
+        output = make_text(300, seed=1)
+        store_output("node-1", output)
+        store_output("node-2", make_text(300, seed=2))
+
+        assert find_sources(f"Summarize this: {output}") == ["node-1"]
+        assert find_sources(make_text(300, seed=3)) == []
+
+    def test_same_matches_as_full_scan(self):
+        rng = random.Random(0)
+        outputs = [make_text(rng.randint(10, 400), seed=i) for i in range(60)]
+        for i, output in enumerate(outputs):
+            # Node outputs made of one or several chunks
+            store_output(f"node-{i}", *output.split(" report "))
+
+        for seed in range(40):
+            parts = []
+            for output in rng.sample(outputs, 3):
+                words = output.split()
+                start = rng.randrange(len(words))
+                parts.append(" ".join(words[start : start + rng.randint(1, len(words))]))
+            parts.append(make_text(rng.randint(0, 500), seed=1000 + seed))
+            text = " ".join(parts)
+
+            assert find_sources(text) == scan_source_nodes(text)
+
+
+class TestIncrementalMatching:
+    def test_growing_conversation(self, monkeypatch):
+        verified = []
+        longest_match = string_matching.longest_match
+        monkeypatch.setattr(
+            string_matching,
+            "longest_match",
+            lambda output, *args: verified.append(output) or longest_match(output, *args),
+        )
+        rng = random.Random(1)
+        history = [make_text(200, seed=-1)]
+        for turn in range(30):
+            history.append(make_text(rng.randint(20, 300), seed=-2 - turn))  # User message
+            # The tool schema follows the messages: an input is no prefix of the next one
+            messages = history + [" tool schema: " + make_text(100, seed=-100)]
+            verified.clear()
+            found = find_sources(*messages)
+            # Only the output of the last turn is matched with SequenceMatcher again
+            assert len(verified) <= 1
+            assert found == scan_source_nodes(*messages)
+
+            output = make_text(rng.randint(20, 300), seed=turn)
+            store_output(f"node-{turn}", output)
+            history.append(output)
+
+    def test_strings_are_tokenized_once(self, monkeypatch):
+        tokenized = []
+        tokenize = string_matching.tokenize
+        monkeypatch.setattr(
+            string_matching, "tokenize", lambda text: tokenized.append(text) or tokenize(text)
+        )
+        find_sources("system prompt", "first question")
+        find_sources("system prompt", "first question", "second question")
+        assert tokenized == ["system prompt", "first question", "second question"]
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(string_matching, "SEGMENT_CACHE_TOKENS", 5)
+        store_output("node-1", make_text(200, seed=1))
+        messages = [make_text(200, seed=2), make_text(200, seed=1)]
+        assert find_sources(*messages) == ["node-1"]
+        assert find_sources(*messages) == ["node-1"]
+        assert string_matching._get_session_segments(SESSION_ID)._tokens <= 5
+
+
+class TestMemoryBudget:
+    @pytest.fixture
+    def budget(self, monkeypatch, tmp_path):
+        """Set a memory budget (in bytes) and optionally spill to tmp_path."""
+
+        def set_budget(max_bytes, spill=False):
+            monkeypatch.setattr(string_matching, "_memory", MatchMemory(max_bytes))
+            store = SpillStore(str(tmp_path)) if spill else None
+            monkeypatch.setattr(string_matching, "_spill_store", store)
+            return store
+
+        yield set_budget
+        if string_matching._spill_store is not None:
+            string_matching._spill_store.close()
+
+    def store_outputs(self, n):
+        outputs = [make_text(300, seed=i) for i in range(n)]
+        for i, output in enumerate(outputs):
+            store_output(f"node-{i}", output)
+        return outputs
+
+    def test_least_recently_matched_nodes_are_dropped(self, budget):
+        budget(10_000)  # About 4 nodes
+        outputs = self.store_outputs(2)
+        assert find_sources(outputs[0]) == ["node-0"]  # node-0 is now more recent than node-1
+        outputs += self.store_outputs(10)[2:]
+
+        assert string_matching._memory.bytes <= 10_000
+        assert 0 < len(string_matching._memory) < 10
+        assert find_sources(outputs[1]) == []
+        assert find_sources(outputs[9]) == ["node-9"]
+
+    def test_dropped_nodes_leave_reachability(self, budget):
+        budget(10_000)
+        reachability = patching_utils._get_session_reachability(SESSION_ID)
+        reachability.add("node-0", [])
+        reachability.add("node-1", ["node-0"])
+        self.store_outputs(10)
+        assert not reachability.reaches("node-0", "node-1")
+
+    def test_spilled_nodes_are_paged_in(self, budget):
+        budget(10_000, spill=True)
+        outputs = self.store_outputs(10)
+        string_matching.store_input_strings(SESSION_ID, "node-9", input_call(outputs[0]))
+        assert len(string_matching._memory) < 10
+
+        for i, output in enumerate(outputs):
+            assert find_sources("Summarize this: " + output) == [f"node-{i}"]
+            assert string_matching._memory.bytes <= 10_000
+        assert string_matching.output_contained_in_input(SESSION_ID, "node-0", "node-9")
+
+    def test_spill_store_round_trip(self, tmp_path):
+        store = SpillStore(str(tmp_path))
+        outputs = [Vocabulary().encode(["a", "b", "c"]), Vocabulary().encode([])]
+        store.put(SESSION_ID, "node-1", outputs, ())
+        assert store.take(SESSION_ID, "node-1") == (outputs, [])
+        assert store.take(SESSION_ID, "node-1") is None
+        store.close()
+
+    def test_finished_sessions_are_forgotten(self):
+        store_output("node-1", make_text(300, seed=1))
+        patching_utils._get_session_reachability(SESSION_ID).add("node-2", ["node-1"])
+        patching_utils.forget_session(SESSION_ID)
+
+        assert SESSION_ID not in patching_utils._session_reachability
+        assert SESSION_ID not in string_matching._session_outputs
+        assert SESSION_ID not in string_matching._memory._sessions
@@ -0,0 +1,124 @@
+"""
+Tests for the write-behind queue of llm_calls inserts.
+"""
+
+import threading
+import time
+
+import pytest
+
+from ao.server.write_behind import WriteBehindQueue
+
+
+def _row(i, session_id="s1"):
+    return (
+        session_id,
+        f"input-{i}",
+        f"hash-{i}",
+        f"node-{i}",
+        "httpx.Client.send",
+        f"out-{i}",
+        None,
+    )
+
+
+class TestWriteBehindQueue:
+    def test_pending_rows_visible_until_written(self):
+        written = []
+        queue = WriteBehindQueue(written.extend, batch_rows=100, flush_interval=60, max_pending=100)
+        queue.put(_row(1))
+
+        assert written == []
+        assert queue.get("s1", "hash-1") == {
+            "node_id": "node-1",
+            "input_overwrite": None,
+            "output": "out-1",
+        }
+        assert queue.get("s2", "hash-1") is None
+
+        queue.flush()
+        assert written == [_row(1)]
+        assert queue.get("s1", "hash-1") is None
+        queue.close()
+
+    def test_rows_visible_while_batch_is_written(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(rows):
+            started.set()
+            release.wait(5)
+
+        queue = WriteBehindQueue(slow_write, batch_rows=100, flush_interval=60, max_pending=100)
+        queue.put(_row(1))
+        flusher = threading.Thread(target=queue.flush)
+        flusher.start()
+        started.wait(5)
+        assert queue.get("s1", "hash-1")["node_id"] == "node-1"
+        release.set()
+        flusher.join()
+        assert queue.get("s1", "hash-1") is None
+        queue.close()
+
+    def test_background_writer_flushes_batches(self):
+        written = []
+        queue = WriteBehindQueue(written.extend, batch_rows=3, flush_interval=60, max_pending=100)
+        for i in range(3):
+            queue.put(_row(i))
+
+        deadline = time.time() + 5
+        while len(written) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert written == [_row(0), _row(1), _row(2)]
+        queue.close()
+
+    def test_close_flushes_and_max_pending_applies_backpressure(self):
+        batches = []
+        queue = WriteBehindQueue(batches.append, batch_rows=100, flush_interval=60, max_pending=2)
+        queue.put(_row(1))
+        queue.put(_row(2))  # reaches max_pending: flushed by the caller
+        assert batches == [[_row(1), _row(2)]]
+
+        queue.put(_row(3))
+        queue.close()
+        assert batches[-1] == [_row(3)]
+
+    def test_failed_batch_is_queued_again(self):
+        attempts, written = [], []
+
+        def flaky_write(rows):
+            attempts.append(rows)
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            written.extend(rows)
+
+        queue = WriteBehindQueue(flaky_write, batch_rows=100, flush_interval=60, max_pending=100)
+        queue.put(_row(1))
+        with pytest.raises(RuntimeError):
+            queue.flush()
+        assert queue.get("s1", "hash-1")["node_id"] == "node-1"
+
+        queue.close()
+        assert written == [_row(1)]
+        assert queue.get("s1", "hash-1") is None
+
+    def test_close_raises_if_rows_cannot_be_written(self):
+        def failing_write(rows):
+            raise RuntimeError("database is locked")
+
+        queue = WriteBehindQueue(failing_write, batch_rows=100, flush_interval=60, max_pending=100)
+        queue.put(_row(1))
+        with pytest.raises(RuntimeError):
+            queue.close()
+
+    def test_rows_with_the_same_hash_are_all_written(self):
+        written = []
+        queue = WriteBehindQueue(written.extend, batch_rows=100, flush_interval=60, max_pending=100)
+        first = _row(1)
+        second = first[:3] + ("node-2",) + first[4:]
+        queue.put(first)
+        queue.put(second)
+        assert queue.get("s1", "hash-1")["node_id"] == "node-2"
+
+        queue.close()
+        assert written == [first, second]
+        assert queue.get("s1", "hash-1") is None